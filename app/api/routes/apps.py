@@ -1,93 +1,334 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from functools import lru_cache
+from pydantic import TypeAdapter, create_model
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Type, Union
 from app.database import get_db
+from app.schema import SCHEMA_VERSION
+from app.services.app_event_service import AppEventService, app_event_recorder
 from app.services.app_service import AppService
-from app.schemas.app import AppResponse, AppCreate, AppUpdate, AppListResponse
+from app.schemas.app import (
+    AppResponse, AppCreate, AppUpdate, AppListResponse, AppBatchRequest, AppBatchResponse, AppSuggestion, AppSort,
+    AppFacetedListResponse, AppEventBatch, AppBulkUpdateRequest, AppBulkUpdateResponse
+)
+from app.schemas.fields import FieldSet, fieldset_list_adapter, fieldset_model, parse_fields
+from app.services.facet_index import bitset_from_ids, facet_index
+from app.services.similarity_service import SimilarityService, similarity_refresher
+from app.services.suggest_index import suggest_index
+from app.utils.catalog_version import catalog_cache
+from app.utils.fragment_store import fragment_store, join_fragments
+from app.utils.write_queue import write_queue
+from config import settings
 
 router = APIRouter()
 
-@router.get("/", response_model=List[AppListResponse])
-async def get_apps(
+_app_list_item_adapter = TypeAdapter(AppListResponse)
+
+def _dump_app_list_item(app) -> bytes:
+    """Элемент списка приложений в JSON (все его поля покрыты data_hash)"""
+    def render() -> bytes:
+        return _app_list_item_adapter.dump_json(_app_list_item_adapter.validate_python(app, from_attributes=True))
+    
+    if not app.data_hash:
+        return render()
+    return fragment_store.get_or_render(("app_list_item", app.id, app.data_hash, SCHEMA_VERSION), render)
+
+def _dump_app_list(apps) -> bytes:
+    return join_fragments(_dump_app_list_item(app) for app in apps)
+
+def render_app(db: Session, app_id: int) -> Optional[bytes]:
+    """Приложение в JSON из готового фрагмента (None - приложение не найдено)"""
+    app_service = AppService(db)
+    key = app_service.get_app_fragment_key(app_id)
+    if key is None:
+        return None
+    
+    def render() -> bytes:
+        app = app_service.get_app_by_id(app_id)
+        if not app:
+            raise HTTPException(status_code=404, detail="Приложение не найдено")
+        return AppResponse.model_validate(app).model_dump_json().encode()
+    
+    _, data_hash, _, _ = key
+    if not data_hash:
+        return render()
+    return fragment_store.get_or_render(("app", SCHEMA_VERSION, *key), render)
+
+@lru_cache(maxsize=256)
+def _faceted_model(fields: Optional[FieldSet]) -> Type[AppFacetedListResponse]:
+    """Схема списка с фасетами, элементы которой урезаны до набора полей"""
+    if not fields:
+        return AppFacetedListResponse
+    return create_model(
+        "AppFacetedListResponseFields",
+        __base__=AppFacetedListResponse,
+        items=(List[fieldset_model(AppListResponse, fields)], ...)
+    )
+
+def render_apps_page(
+    db: Session,
+    category_id: Optional[int] = None,
+    limit: int = 50,
+    offset: int = 0,
+    sort: Optional[str] = None,
+    max_age: Optional[int] = None,
+    facets: bool = False,
+    fields: Optional[FieldSet] = None
+) -> bytes:
+    """Страница списка приложений в JSON (кешируется до изменения каталога)"""
+    def compute() -> bytes:
+        apps = AppService(db).get_apps(
+            category_id=category_id, limit=limit, offset=offset, sort=sort, max_age=max_age, fields=fields
+        )
+        if not facets:
+            if not fields:
+                return _dump_app_list(apps)
+            adapter = fieldset_list_adapter(AppListResponse, fields)
+            return adapter.dump_json(adapter.validate_python(apps, from_attributes=True))
+        
+        counts = facet_index.facets(category_id=category_id, max_age=max_age)
+        return _faceted_model(fields).model_validate(
+            {"items": apps, **counts}, from_attributes=True
+        ).model_dump_json().encode()
+    
+    return catalog_cache.get_or_set(
+        ("apps", category_id, limit, offset, sort, max_age, facets, fields), compute
+    )
+
+def render_featured(db: Session, limit: int = 5) -> bytes:
+    """Топ приложений в JSON (кешируется до изменения каталога)"""
+    return catalog_cache.get_or_set(
+        ("featured", limit),
+        lambda: _dump_app_list(AppService(db).get_featured_apps(limit=limit))
+    )
+
+# Обработчик синхронный: FastAPI выполняет его в пуле потоков, и одновременные
+# промахи кеша по одному ключу ждут одно вычисление (см. CatalogCache)
+@router.get("/", response_model=Union[List[AppListResponse], AppFacetedListResponse])
+def get_apps(
     category_id: Optional[int] = Query(None, description="ID категории для фильтрации"),
     limit: int = Query(50, ge=1, le=100, description="Количество приложений на странице"),
     offset: int = Query(0, ge=0, description="Смещение для пагинации"),
+    sort: Optional[AppSort] = Query(None, description="Сортировка: rating, downloads, newest, name"),
+    max_age: Optional[int] = Query(None, ge=0, description="Максимальный возрастной рейтинг"),
+    facets: bool = Query(False, description="Вернуть общее количество и счетчики фасетов"),
+    fields: Optional[str] = Query(None, description="Поля приложений через запятую, например id,name,icon_url"),
     db: Session = Depends(get_db)
 ):
     """Получить список приложений"""
-    app_service = AppService(db)
-    apps = app_service.get_apps(category_id=category_id, limit=limit, offset=offset)
-    return apps
+    content = render_apps_page(
+        db, category_id=category_id, limit=limit, offset=offset, sort=sort, max_age=max_age, facets=facets,
+        fields=parse_fields(fields, AppListResponse)
+    )
+    return Response(content=content, media_type="application/json")
 
-@router.get("/search", response_model=List[AppListResponse])
+@router.get("/search", response_model=Union[List[AppListResponse], AppFacetedListResponse])
 async def search_apps(
     q: str = Query(..., description="Поисковый запрос"),
     limit: int = Query(50, ge=1, le=100, description="Количество результатов"),
     offset: int = Query(0, ge=0, description="Смещение для пагинации"),
+    sort: Optional[AppSort] = Query(None, description="Сортировка: rating, downloads, newest, name (по умолчанию - по релевантности)"),
+    max_age: Optional[int] = Query(None, ge=0, description="Максимальный возрастной рейтинг"),
+    facets: bool = Query(False, description="Вернуть общее количество и счетчики фасетов"),
+    fields: Optional[str] = Query(None, description="Поля приложений через запятую, например id,name,icon_url"),
     db: Session = Depends(get_db)
 ):
     """Поиск приложений"""
+    field_set = parse_fields(fields, AppListResponse)
     app_service = AppService(db)
-    apps = app_service.search_apps(query=q, limit=limit, offset=offset)
-    return apps
+    apps = app_service.search_apps(query=q, limit=limit, offset=offset, sort=sort, max_age=max_age, fields=field_set)
+    if not facets:
+        if not field_set:
+            return apps
+        adapter = fieldset_list_adapter(AppListResponse, field_set)
+        content = adapter.dump_json(adapter.validate_python(apps, from_attributes=True))
+        return Response(content=content, media_type="application/json")
+    
+    candidates = bitset_from_ids(app_service.search_app_ids(q))
+    page = {"items": apps, **facet_index.facets(candidates=candidates, max_age=max_age)}
+    if not field_set:
+        return page
+    content = _faceted_model(field_set).model_validate(page, from_attributes=True).model_dump_json()
+    return Response(content=content, media_type="application/json")
+
+@router.get("/suggest", response_model=List[AppSuggestion])
+async def suggest_apps(
+    prefix: str = Query(..., description="Начало названия приложения или компании"),
+    limit: int = Query(10, ge=1, le=20, description="Количество подсказок")
+):
+    """Подсказки для поиска по мере ввода (из индекса в памяти, без запросов к базе)"""
+    # Первое построение читает весь каталог: в пуле потоков, а не в цикле событий
+    if not suggest_index.built:
+        await run_in_threadpool(suggest_index.ensure_built)
+    return suggest_index.suggest(prefix, limit=limit)
 
 @router.get("/featured", response_model=List[AppListResponse])
-async def get_featured_apps(
+def get_featured_apps(
     limit: int = Query(5, ge=1, le=20, description="Количество приложений в топе"),
     db: Session = Depends(get_db)
 ):
     """Получить топ приложений по рейтингу"""
-    app_service = AppService(db)
-    apps = app_service.get_featured_apps(limit=limit)
-    return apps
+    return Response(content=render_featured(db, limit=limit), media_type="application/json")
+
+@router.get("/trending", response_model=List[AppListResponse])
+async def get_trending_apps(
+    category_id: Optional[int] = Query(None, description="ID категории для фильтрации"),
+    limit: int = Query(20, ge=1, le=100, description="Количество приложений"),
+    db: Session = Depends(get_db)
+):
+    """Получить популярные сейчас приложения (просмотры и загрузки с затуханием)"""
+    apps = AppEventService(db).get_trending_apps(category_id=category_id, limit=limit)
+    return Response(content=_dump_app_list(apps), media_type="application/json")
+
+@router.post("/events", status_code=202)
+async def record_app_events(batch: AppEventBatch):
+    """Учесть пачку просмотров и загрузок (записываются в базу периодически)"""
+    if len(batch.events) > settings.APP_EVENTS_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Можно передать не более {settings.APP_EVENTS_BATCH_MAX} событий за раз"
+        )
+    
+    accepted = sum(app_event_recorder.record(event.app_id, event.type) for event in batch.events)
+    return {"accepted": accepted, "dropped": len(batch.events) - accepted}
+
+def _get_apps_batch(app_ids: List[int], db: Session) -> AppBatchResponse:
+    """Загрузить приложения по ID с сохранением порядка запроса"""
+    # Убираем повторы, сохраняя порядок
+    app_ids = list(dict.fromkeys(app_ids))
+    if len(app_ids) > settings.APPS_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Можно запросить не более {settings.APPS_BATCH_MAX_IDS} приложений за раз"
+        )
+    
+    apps_by_id = {app.id: app for app in AppService(db).get_apps_by_ids(app_ids)}
+    return AppBatchResponse(
+        apps=[AppResponse.model_validate(apps_by_id[app_id]) for app_id in app_ids if app_id in apps_by_id],
+        missing=[app_id for app_id in app_ids if app_id not in apps_by_id]
+    )
+
+@router.get("/batch", response_model=AppBatchResponse)
+async def get_apps_batch(
+    ids: str = Query(..., description="ID приложений через запятую"),
+    db: Session = Depends(get_db)
+):
+    """Получить несколько приложений по ID"""
+    try:
+        app_ids = [int(app_id) for app_id in ids.split(",") if app_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ID приложений должны быть целыми числами")
+    
+    return _get_apps_batch(app_ids, db)
+
+@router.post("/batch", response_model=AppBatchResponse)
+async def post_apps_batch(batch: AppBatchRequest, db: Session = Depends(get_db)):
+    """Получить несколько приложений по ID (для длинных списков)"""
+    return _get_apps_batch(batch.ids, db)
 
 @router.get("/{app_id}", response_model=AppResponse)
-async def get_app(app_id: int, db: Session = Depends(get_db)):
+async def get_app(
+    app_id: int,
+    fields: Optional[str] = Query(None, description="Поля приложения через запятую, например id,name,screenshots"),
+    db: Session = Depends(get_db)
+):
     """Получить приложение по ID"""
-    app_service = AppService(db)
-    app = app_service.get_app_by_id(app_id)
+    field_set = parse_fields(fields, AppResponse)
+    if field_set:
+        app = AppService(db).get_app_fields(app_id, field_set)
+        content = fieldset_model(AppResponse, field_set).model_validate(app).model_dump_json() if app else None
+    else:
+        content = render_app(db, app_id)
     
-    if not app:
+    if content is None:
         raise HTTPException(status_code=404, detail="Приложение не найдено")
+    return Response(content=content, media_type="application/json")
+
+@router.get("/{app_id}/similar", response_model=List[AppListResponse])
+async def get_similar_apps(
+    app_id: int,
+    limit: int = Query(10, ge=1, le=settings.SIMILAR_APPS_TOP_K),
+    db: Session = Depends(get_db)
+):
+    """Получить похожие приложения (соседи рассчитаны заранее)"""
+    apps = SimilarityService(db).get_similar_apps(app_id, limit)
     
-    return app
+    if not apps and not AppService(db).get_app_by_id(app_id):
+        raise HTTPException(status_code=404, detail="Приложение не найдено")
+    
+    return apps
+
+@router.post("/similar/refresh")
+def refresh_similar_apps(full: bool = Query(False, description="Пересчитать соседей всех приложений")):
+    """Пересчитать похожие приложения для изменившихся приложений"""
+    return similarity_refresher.refresh(full=full)
 
 @router.post("/", response_model=AppResponse)
-async def create_app(app_data: AppCreate, db: Session = Depends(get_db)):
+async def create_app(app_data: AppCreate):
     """Создать новое приложение"""
-    app_service = AppService(db)
+    def unit(db: Session) -> AppResponse:
+        app = AppService(db).create_app(app_data)
+        return AppResponse.model_validate(app)
+    
     try:
-        app = app_service.create_app(app_data)
-        return app
+        return await write_queue.submit(unit)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/{app_id}", response_model=AppResponse)
-async def update_app(
-    app_id: int, 
-    app_data: AppUpdate, 
-    db: Session = Depends(get_db)
-):
+async def update_app(app_id: int, app_data: AppUpdate):
     """Обновить приложение"""
-    app_service = AppService(db)
-    app = app_service.update_app(app_id, app_data)
+    def unit(db: Session) -> Optional[AppResponse]:
+        app = AppService(db).update_app(app_id, app_data)
+        return AppResponse.model_validate(app) if app else None
+    
+    app = await write_queue.submit(unit)
     
     if not app:
         raise HTTPException(status_code=404, detail="Приложение не найдено")
     
     return app
 
+@router.patch("/bulk", response_model=AppBulkUpdateResponse)
+async def bulk_update_apps(batch: AppBulkUpdateRequest):
+    """
+    Частично обновить несколько приложений одной транзакцией
+    
+    Результат по каждому элементу: updated, unchanged, not_found
+    или conflict (данные совпадают с другим приложением).
+    """
+    if len(batch.updates) > settings.APPS_BULK_UPDATE_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Можно обновить не более {settings.APPS_BULK_UPDATE_MAX} приложений за раз"
+        )
+    
+    results = await write_queue.submit(lambda db: AppService(db).bulk_update_apps(batch.updates))
+    return AppBulkUpdateResponse(results=results)
+
 @router.delete("/{app_id}")
-async def delete_app(app_id: int, db: Session = Depends(get_db)):
+async def delete_app(app_id: int):
     """Удалить приложение"""
-    app_service = AppService(db)
-    success = app_service.delete_app(app_id)
+    success = await write_queue.submit(lambda db: AppService(db).delete_app(app_id))
     
     if not success:
         raise HTTPException(status_code=404, detail="Приложение не найдено")
     
     return {"message": "Приложение успешно удалено"}
 
+@router.post("/{app_id}/view", status_code=202)
+async def record_app_view(app_id: int):
+    """Учесть просмотр страницы приложения"""
+    return {"accepted": app_event_recorder.record(app_id, "view")}
+
+@router.post("/{app_id}/download", status_code=202)
+async def record_app_download(app_id: int):
+    """Учесть загрузку приложения"""
+    return {"accepted": app_event_recorder.record(app_id, "download")}
+
 @router.get("/{app_id}/verify")
 async def verify_app_integrity(app_id: int, db: Session = Depends(get_db)):
     """Проверить целостность данных приложения"""
@@ -0,0 +1,46 @@
+"""
+API маршруты архива удаленных приложений
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.archive import ArchivedAppResponse, ArchiveRunResponse, ArchiveStatsResponse
+from app.services.archive_service import ArchiveService
+from config import settings
+
+router = APIRouter()
+
+# Синхронные обработчики: перенос пачками выполняется в пуле потоков и не блокирует цикл событий
+
+@router.post("/run", response_model=ArchiveRunResponse)
+def run_archive(
+    retention_days: Optional[float] = Query(None, ge=0, description="Срок хранения удаленных приложений, дней"),
+    db: Session = Depends(get_db)
+):
+    """Перенести в архив приложения, удаленные раньше срока хранения"""
+    if retention_days is None:
+        retention_days = settings.ARCHIVE_RETENTION_DAYS
+    return ArchiveService(db).archive_inactive_apps(retention_days)
+
+@router.get("/stats", response_model=ArchiveStatsResponse)
+def get_archive_stats(db: Session = Depends(get_db)):
+    """Количество строк в горячих и архивных таблицах"""
+    return ArchiveService(db).get_stats()
+
+@router.get("/apps", response_model=List[ArchivedAppResponse])
+def get_archived_apps(
+    limit: int = Query(50, ge=1, le=500, description="Количество приложений"),
+    offset: int = Query(0, ge=0, description="Смещение"),
+    db: Session = Depends(get_db)
+):
+    """Получить архивные приложения, последние перенесенные первыми"""
+    return ArchiveService(db).get_archived_apps(limit, offset)
+
+@router.get("/apps/{app_id}", response_model=ArchivedAppResponse)
+def get_archived_app(app_id: int, db: Session = Depends(get_db)):
+    """Получить архивное приложение со скриншотами"""
+    app = ArchiveService(db).get_archived_app(app_id)
+    if not app:
+        raise HTTPException(status_code=404, detail="Архивное приложение не найдено")
+    return app
@@ -0,0 +1,35 @@
+"""
+API маршруты загрузки файлов
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.asset import AssetGcResponse, AssetResponse
+from app.services.asset_service import AssetService
+from app.utils.asset_store import asset_store
+from config import settings
+
+router = APIRouter()
+
+@router.post("/", response_model=AssetResponse)
+async def upload_asset(request: Request):
+    """
+    Загрузить файл (multipart/form-data, поле file)
+    
+    Файл сохраняется под именем по SHA-256 содержимого; одинаковые файлы
+    хранятся один раз. Возвращенный URL указывается в icon_url,
+    header_image_url, apk_url приложения или image_url скриншота.
+    """
+    return await asset_store.receive(request)
+
+@router.post("/gc", response_model=AssetGcResponse)
+def collect_asset_garbage(
+    grace_hours: Optional[float] = Query(None, ge=0, description="Не удалять файлы моложе, ч"),
+    dry_run: bool = Query(False, description="Только посчитать, ничего не удаляя"),
+    db: Session = Depends(get_db)
+):
+    """Удалить файлы, на которые не ссылается ни одно приложение или скриншот"""
+    if grace_hours is None:
+        grace_hours = settings.ASSET_GC_GRACE_HOURS
+    return AssetService(db).collect_garbage(grace_hours, dry_run)
@@ -1,51 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.database import get_db
+from app.schema import SCHEMA_VERSION
 from app.services.category_service import CategoryService
 from app.schemas.category import CategoryResponse, CategoryCreate, CategoryUpdate
+from app.schemas.fields import FieldSet, fieldset_list_adapter, fieldset_model, parse_fields
+from app.utils.catalog_version import catalog_cache
+from app.utils.fragment_store import fragment_store, join_fragments
+from app.utils.write_queue import write_queue
 
 router = APIRouter()
 
+_category_adapter = TypeAdapter(CategoryResponse)
+
+def _dump_category(row) -> bytes:
+    """Категория в JSON из готового фрагмента (строка CategoryService.get_category_rows)"""
+    def render() -> bytes:
+        return _category_adapter.dump_json(_category_adapter.validate_python(row, from_attributes=True))
+    
+    if not row.data_hash:
+        return render()
+    return fragment_store.get_or_render(
+        ("category", row.id, row.data_hash, row.apps_count, SCHEMA_VERSION), render
+    )
+
+def render_categories(db: Session, fields: Optional[FieldSet] = None) -> bytes:
+    """Список категорий в JSON (кешируется до изменения каталога)"""
+    def compute() -> bytes:
+        if not fields:
+            return join_fragments(_dump_category(row) for row in CategoryService(db).get_category_rows())
+        categories = CategoryService(db).get_categories(fields=fields)
+        adapter = fieldset_list_adapter(CategoryResponse, fields)
+        return adapter.dump_json(adapter.validate_python(categories, from_attributes=True))
+    
+    return catalog_cache.get_or_set(("categories", fields), compute)
+
+# Обработчик синхронный: FastAPI выполняет его в пуле потоков, и одновременные
+# промахи кеша по одному ключу ждут одно вычисление (см. CatalogCache)
 @router.get("/", response_model=List[CategoryResponse])
-async def get_categories(db: Session = Depends(get_db)):
+def get_categories(
+    fields: Optional[str] = Query(None, description="Поля категорий через запятую, например id,name"),
+    db: Session = Depends(get_db)
+):
     """Получить все категории"""
-    category_service = CategoryService(db)
-    categories = category_service.get_categories()
-    return categories
+    content = render_categories(db, fields=parse_fields(fields, CategoryResponse))
+    return Response(content=content, media_type="application/json")
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-async def get_category(category_id: int, db: Session = Depends(get_db)):
+async def get_category(
+    category_id: int,
+    fields: Optional[str] = Query(None, description="Поля категории через запятую, например id,name"),
+    db: Session = Depends(get_db)
+):
     """Получить категорию по ID"""
     category_service = CategoryService(db)
-    category = category_service.get_category_by_id(category_id)
+    field_set = parse_fields(fields, CategoryResponse)
+    if field_set:
+        category = category_service.get_category_fields(category_id, field_set)
+    else:
+        category = next(iter(category_service.get_category_rows(category_id)), None)
     
     if not category:
         raise HTTPException(status_code=404, detail="Категория не найдена")
     
-    return category
+    if field_set:
+        content = fieldset_model(CategoryResponse, field_set).model_validate(category).model_dump_json()
+    else:
+        content = _dump_category(category)
+    return Response(content=content, media_type="application/json")
 
 @router.post("/", response_model=CategoryResponse)
-async def create_category(category_data: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(category_data: CategoryCreate):
     """Создать новую категорию"""
-    category_service = CategoryService(db)
+    def unit(db: Session) -> CategoryResponse:
+        category = CategoryService(db).create_category(category_data)
+        return CategoryResponse.model_validate(category)
+    
     try:
-        category = category_service.create_category(category_data)
-        return category
+        return await write_queue.submit(unit)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/{category_id}", response_model=CategoryResponse)
-async def update_category(
-    category_id: int, 
-    category_data: CategoryUpdate, 
-    db: Session = Depends(get_db)
-):
+async def update_category(category_id: int, category_data: CategoryUpdate):
     """Обновить категорию"""
-    category_service = CategoryService(db)
-    category = category_service.update_category(category_id, category_data)
+    def unit(db: Session) -> Optional[CategoryResponse]:
+        category = CategoryService(db).update_category(category_id, category_data)
+        return CategoryResponse.model_validate(category) if category else None
+    
+    category = await write_queue.submit(unit)
     
     if not category:
         raise HTTPException(status_code=404, detail="Категория не найдена")
@@ -53,10 +100,9 @@ async def update_category(
     return category
 
 @router.delete("/{category_id}")
-async def delete_category(category_id: int, db: Session = Depends(get_db)):
+async def delete_category(category_id: int):
     """Удалить категорию"""
-    category_service = CategoryService(db)
-    success = category_service.delete_category(category_id)
+    success = await write_queue.submit(lambda db: CategoryService(db).delete_category(category_id))
     
     if not success:
         raise HTTPException(status_code=404, detail="Категория не найдена")
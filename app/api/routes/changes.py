@@ -0,0 +1,19 @@
+"""
+API маршруты журнала изменений каталога
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.change import CatalogChangesResponse
+from app.services.change_feed_service import ChangeFeedService
+
+router = APIRouter()
+
+@router.get("", response_model=CatalogChangesResponse)
+async def get_changes(
+    since: int = Query(0, ge=0, description="Номер последнего полученного изменения"),
+    limit: int = Query(500, ge=1, le=1000, description="Количество изменений на странице"),
+    db: Session = Depends(get_db)
+):
+    """Получить изменения каталога (новые данные и удаления) после номера since"""
+    return ChangeFeedService(db).get_changes(since=since, limit=limit)
@@ -1,13 +1,25 @@
 """
 API маршруты для проверки целостности данных
 """
-from fastapi import APIRouter, Depends, HTTPException
+import struct
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.schemas.hash_check import HashCheckRequest, HashCheckResponse
+from app.schemas.scrub import ScrubMismatchResponse, ScrubStatusResponse
+from app.services.asset_service import AssetService
 from app.services.hash_verification_service import HashVerificationService
+from app.services.scrub_service import ScrubService
+from config import settings
 
 router = APIRouter()
 
+# Запись бинарного запроса проверки: ID (uint32 little-endian) и SHA-256 (32 байта)
+_HASH_RECORD = struct.Struct("<I32s")
+
 @router.get("/verify-all")
 async def verify_all_data_integrity(db: Session = Depends(get_db)):
     """Проверить целостность всех данных в базе"""
@@ -56,3 +68,88 @@ async def find_duplicates(db: Session = Depends(get_db)):
         "apps": app_service.find_duplicate_apps(),
         "categories": category_service.find_duplicate_categories()
     }
+
+@router.get("/near-duplicates")
+async def find_near_duplicates(
+    threshold: float = Query(settings.NEAR_DUPLICATE_THRESHOLD, ge=0.5, le=1.0),
+    db: Session = Depends(get_db)
+):
+    """Найти почти одинаковые приложения (MinHash по названию и описанию)"""
+    from app.services.app_service import AppService
+    
+    return {
+        "threshold": threshold,
+        "apps": AppService(db).find_near_duplicate_apps(threshold)
+    }
+
+@router.post("/verify-assets")
+def verify_assets_integrity(
+    update_manifest: bool = Query(False, description="Принять текущее содержимое измененных файлов"),
+    full: bool = Query(False, description="Перечитать все файлы, не сверяя размер и mtime с манифестом"),
+    limit: int = Query(100, ge=1, le=1000, description="Записей в каждом списке"),
+    offset: int = Query(0, ge=0, description="Смещение в каждом списке"),
+    db: Session = Depends(get_db)
+):
+    """
+    Проверить файлы статики: отсутствующие, лишние и измененные относительно манифеста
+
+    POST: проверка записывает хеши новых файлов в манифест (и принимает
+    измененные при update_manifest=true)
+    """
+    return AssetService(db).verify_assets(update_manifest, full, limit, offset)
+
+@router.get("/scrub", response_model=ScrubStatusResponse)
+def get_scrub_status(db: Session = Depends(get_db)):
+    """Состояние фоновой проверки целостности: позиция, время последнего среза и прохода"""
+    return {"rows_per_second": settings.SCRUB_ROWS_PER_SECOND, "state": ScrubService(db).get_state()}
+
+@router.get("/scrub/mismatches", response_model=List[ScrubMismatchResponse])
+def get_scrub_mismatches(
+    entity: Optional[Literal["app", "category"]] = Query(None, description="Тип объектов"),
+    limit: int = Query(100, ge=1, le=1000, description="Количество записей"),
+    offset: int = Query(0, ge=0, description="Смещение"),
+    db: Session = Depends(get_db)
+):
+    """Расхождения с сохраненными хешами, найденные фоновой проверкой"""
+    return ScrubService(db).get_mismatches(entity, limit, offset)
+
+def _parse_hash_check(content_type: str, body: bytes) -> HashCheckRequest:
+    """Разобрать запрос проверки хешей: JSON или компактные бинарные записи приложений"""
+    if content_type.split(";")[0].strip() == "application/octet-stream":
+        if len(body) % _HASH_RECORD.size:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Размер тела должен быть кратен {_HASH_RECORD.size} байтам"
+            )
+        return HashCheckRequest(
+            apps={app_id: digest.hex() for app_id, digest in _HASH_RECORD.iter_unpack(body)}
+        )
+    
+    try:
+        return HashCheckRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+@router.post("/check", response_model=HashCheckResponse)
+async def check_hashes(request: Request, db: Session = Depends(get_db)):
+    """
+    Проверить актуальность объектов на клиенте по data_hash
+    
+    Тело - JSON {"apps": {"<id>": "<data_hash>"}, "categories": {...}}
+    или, с Content-Type: application/octet-stream, записи приложений
+    по 36 байт: ID (uint32 little-endian) и SHA-256 (32 байта).
+    В ответе только ID, которые нужно обновить (stale), удалить (deleted)
+    или которых на сервере нет (unknown).
+    """
+    check = _parse_hash_check(request.headers.get("content-type", ""), await request.body())
+    if len(check.apps) + len(check.categories) > settings.HASH_CHECK_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Можно проверить не более {settings.HASH_CHECK_MAX_IDS} объектов за раз"
+        )
+    
+    hash_service = HashVerificationService(db)
+    return HashCheckResponse(
+        apps=hash_service.check_hashes("app", check.apps),
+        categories=hash_service.check_hashes("category", check.categories)
+    )
@@ -0,0 +1,31 @@
+"""
+API маршрут главного экрана
+"""
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.schemas.home import HomeResponse
+from app.services.home_service import HomeService
+from app.utils.catalog_version import catalog_cache
+
+router = APIRouter()
+
+def render_home(db: Session, apps_per_category: int = 10, featured_limit: int = 5) -> bytes:
+    """Данные главного экрана в JSON (кешируются до изменения каталога)"""
+    def compute() -> bytes:
+        home = HomeService(db).get_home(apps_per_category=apps_per_category, featured_limit=featured_limit)
+        return HomeResponse.model_validate(home, from_attributes=True).model_dump_json().encode()
+    
+    return catalog_cache.get_or_set(("home", apps_per_category, featured_limit), compute)
+
+# Обработчик синхронный: FastAPI выполняет его в пуле потоков, и одновременные
+# промахи кеша по одному ключу ждут одно вычисление (см. CatalogCache)
+@router.get("", response_model=HomeResponse)
+def get_home(
+    apps_per_category: int = Query(10, ge=1, le=20, description="Количество приложений в каждой категории"),
+    featured_limit: int = Query(5, ge=1, le=20, description="Количество приложений в топе"),
+    db: Session = Depends(get_db)
+):
+    """Получить категории, топ и первые приложения каждой категории одним запросом"""
+    content = render_home(db, apps_per_category=apps_per_category, featured_limit=featured_limit)
+    return Response(content=content, media_type="application/json")
@@ -0,0 +1,73 @@
+"""
+API маршруты снимка каталога
+"""
+import re
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.snapshot_service import Snapshot, snapshot_store
+
+router = APIRouter()
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Диапазон байт из заголовка Range (поддерживается один диапазон); None - отдать файл целиком"""
+    match = _RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N: последние N байт
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Запрошенный диапазон вне файла",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def _snapshot_response(request: Request, snapshot: Snapshot) -> Response:
+    headers = {
+        "ETag": snapshot.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",
+        "X-Catalog-Seq": str(snapshot.seq),
+        "Content-Disposition": f'attachment; filename="catalog-{snapshot.seq}.ndjson.gz"'
+    }
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # Докачка только того же снимка: при смене версии If-Range дает файл целиком
+    if range_header and (if_range is None or if_range == snapshot.etag):
+        byte_range = _parse_range(range_header, snapshot.size)
+    
+    if byte_range is None:
+        return Response(content=snapshot.data, media_type="application/gzip", headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{snapshot.size}"
+    # Срез memoryview над отображенным файлом - без копирования
+    return Response(
+        content=snapshot.data[start:end + 1], status_code=206, media_type="application/gzip", headers=headers
+    )
+
+@router.api_route("", methods=["GET", "HEAD"])
+async def get_catalog_snapshot(request: Request):
+    """
+    Получить снимок каталога (gzip NDJSON)
+    
+    Поддерживает If-None-Match и Range для докачки, HEAD - для проверки версии.
+    После загрузки клиент продолжает синхронизацию через
+    /api/v1/changes?since=<X-Catalog-Seq>.
+    """
+    snapshot = snapshot_store.current() or await run_in_threadpool(snapshot_store.refresh)
+    return _snapshot_response(request, snapshot)
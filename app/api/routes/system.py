@@ -0,0 +1,33 @@
+"""
+API маршруты для состояния воркера
+"""
+from fastapi import APIRouter
+from app.services.app_event_service import app_event_recorder
+from app.services.catalog_read_model import catalog_read_model
+from app.services.scrub_service import integrity_scrubber
+from app.utils.admission import admission_controller
+from app.utils.catalog_version import catalog_cache, catalog_version
+from app.utils.fragment_store import fragment_store
+from app.utils.write_queue import write_queue
+
+router = APIRouter()
+
+@router.get("/stats")
+async def get_system_stats():
+    """
+    Состояние очереди записи, кешей каталога, модели чтения, контроля допуска,
+    приема событий и фоновой проверки целостности этого воркера
+    """
+    return {
+        "catalog_version": catalog_version.current(),
+        "write_queue": write_queue.get_stats(),
+        "catalog_cache": catalog_cache.get_stats(),
+        "fragment_store": fragment_store.get_stats(),
+        "read_model": {
+            "enabled": catalog_read_model.enabled,
+            **catalog_read_model.memory_footprint()
+        },
+        "admission": admission_controller.get_stats(),
+        "app_events": app_event_recorder.get_stats(),
+        "scrubber": integrity_scrubber.get_stats()
+    }
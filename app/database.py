@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+import math
 import os
 from dotenv import load_dotenv
+from app.utils.admission import deadline_exceeded
 
 load_dotenv()
 
@@ -15,6 +17,29 @@ engine = create_engine(
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 )
 
+def _logaddexp(a, b):
+    """ln(e^a + e^b) без переполнения; NULL считается нулем (e^-inf)"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+if "sqlite" in DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL позволяет читать во время записи, busy_timeout ждет блокировку вместо ошибки"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+        # Запрос, переживший дедлайн своего HTTP-запроса, прерывается ("interrupted")
+        dbapi_connection.set_progress_handler(deadline_exceeded, 10000)
+        # Сложение чисел, хранимых логарифмами (ключ популярности приложений)
+        dbapi_connection.create_function("logaddexp", 2, _logaddexp, deterministic=True)
+
 # Создание фабрики сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -28,3 +53,15 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def commit_session(db: Session) -> None:
+    """
+    Фиксирует транзакцию сессии
+
+    Сессия очереди записи (group commit) фиксирует всю пачку сама,
+    поэтому внутри нее изменения только сбрасываются в базу.
+    """
+    if db.info.get("group_commit"):
+        db.flush()
+    else:
+        db.commit()
@@ -1,18 +1,24 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.api.routes import apps, categories, hash_verification
-from app.database import engine, Base
-
-# Создаем таблицы в базе данных
-Base.metadata.create_all(bind=engine)
+from app.api.routes import apps, archive, assets, categories, changes, hash_verification, home, snapshot, system
+from app.startup import lifespan
+from app.utils.admission import AdmissionMiddleware
+from config import settings
 
+# Схема базы данных проверяется и горячие пути прогреваются в lifespan,
+# а не при импорте модуля
 app = FastAPI(
     title="RuStore Backend API",
     description="Backend API для мобильного приложения RuStore",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Контроль допуска: лимиты клиентов, сброс нагрузки и дедлайны.
+# Подключается до CORS, чтобы отказы 429/503/504 тоже получали заголовки CORS
+app.add_middleware(AdmissionMiddleware)
+
 # Настройка CORS для работы с Android приложением
 app.add_middleware(
     CORSMiddleware,
@@ -23,12 +29,18 @@ app.add_middleware(
 )
 
 # Подключение статических файлов для иконок и изображений
-app.mount("/static", StaticFiles(directory="data"), name="static")
+app.mount("/static", StaticFiles(directory=settings.STATIC_DIR), name="static")
 
 # Подключение роутов
 app.include_router(apps.router, prefix="/api/v1/apps", tags=["apps"])
 app.include_router(categories.router, prefix="/api/v1/categories", tags=["categories"])
+app.include_router(home.router, prefix="/api/v1/home", tags=["home"])
+app.include_router(changes.router, prefix="/api/v1/changes", tags=["changes"])
+app.include_router(snapshot.router, prefix="/api/v1/snapshot", tags=["snapshot"])
 app.include_router(hash_verification.router, prefix="/api/v1/hash", tags=["hash-verification"])
+app.include_router(assets.router, prefix="/api/v1/assets", tags=["assets"])
+app.include_router(archive.router, prefix="/api/v1/archive", tags=["archive"])
+app.include_router(system.router, prefix="/api/v1/system", tags=["system"])
 
 @app.get("/")
 async def root():
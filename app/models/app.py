@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Text, ForeignKey, DateTime, Boolean, Float, Index, event, inspect
+)
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database import Base
+from app.models.app_minhash import replace_app_minhash
+from app.models.search_trigram import replace_app_trigrams
+from app.utils.text_utils import TextUtils
 
 class App(Base):
     """Модель приложения"""
@@ -24,6 +29,24 @@ class App(Base):
     rating = Column(Float, nullable=True)
     file_size = Column(Float, nullable=True)
     downloads = Column(String(64), nullable=True)
+    # Производные поля: вычисляются при записи и не входят в хеш данных
+    search_key = Column(String(1024), nullable=True)  # Название и компания для поиска (см. TextUtils.search_key)
+    downloads_count = Column(BigInteger, nullable=True)  # Загрузки числом: "10M+" -> 10000000
+    age_rating_value = Column(Integer, nullable=True)  # Возрастной рейтинг числом: "12+" -> 12
+    
+    # Частичные индексы для сортировки и фильтрации: в них только активные приложения,
+    # поэтому их размер не растет от удаленных. Условие совпадает с фильтром is_active == True
+    __table_args__ = (
+        Index("ix_apps_active_rating", "rating", sqlite_where=text("is_active = 1")),
+        Index("ix_apps_active_downloads", "downloads_count", sqlite_where=text("is_active = 1")),
+        Index("ix_apps_active_category_rating", "category_id", "rating", sqlite_where=text("is_active = 1")),
+        Index(
+            "ix_apps_active_category_downloads", "category_id", "downloads_count", sqlite_where=text("is_active = 1")
+        ),
+        Index("ix_apps_active_age_rating", "age_rating_value", sqlite_where=text("is_active = 1")),
+        # Удаленные приложения, ожидающие переноса в архив
+        Index("ix_apps_inactive", "id", sqlite_where=text("is_active = 0")),
+    )
     
     # Связи
     category = relationship("Category", back_populates="apps")
@@ -53,3 +76,27 @@ class App(Base):
             "file_size": self.file_size,
             "downloads": self.downloads
         }
+    
+    def refresh_derived_fields(self):
+        """Пересчитать производные поля по основным"""
+        self.search_key = TextUtils.search_key(f"{self.name or ''} {self.company or ''}")
+        self.downloads_count = TextUtils.parse_downloads(self.downloads)
+        self.age_rating_value = TextUtils.parse_age_rating(self.age_rating)
+
+@event.listens_for(App, "before_insert")
+@event.listens_for(App, "before_update")
+def _refresh_derived_fields(mapper, connection, target):
+    target.refresh_derived_fields()
+
+@event.listens_for(App, "after_insert")
+@event.listens_for(App, "after_update")
+def _refresh_search_trigrams(mapper, connection, target):
+    if inspect(target).attrs.search_key.history.has_changes():
+        replace_app_trigrams(connection, target.id, target.search_key)
+
+@event.listens_for(App, "after_insert")
+@event.listens_for(App, "after_update")
+def _refresh_minhash(mapper, connection, target):
+    state = inspect(target).attrs
+    if state.name.history.has_changes() or state.description.history.has_changes():
+        replace_app_minhash(connection, target.id, target.name, target.description)
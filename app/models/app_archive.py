@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Float
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class ArchivedApp(Base):
+    """Архивное приложение: мягко удаленное и перенесенное из apps по истечении срока хранения"""
+    __tablename__ = "apps_archive"
+    
+    # ID совпадает с ID приложения в apps
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=False)
+    short_description = Column(String(500), nullable=False)
+    company = Column(String(255), nullable=False)
+    icon_url = Column(String(500), nullable=False)
+    header_image_url = Column(String(500), nullable=True)
+    category_id = Column(Integer, nullable=False)  # Без внешнего ключа: категорию могут удалить позже
+    age_rating = Column(String(10), nullable=False)
+    apk_url = Column(String(500), nullable=True)
+    data_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    rating = Column(Float, nullable=True)
+    file_size = Column(Float, nullable=True)
+    downloads = Column(String(64), nullable=True)
+    archived_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    
+    # Связи
+    screenshots = relationship("ArchivedScreenshot", order_by="ArchivedScreenshot.id")
+    
+    def __repr__(self):
+        return f"<ArchivedApp(id={self.id}, name='{self.name}')>"
+
+class ArchivedScreenshot(Base):
+    """Скриншот архивного приложения"""
+    __tablename__ = "screenshots_archive"
+    
+    id = Column(Integer, primary_key=True)
+    app_id = Column(Integer, ForeignKey("apps_archive.id"), nullable=False, index=True)
+    image_url = Column(String(500), nullable=False)
+    order_index = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<ArchivedScreenshot(id={self.id}, app_id={self.app_id})>"
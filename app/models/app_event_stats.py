@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, BigInteger, Float, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class AppEventStats(Base):
+    """Счетчики просмотров и загрузок приложения и ключ популярности"""
+    __tablename__ = "app_event_stats"
+    
+    app_id = Column(Integer, ForeignKey("apps.id"), primary_key=True)
+    views = Column(BigInteger, nullable=False, default=0)
+    downloads = Column(BigInteger, nullable=False, default=0)
+    # Логарифм затухающей популярности, приведенный к началу отсчета:
+    # порядок по ключу не меняется со временем, поэтому сортировка идет по индексу
+    trending_key = Column(Float, nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<AppEventStats(app_id={self.app_id}, views={self.views}, downloads={self.downloads})>"
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, LargeBinary, ForeignKey, delete, insert
+from sqlalchemy.engine import Connection
+from app.database import Base
+from app.utils.minhash_utils import MinHashUtils
+
+class AppMinHash(Base):
+    """Сигнатура MinHash названия и описания приложения"""
+    __tablename__ = "app_minhash"
+    
+    app_id = Column(Integer, ForeignKey("apps.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)  # PERMUTATIONS значений uint32
+    
+    def __repr__(self):
+        return f"<AppMinHash(app_id={self.app_id})>"
+
+class AppLshBucket(Base):
+    """Корзина LSH приложения: приложения в одной корзине - кандидаты в почти дубликаты"""
+    __tablename__ = "app_lsh_buckets"
+    
+    # Первичный ключ начинается с корзины: соседи по корзине находятся по индексу
+    band = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    app_id = Column(Integer, ForeignKey("apps.id"), primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f"<AppLshBucket(band={self.band}, bucket={self.bucket}, app_id={self.app_id})>"
+
+def replace_app_minhash(connection: Connection, app_id: int, name: str, description: str) -> None:
+    """Заменить сигнатуру и корзины LSH приложения по новым названию и описанию"""
+    connection.execute(delete(AppMinHash.__table__).where(AppMinHash.app_id == app_id))
+    connection.execute(delete(AppLshBucket.__table__).where(AppLshBucket.app_id == app_id))
+    signature = MinHashUtils.signature(f"{name or ''} {description or ''}")
+    if signature is None:
+        return
+    connection.execute(insert(AppMinHash.__table__).values(app_id=app_id, signature=MinHashUtils.to_bytes(signature)))
+    connection.execute(
+        insert(AppLshBucket.__table__),
+        [{"band": band, "bucket": bucket, "app_id": app_id} for band, bucket in MinHashUtils.bands(signature)]
+    )
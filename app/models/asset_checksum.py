@@ -0,0 +1,16 @@
+from sqlalchemy import Column, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class AssetChecksum(Base):
+    """Контрольная сумма статического файла (манифест проверки файлов)"""
+    __tablename__ = "asset_checksums"
+    
+    path = Column(String(500), primary_key=True)  # Путь относительно каталога статики
+    size = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    verified_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<AssetChecksum(path='{self.path}', sha256='{self.sha256}')>"
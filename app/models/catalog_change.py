@@ -0,0 +1,78 @@
+from typing import Any, Dict, List, Set
+from sqlalchemy import Column, Integer, String, DateTime, Index, delete, event, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.database import Base
+from app.models.app import App
+from app.models.category import Category
+from app.utils.catalog_version import CatalogChange
+
+class CatalogChangeRecord(Base):
+    """Запись журнала изменений каталога для синхронизации клиентов"""
+    __tablename__ = "catalog_changes"
+    
+    # AUTOINCREMENT: номера не переиспользуются даже после удаления последней записи
+    seq = Column(Integer, primary_key=True)
+    entity = Column(String(16), nullable=False)  # "app" | "category"
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(8), nullable=False)  # "upsert" | "delete"
+    data_hash = Column(String(64), nullable=True)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_catalog_changes_entity", "entity", "entity_id"),
+        {"sqlite_autoincrement": True},
+    )
+    
+    def __repr__(self):
+        return f"<CatalogChangeRecord(seq={self.seq}, entity='{self.entity}', entity_id={self.entity_id}, op='{self.op}')>"
+
+def catalog_change_rows(connection: Any, changes: Set[CatalogChange]) -> List[Dict[str, Any]]:
+    """
+    Записи журнала для набора измененных объектов
+    
+    Операция определяется по текущему состоянию в транзакции: объект есть
+    (и приложение активно) - upsert с его хешем, иначе - delete (надгробие)
+    """
+    rows = []
+    for entity, model in (("app", App), ("category", Category)):
+        ids = sorted(entity_id for changed_entity, entity_id in changes if changed_entity == entity)
+        if not ids:
+            continue
+        query = select(model.id, model.data_hash).where(model.id.in_(ids))
+        if model is App:
+            query = query.where(App.is_active == True)
+        hashes = dict(connection.execute(query).all())
+        rows.extend(
+            {
+                "entity": entity,
+                "entity_id": entity_id,
+                "op": "upsert" if entity_id in hashes else "delete",
+                "data_hash": hashes.get(entity_id)
+            }
+            for entity_id in ids
+        )
+    return rows
+
+def write_catalog_changes(connection: Any, changes: Set[CatalogChange]) -> None:
+    """Добавить записи журнала, удалив предыдущие записи тех же объектов"""
+    rows = catalog_change_rows(connection, changes)
+    if not rows:
+        return
+    table = CatalogChangeRecord.__table__
+    for entity in {row["entity"] for row in rows}:
+        connection.execute(delete(table).where(
+            table.c.entity == entity,
+            table.c.entity_id.in_([row["entity_id"] for row in rows if row["entity"] == entity])
+        ))
+    connection.execute(insert(table), rows)
+
+@event.listens_for(Session, "before_commit")
+def _write_catalog_changes(session: Session) -> None:
+    # Журнал пишется в той же транзакции, что и сами изменения
+    if session.in_nested_transaction():
+        return
+    changes = session.info.get("catalog_changes")
+    if changes:
+        session.flush()
+        write_catalog_changes(session.connection(), changes)
@@ -8,7 +8,7 @@ class Screenshot(Base):
     __tablename__ = "screenshots"
     
     id = Column(Integer, primary_key=True, index=True)
-    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False)
+    app_id = Column(Integer, ForeignKey("apps.id"), nullable=False, index=True)
     image_url = Column(String(500), nullable=False)
     order_index = Column(Integer, default=0)  # Порядок отображения скриншотов
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ScrubState(Base):
+    """Позиция фоновой проверки целостности по одному типу объектов"""
+    __tablename__ = "scrub_state"
+    
+    entity = Column(String(16), primary_key=True)  # "app" или "category"
+    cursor = Column(Integer, nullable=False, default=0)  # ID последнего проверенного объекта
+    # Раньше этого момента (Unix time) следующий срез не берется: бюджет общий для всех воркеров
+    next_slice_at = Column(Float, nullable=False, default=0)
+    last_verified_at = Column(DateTime(timezone=True), nullable=True)  # Время последнего среза
+    pass_started_at = Column(DateTime(timezone=True), nullable=True)
+    last_pass_completed_at = Column(DateTime(timezone=True), nullable=True)
+    passes = Column(Integer, nullable=False, default=0)
+    verified_rows = Column(BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<ScrubState(entity='{self.entity}', cursor={self.cursor})>"
+
+class ScrubMismatch(Base):
+    """Объект, данные которого не совпали с сохраненным хешем при фоновой проверке"""
+    __tablename__ = "scrub_mismatches"
+    
+    entity = Column(String(16), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    issue = Column(String(64), nullable=False)
+    stored_hash = Column(String(64), nullable=True)
+    calculated_hash = Column(String(64), nullable=True)
+    detected_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ScrubMismatch(entity='{self.entity}', entity_id={self.entity_id})>"
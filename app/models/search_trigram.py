@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, delete, insert
+from sqlalchemy.engine import Connection
+from app.database import Base
+from app.utils.text_utils import TextUtils
+
+class AppSearchTrigram(Base):
+    """Триграмма ключа поиска приложения (индекс для нечеткого поиска)"""
+    __tablename__ = "app_search_trigrams"
+    
+    # Первичный ключ начинается с триграммы: поиск кандидатов идет по индексу
+    trigram = Column(String(3), primary_key=True)
+    app_id = Column(Integer, ForeignKey("apps.id"), primary_key=True, index=True)
+    
+    def __repr__(self):
+        return f"<AppSearchTrigram(trigram='{self.trigram}', app_id={self.app_id})>"
+
+def replace_app_trigrams(connection: Connection, app_id: int, search_key: str) -> None:
+    """Заменить триграммы приложения триграммами нового ключа поиска"""
+    table = AppSearchTrigram.__table__
+    connection.execute(delete(table).where(table.c.app_id == app_id))
+    trigrams = TextUtils.trigrams(search_key or "")
+    if trigrams:
+        connection.execute(insert(table), [{"trigram": trigram, "app_id": app_id} for trigram in trigrams])
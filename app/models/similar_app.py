@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, LargeBinary
+from app.database import Base
+
+class SimilarApp(Base):
+    """Похожее приложение (предрасчитанный ближайший сосед)"""
+    __tablename__ = "app_similar"
+    
+    # Первичный ключ (app_id, rank): соседи приложения читаются одним проходом по индексу
+    app_id = Column(Integer, ForeignKey("apps.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    similar_app_id = Column(Integer, ForeignKey("apps.id"), nullable=False, index=True)
+    score = Column(Float, nullable=False)
+    
+    def __repr__(self):
+        return f"<SimilarApp(app_id={self.app_id}, rank={self.rank}, similar_app_id={self.similar_app_id})>"
+
+class AppSimilarityState(Base):
+    """Хеш данных приложения, по которому последний раз рассчитаны соседи"""
+    __tablename__ = "app_similarity_state"
+    
+    app_id = Column(Integer, ForeignKey("apps.id"), primary_key=True)
+    data_hash = Column(String(64), nullable=True)
+    # Вектор частот признаков до взвешивания IDF (размерность, индексы int32, значения float32):
+    # пересчет не перечитывает и не разбирает тексты неизменившихся приложений
+    vector = Column(LargeBinary, nullable=True)
+    
+    def __repr__(self):
+        return f"<AppSimilarityState(app_id={self.app_id}, data_hash='{self.data_hash}')>"
+
+class AppSimilarityLease(Base):
+    """Аренда пересчета похожих приложений: пересчитывает один воркер за раз"""
+    __tablename__ = "app_similarity_lease"
+    
+    id = Column(Integer, primary_key=True)  # Единственная строка с id = 1
+    owner = Column(String(64), nullable=True)  # Воркер, который сейчас пересчитывает
+    # Аренда действует до этого момента (Unix time), потом ее может взять другой воркер
+    expires_at = Column(Float, nullable=False, default=0)
+    # Номер журнала изменений каталога, по которому выполнен последний пересчет
+    catalog_seq = Column(Integer, nullable=True)
+    
+    def __repr__(self):
+        return f"<AppSimilarityLease(owner='{self.owner}', expires_at={self.expires_at})>"
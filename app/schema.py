@@ -0,0 +1,227 @@
+"""
+Проверка версии схемы базы данных и миграции
+"""
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import Column, Integer, Table, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.database import Base, engine
+# Модели импортируются, чтобы все таблицы попали в Base.metadata
+# (catalog_change также подключает запись журнала изменений при COMMIT)
+from app.models.app import App  # noqa: F401
+from app.models.app_archive import ArchivedApp, ArchivedScreenshot  # noqa: F401
+from app.models.app_event_stats import AppEventStats  # noqa: F401
+from app.models.app_minhash import AppLshBucket, AppMinHash, replace_app_minhash  # noqa: F401
+from app.models.asset_checksum import AssetChecksum  # noqa: F401
+from app.models.catalog_change import CatalogChangeRecord, write_catalog_changes  # noqa: F401
+from app.models.category import Category  # noqa: F401
+from app.models.screenshot import Screenshot  # noqa: F401
+from app.models.scrub import ScrubMismatch, ScrubState  # noqa: F401
+from app.models.search_trigram import AppSearchTrigram, replace_app_trigrams  # noqa: F401
+from app.models.similar_app import AppSimilarityLease, AppSimilarityState, SimilarApp  # noqa: F401
+from app.utils.hash_utils import CATEGORY_HASH_FIELDS, HashUtils
+from app.utils.text_utils import TextUtils
+
+# Текущая версия схемы. Увеличивается вместе с добавлением миграции в MIGRATIONS
+SCHEMA_VERSION = 13
+# Сколько воркер ждет, пока другой процесс обновляет схему, с
+_SCHEMA_LOCK_TIMEOUT = 300
+
+schema_version_table = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", Integer, nullable=False)
+)
+
+
+def _add_column(conn: Connection, table: str, column: str, column_type: str) -> None:
+    """Добавить столбец, если его еще нет"""
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+
+
+def _migrate_to_2(conn: Connection) -> None:
+    """Ключ поиска приложений и его триграммы"""
+    _add_column(conn, "apps", "search_key", "VARCHAR(1024)")
+    apps = App.__table__
+    for app_id, name, company in conn.execute(select(apps.c.id, apps.c.name, apps.c.company)).all():
+        search_key = TextUtils.search_key(f"{name or ''} {company or ''}")
+        conn.execute(update(apps).where(apps.c.id == app_id).values(search_key=search_key))
+        replace_app_trigrams(conn, app_id, search_key)
+
+
+def _migrate_to_3(conn: Connection) -> None:
+    """Числовые загрузки и возрастной рейтинг приложений с индексами"""
+    _add_column(conn, "apps", "downloads_count", "BIGINT")
+    _add_column(conn, "apps", "age_rating_value", "INTEGER")
+    apps = App.__table__
+    for app_id, downloads, age_rating in conn.execute(
+        select(apps.c.id, apps.c.downloads, apps.c.age_rating)
+    ).all():
+        conn.execute(update(apps).where(apps.c.id == app_id).values(
+            downloads_count=TextUtils.parse_downloads(downloads),
+            age_rating_value=TextUtils.parse_age_rating(age_rating)
+        ))
+    for index in apps.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _migrate_to_4(conn: Connection) -> None:
+    """Таблицы похожих приложений (создаются create_all, соседи рассчитываются при запуске)"""
+
+
+def _migrate_to_5(conn: Connection) -> None:
+    """Сигнатуры MinHash и корзины LSH приложений"""
+    apps = App.__table__
+    for app_id, name, description in conn.execute(select(apps.c.id, apps.c.name, apps.c.description)).all():
+        replace_app_minhash(conn, app_id, name, description)
+
+
+def _migrate_to_6(conn: Connection) -> None:
+    """Журнал изменений каталога: текущее состояние как первые записи"""
+    apps, categories = App.__table__, Category.__table__
+    changes = {("category", category_id) for (category_id,) in conn.execute(select(categories.c.id)).all()}
+    changes.update(
+        ("app", app_id) for (app_id,) in conn.execute(select(apps.c.id).where(apps.c.is_active == True)).all()
+    )
+    write_catalog_changes(conn, changes)
+
+
+def _migrate_to_7(conn: Connection) -> None:
+    """Счетчики событий приложений (таблица создается create_all и заполняется событиями)"""
+
+
+def _migrate_to_8(conn: Connection) -> None:
+    """
+    Частичные индексы активных приложений вместо индексов с is_active
+    и индекс скриншотов по приложению (таблицы архива создаются create_all)
+    """
+    for index in App.__table__.indexes:
+        if index.name.startswith(("ix_apps_active_", "ix_apps_inactive")):
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            index.create(conn)
+    for index in Screenshot.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _migrate_to_9(conn: Connection) -> None:
+    """Состояние и расхождения фоновой проверки целостности (таблицы создаются create_all)"""
+
+
+def _migrate_to_10(conn: Connection) -> None:
+    """Манифест контрольных сумм статических файлов (таблица создается create_all)"""
+
+
+def _migrate_to_11(conn: Connection) -> None:
+    """Аренда пересчета похожих приложений (таблица создается create_all)"""
+
+
+def _migrate_to_12(conn: Connection) -> None:
+    """Векторы частот признаков приложений (без вектора приложение пересчитывается как изменившееся)"""
+    _add_column(conn, "app_similarity_state", "vector", "BLOB")
+
+
+def _migrate_to_13(conn: Connection) -> None:
+    """Хеши категорий без apps_count (изменения попадают в журнал, чтобы клиенты обновили хеши)"""
+    categories = Category.__table__
+    changes = set()
+    for row in conn.execute(select(categories.c.id, *[categories.c[field] for field in CATEGORY_HASH_FIELDS])).all():
+        data_hash = HashUtils.calculate_category_hash({field: row._mapping[field] for field in CATEGORY_HASH_FIELDS})
+        conn.execute(update(categories).where(categories.c.id == row.id).values(data_hash=data_hash))
+        changes.add(("category", row.id))
+    write_catalog_changes(conn, changes)
+
+
+# Миграции существующих баз: версия -> функция, приводящая схему к этой версии
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {
+    2: _migrate_to_2,
+    3: _migrate_to_3,
+    4: _migrate_to_4,
+    5: _migrate_to_5,
+    6: _migrate_to_6,
+    7: _migrate_to_7,
+    8: _migrate_to_8,
+    9: _migrate_to_9,
+    10: _migrate_to_10,
+    11: _migrate_to_11,
+    12: _migrate_to_12,
+    13: _migrate_to_13
+}
+
+
+def get_schema_version(conn: Connection) -> int:
+    """Версия схемы базы данных (0, если таблицы версии еще нет)"""
+    try:
+        version = conn.execute(select(schema_version_table.c.version)).scalar()
+    except DBAPIError:
+        conn.rollback()
+        return 0
+    return version or 0
+
+
+def ensure_schema(bind: Engine = engine) -> Dict[str, int]:
+    """
+    Приводит схему базы данных к текущей версии
+
+    В обычном случае выполняет один SELECT. Таблицы создаются и миграции
+    применяются, только если версия в базе отстает от SCHEMA_VERSION.
+    Обновление выполняется под блокировкой базы (BEGIN EXCLUSIVE для SQLite),
+    поэтому одновременно стартующие воркеры не мигрируют схему дважды.
+
+    Returns:
+        Словарь с версией до и после проверки
+    """
+    with bind.connect() as conn:
+        current = get_schema_version(conn)
+    if current == SCHEMA_VERSION:
+        return {"from": current, "to": current}
+
+    with bind.connect() as conn:
+        # Воркеры стартуют одновременно: схему обновляет один, остальные ждут блокировку
+        # и перечитывают версию, которую он уже поднял
+        _lock_schema(conn)
+        current = _read_locked_schema_version(conn)
+        if current != SCHEMA_VERSION:
+            # Новая база сразу создается в актуальной версии, миграции ей не нужны
+            fresh = not inspect(conn).has_table(App.__tablename__)
+            Base.metadata.create_all(bind=conn)
+            if not fresh:
+                for version in range(max(current, 1) + 1, SCHEMA_VERSION + 1):
+                    MIGRATIONS[version](conn)
+
+            conn.execute(schema_version_table.delete())
+            conn.execute(schema_version_table.insert().values(version=SCHEMA_VERSION))
+        conn.commit()
+
+    return {"from": current, "to": SCHEMA_VERSION}
+
+
+def _lock_schema(conn: Connection) -> None:
+    """
+    Начать транзакцию обновления схемы, исключающую другие процессы
+
+    Для SQLite - BEGIN EXCLUSIVE: блокировка ждется дольше busy_timeout,
+    пока миграцию выполняет другой воркер.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    deadline = time.monotonic() + _SCHEMA_LOCK_TIMEOUT
+    while True:
+        try:
+            conn.exec_driver_sql("BEGIN EXCLUSIVE")
+            return
+        except OperationalError as e:
+            conn.rollback()
+            if "locked" not in str(e) or time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def _read_locked_schema_version(conn: Connection) -> int:
+    """Версия схемы внутри транзакции обновления (ошибка отсутствующей таблицы откатила бы ее)"""
+    if not inspect(conn).has_table(schema_version_table.name):
+        return 0
+    return conn.execute(select(schema_version_table.c.version)).scalar() or 0
@@ -1,7 +1,10 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional, List
+from typing import Optional, List, Literal, Union
 from datetime import datetime
 
+# Порядок сортировки списков приложений
+AppSort = Literal["rating", "downloads", "newest", "name"]
+
 class ScreenshotBase(BaseModel):
     """Базовая схема скриншота"""
     image_url: str
@@ -82,3 +85,67 @@ class AppListResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class FacetValue(BaseModel):
+    """Значение фасета и количество подходящих приложений"""
+    value: Union[int, str]
+    count: int
+
+class AppFacets(BaseModel):
+    """Счетчики фасетов списка приложений"""
+    category_id: List[FacetValue] = []
+    age_rating: List[FacetValue] = []
+    rating_band: List[FacetValue] = []
+
+class AppFacetedListResponse(BaseModel):
+    """Схема списка приложений с общим количеством и фасетами"""
+    items: List[AppListResponse]
+    total: int
+    facets: AppFacets
+
+class AppBatchRequest(BaseModel):
+    """Схема запроса нескольких приложений по ID"""
+    ids: List[int]
+
+class AppBatchResponse(BaseModel):
+    """Схема ответа с несколькими приложениями"""
+    apps: List[AppResponse]
+    missing: List[int] = []
+
+class AppBulkUpdateItem(AppUpdate):
+    """Частичное обновление одного приложения в пакетном запросе"""
+    id: int
+
+class AppBulkUpdateRequest(BaseModel):
+    """Схема пакетного обновления приложений"""
+    updates: List[AppBulkUpdateItem]
+
+class AppBulkUpdateResult(BaseModel):
+    """Результат обновления одного приложения"""
+    id: int
+    status: Literal["updated", "unchanged", "not_found", "conflict"]
+    data_hash: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    detail: Optional[str] = None
+
+class AppBulkUpdateResponse(BaseModel):
+    """Результаты пакетного обновления в порядке запроса"""
+    results: List[AppBulkUpdateResult]
+
+class AppEvent(BaseModel):
+    """Событие приложения: просмотр страницы или загрузка"""
+    app_id: int
+    type: Literal["view", "download"]
+
+class AppEventBatch(BaseModel):
+    """Схема пачки событий приложений"""
+    events: List[AppEvent]
+
+class AppSuggestion(BaseModel):
+    """Схема подсказки поиска"""
+    id: int
+    name: str
+    company: str
+    icon_url: str
+    rating: Optional[float] = None
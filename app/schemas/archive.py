@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from app.schemas.app import AppBase, ScreenshotResponse
+
+class ArchivedAppResponse(AppBase):
+    """Схема ответа архивного приложения"""
+    id: int
+    data_hash: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    archived_at: datetime
+    screenshots: List[ScreenshotResponse] = []
+    
+    class Config:
+        from_attributes = True
+
+class ArchiveRunResponse(BaseModel):
+    """Результат переноса в архив"""
+    archived_apps: int
+    archived_screenshots: int
+    chunks: int
+    cutoff: datetime
+
+class ArchiveStatsResponse(BaseModel):
+    """Размер горячих и архивных таблиц"""
+    active_apps: int
+    inactive_apps: int
+    screenshots: int
+    archived_apps: int
+    archived_screenshots: int
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+class AssetResponse(BaseModel):
+    """Загруженный файл: URL для icon_url, header_image_url, apk_url или image_url скриншота"""
+    url: str
+    sha256: str
+    size: int
+    deduplicated: bool  # Такой файл уже был сохранен раньше
+    
+    class Config:
+        from_attributes = True
+
+class AssetGcResponse(BaseModel):
+    """Результат сборки мусора в хранилище файлов"""
+    blobs: int
+    referenced: int
+    recent: int  # Файлы без ссылок, еще не вышедшие из срока ожидания
+    removed: int
+    freed_bytes: int
+    dry_run: bool
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import datetime
+from app.schemas.app import AppResponse
+from app.schemas.category import CategoryResponse
+
+class CatalogChangeResponse(BaseModel):
+    """Изменение каталога: новое состояние объекта или надгробие"""
+    seq: int
+    entity: Literal["app", "category"]
+    entity_id: int
+    op: Literal["upsert", "delete"]
+    data_hash: Optional[str] = None
+    changed_at: Optional[datetime] = None
+    app: Optional[AppResponse] = None
+    category: Optional[CategoryResponse] = None
+
+class CatalogChangesResponse(BaseModel):
+    """Страница журнала изменений каталога"""
+    changes: List[CatalogChangeResponse]
+    next_since: int
+    has_more: bool
@@ -0,0 +1,59 @@
+"""
+Разреженные наборы полей ответа (?fields=)
+"""
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, TypeAdapter, create_model
+
+# Набор полей - кортеж имен в порядке полей схемы
+FieldSet = Tuple[str, ...]
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[FieldSet]:
+    """
+    Разобрать параметр fields и проверить поля по схеме ответа
+    
+    Args:
+        fields: Имена полей через запятую или None
+        schema: Схема ответа, из полей которой можно выбирать
+        
+    Returns:
+        Кортеж полей в порядке схемы (один набор - один ключ кеша) или None,
+        если параметр не передан
+    """
+    if fields is None:
+        return None
+    
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested:
+        raise HTTPException(status_code=400, detail="Не указано ни одного поля")
+    
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля: {', '.join(sorted(unknown))}. Доступны: {', '.join(schema.model_fields)}"
+        )
+    
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+@lru_cache(maxsize=256)
+def fieldset_model(schema: Type[BaseModel], fields: FieldSet) -> Type[BaseModel]:
+    """Схема ответа, урезанная до набора полей (создается один раз на набор)"""
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (schema.model_fields[name].annotation, schema.model_fields[name])
+            for name in fields
+        }
+    )
+
+
+@lru_cache(maxsize=256)
+def fieldset_list_adapter(schema: Type[BaseModel], fields: FieldSet) -> TypeAdapter:
+    """Адаптер списка урезанной схемы ответа"""
+    return TypeAdapter(List[fieldset_model(schema, fields)])
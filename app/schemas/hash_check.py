@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Dict, List
+
+class HashCheckRequest(BaseModel):
+    """Хеши объектов, сохраненных на клиенте: {ID: data_hash}"""
+    apps: Dict[int, str] = {}
+    categories: Dict[int, str] = {}
+
+class HashCheckResult(BaseModel):
+    """ID объектов, которые клиенту нужно обновить или удалить"""
+    stale: List[int] = []
+    deleted: List[int] = []
+    unknown: List[int] = []
+
+class HashCheckResponse(BaseModel):
+    """Результат проверки актуальности"""
+    apps: HashCheckResult
+    categories: HashCheckResult
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List
+from app.schemas.app import AppListResponse
+from app.schemas.category import CategoryResponse
+
+class HomeCategoryResponse(CategoryResponse):
+    """Категория на главном экране с первыми приложениями"""
+    apps: List[AppListResponse] = []
+
+class HomeResponse(BaseModel):
+    """Схема ответа главного экрана"""
+    featured: List[AppListResponse]
+    categories: List[HomeCategoryResponse]
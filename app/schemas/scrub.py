@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class ScrubStateResponse(BaseModel):
+    """Позиция фоновой проверки по типу объектов"""
+    entity: str
+    cursor: int
+    last_verified_at: Optional[datetime] = None
+    pass_started_at: Optional[datetime] = None
+    last_pass_completed_at: Optional[datetime] = None
+    passes: int
+    verified_rows: int
+    mismatches: int
+
+class ScrubStatusResponse(BaseModel):
+    """Состояние фоновой проверки целостности"""
+    rows_per_second: float
+    state: List[ScrubStateResponse]
+
+class ScrubMismatchResponse(BaseModel):
+    """Расхождение, найденное фоновой проверкой"""
+    entity: str
+    entity_id: int
+    issue: str
+    stored_hash: Optional[str] = None
+    calculated_hash: Optional[str] = None
+    detected_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
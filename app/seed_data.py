@@ -6,11 +6,13 @@ import json
 from pathlib import Path
 sys.stdout.reconfigure(encoding='utf-8')
 
-from app.database import SessionLocal, engine
+from app.database import SessionLocal
 from app.models.app import App
 from app.models.category import Category
 from app.models.screenshot import Screenshot
-from app.database import Base
+from app.schema import ensure_schema
+from app.services.similarity_service import SimilarityService
+from app.utils.catalog_version import mark_catalog_changed
 from app.utils.hash_utils import HashUtils
 
 def load_categories_from_json():
@@ -50,12 +52,14 @@ def create_categories():
                     existing_by_name.tag = cat_data["tag"]
                     existing_by_name.tag_color = cat_data["tag_color"]
                     existing_by_name.data_hash = expected_hash
+                    mark_catalog_changed(db, "category", existing_by_name.id)
                     print(f"   🔄 Обновлена категория: {cat_data['name']}")
                 else:
                     # Создаем новую категорию
                     category.data_hash = expected_hash  # Устанавливаем хеш перед сохранением
                     db.add(category)
                     db.flush()  # Получаем ID категории
+                    mark_catalog_changed(db, "category", category.id)
                     print(f"   ✅ Создана категория: {cat_data['name']}")
         
         db.commit()
@@ -144,6 +148,7 @@ def create_apps():
                     existing_by_name.file_size = app_data["file_size"]
                     existing_by_name.downloads = app_data["downloads"]
                     existing_by_name.data_hash = expected_hash
+                    mark_catalog_changed(db, "app", existing_by_name.id)
                     
                     # Удаляем старые скриншоты
                     db.query(Screenshot).filter(Screenshot.app_id == existing_by_name.id).delete()
@@ -164,6 +169,7 @@ def create_apps():
                     
                     db.add(app)
                     db.flush()  # Получаем ID приложения
+                    mark_catalog_changed(db, "app", app.id)
                     
                     # Добавляем скриншоты
                     for i, screenshot_url in enumerate(app_data["screenshots"]):
@@ -189,7 +195,7 @@ def seed_database():
     print("Начинаем заполнение базы данных...")
     
     # Создаем таблицы
-    Base.metadata.create_all(bind=engine)
+    ensure_schema()
     print("✅ Таблицы созданы")
     
     # Создаем категории
@@ -198,6 +204,14 @@ def seed_database():
     # Создаем приложения
     create_apps()
     
+    # Рассчитываем похожие приложения
+    db = SessionLocal()
+    try:
+        SimilarityService(db).refresh()
+        print("✅ Похожие приложения рассчитаны")
+    finally:
+        db.close()
+    
     print("База данных успешно заполнена!")
 
 if __name__ == "__main__":
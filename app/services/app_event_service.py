@@ -0,0 +1,228 @@
+"""
+Просмотры и загрузки приложений и популярность с затуханием
+"""
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, commit_session
+from app.models.app import App
+from app.models.app_event_stats import AppEventStats
+from config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+EVENT_TYPES = ("view", "download")
+# Начало отсчета ключа популярности
+_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+# Размер пачки ID в условиях IN
+_IN_CHUNK = 500
+
+
+def trending_rate() -> float:
+    """Скорость затухания популярности, 1/с (вклад события уменьшается вдвое за TRENDING_HALF_LIFE_HOURS)"""
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+class AppEventService:
+    """
+    Агрегаты событий приложений
+
+    Популярность - сумма весов событий, каждый из которых затухает
+    как e^(-λ·возраст). В базе хранится ее логарифм, приведенный
+    к началу отсчета: trending_key = ln(Σ w·e^(λ·t)). Все популярности
+    затухают одинаково, поэтому порядок по ключу не зависит от текущего
+    времени и список популярных - чтение индекса. Новая пачка событий
+    складывается с ключом функцией logaddexp прямо в UPSERT.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply(self, counts: Dict[int, List[int]], now: float) -> int:
+        """
+        Добавить пачку событий к агрегатам
+
+        Args:
+            counts: {ID приложения: [просмотры, загрузки]}
+            now: Время пачки (Unix time)
+
+        Returns:
+            Количество приложений, счетчики которых обновлены
+        """
+        offset = trending_rate() * (now - _EPOCH)
+        ids = sorted(counts)
+        rows = []
+        for start in range(0, len(ids), _IN_CHUNK):
+            # События удаленных и несуществующих приложений отбрасываются
+            active = self.db.execute(
+                select(App.id).where(App.id.in_(ids[start:start + _IN_CHUNK]), App.is_active == True)
+            ).scalars()
+            for app_id in active:
+                views, downloads = counts[app_id]
+                weight = views * settings.TRENDING_VIEW_WEIGHT + downloads * settings.TRENDING_DOWNLOAD_WEIGHT
+                if weight <= 0:
+                    continue
+                rows.append({
+                    "app_id": app_id,
+                    "views": views,
+                    "downloads": downloads,
+                    "trending_key": math.log(weight) + offset
+                })
+        if not rows:
+            return 0
+
+        statement = insert(AppEventStats)
+        statement = statement.on_conflict_do_update(
+            index_elements=[AppEventStats.app_id],
+            set_={
+                "views": AppEventStats.views + statement.excluded.views,
+                "downloads": AppEventStats.downloads + statement.excluded.downloads,
+                "trending_key": func.logaddexp(AppEventStats.trending_key, statement.excluded.trending_key),
+                "updated_at": func.now()
+            }
+        )
+        self.db.execute(statement, rows)
+        commit_session(self.db)
+        return len(rows)
+
+    def get_trending_apps(self, category_id: Optional[int] = None, limit: int = 20) -> List[App]:
+        """Популярные приложения: проход по индексу trending_key"""
+        query = self.db.query(App).join(AppEventStats, AppEventStats.app_id == App.id).filter(App.is_active == True)
+        if category_id:
+            query = query.filter(App.category_id == category_id)
+        return query.order_by(AppEventStats.trending_key.desc()).limit(limit).all()
+
+
+class _Shard:
+    __slots__ = ("lock", "counts", "recorded", "dropped")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[int, List[int]] = {}
+        self.recorded = 0
+        self.dropped = 0
+
+
+class AppEventRecorder:
+    """
+    Прием событий в памяти воркера и периодическая запись агрегатов
+
+    Событие - увеличение счетчика в словаре одного из шардов (шард выбирается
+    по ID приложения, у каждого своя блокировка), без обращения к базе.
+    Раз в APP_EVENTS_FLUSH_INTERVAL фоновый поток забирает накопленные
+    счетчики и записывает их одним UPSERT на пачку. Если запись не удалась,
+    счетчики возвращаются в шарды и уйдут со следующей пачкой.
+    """
+
+    def __init__(
+        self,
+        shards: int = settings.APP_EVENTS_SHARDS,
+        max_pending: int = settings.APP_EVENTS_MAX_PENDING,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self._shards = [_Shard() for _ in range(shards)]
+        # Ограничение числа приложений с незаписанными событиями (на шард)
+        self._max_pending = max(1, max_pending // shards)
+        self._session_factory = session_factory
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats = {"flushes": 0, "failed_flushes": 0, "flushed_apps": 0, "last_flush_ms": 0.0}
+
+    def record(self, app_id: int, event_type: str, count: int = 1) -> bool:
+        """Учесть событие; False - событие отброшено, потому что буфер полон"""
+        index = EVENT_TYPES.index(event_type)
+        shard = self._shards[app_id % len(self._shards)]
+        with shard.lock:
+            entry = shard.counts.get(app_id)
+            if entry is None:
+                if len(shard.counts) >= self._max_pending:
+                    shard.dropped += count
+                    return False
+                entry = shard.counts[app_id] = [0, 0]
+            entry[index] += count
+            shard.recorded += count
+        return True
+
+    def flush(self) -> int:
+        """Записать накопленные события; возвращает количество обновленных приложений"""
+        with self._flush_lock:
+            batch: Dict[int, List[int]] = {}
+            for shard in self._shards:
+                with shard.lock:
+                    counts, shard.counts = shard.counts, {}
+                batch.update(counts)
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            db = self._session_factory()
+            try:
+                flushed = AppEventService(db).apply(batch, time.time())
+            except Exception:
+                db.rollback()
+                self._stats["failed_flushes"] += 1
+                self._restore(batch)
+                raise
+            finally:
+                db.close()
+            self._stats["flushes"] += 1
+            self._stats["flushed_apps"] += flushed
+            self._stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+            return flushed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики приема и записи событий"""
+        recorded = dropped = pending = 0
+        for shard in self._shards:
+            with shard.lock:
+                recorded += shard.recorded
+                dropped += shard.dropped
+                pending += len(shard.counts)
+        return {"recorded": recorded, "dropped": dropped, "pending_apps": pending, **self._stats}
+
+    def start(self) -> None:
+        """Запустить фоновую запись"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="app-events", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановить фоновую запись и записать оставшиеся события"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning("App events flush failed: %s", e)
+
+    def _restore(self, batch: Dict[int, List[int]]) -> None:
+        for app_id, (views, downloads) in batch.items():
+            shard = self._shards[app_id % len(self._shards)]
+            with shard.lock:
+                entry = shard.counts.setdefault(app_id, [0, 0])
+                entry[0] += views
+                entry[1] += downloads
+
+    def _run(self) -> None:
+        while not self._stopping.wait(settings.APP_EVENTS_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("App events flush failed: %s", e)
+
+
+app_event_recorder = AppEventRecorder()
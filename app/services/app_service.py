@@ -1,33 +1,135 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import Session, aliased, selectinload
+from sqlalchemy import and_, case, func, select, update
+import math
+from itertools import groupby
+from typing import List, Optional, Dict, Any, Sequence
+from app.database import commit_session
 from app.models.app import App
+from app.models.app_minhash import AppLshBucket, AppMinHash, replace_app_minhash
 from app.models.screenshot import Screenshot
-from app.schemas.app import AppCreate, AppUpdate
+from app.models.search_trigram import AppSearchTrigram, replace_app_trigrams
+from app.schemas.app import AppBulkUpdateItem, AppCreate, AppUpdate
+from app.services.catalog_read_model import catalog_read_model
+from app.utils.catalog_version import mark_catalog_changed
 from app.utils.hash_utils import HashUtils
+from app.utils.minhash_utils import MinHashUtils
+from app.utils.text_utils import TextUtils
+from config import settings
 from fastapi import HTTPException
 
+# Строк в одном UPDATE пакетного обновления (ограничение числа параметров SQLite)
+_BULK_UPDATE_CHUNK = 200
+# Производные поля, которые пакетное обновление пересчитывает само
+_DERIVED_FIELDS = ("search_key", "downloads_count", "age_rating_value")
+
 class AppService:
     """Сервис для работы с приложениями"""
     
     def __init__(self, db: Session):
         self.db = db
     
-    def get_apps(self, category_id: Optional[int] = None, limit: int = 50, offset: int = 0) -> List[App]:
-        """Получить список приложений"""
-        query = self.db.query(App).filter(App.is_active == True)
+    def get_apps(
+        self,
+        category_id: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0,
+        sort: Optional[str] = None,
+        max_age: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[App]:
+        """
+        Получить список приложений
+        
+        Если передан набор полей, читаются только эти столбцы (строки вместо объектов App)
+        """
+        if catalog_read_model.enabled:
+            if sort:
+                self._sort_order(sort)
+            return catalog_read_model.get_apps(category_id, limit, offset, sort, max_age)
+        
+        query = self.db.query(*self._columns(fields)) if fields else self.db.query(App)
+        query = query.filter(App.is_active == True)
         
         if category_id:
             query = query.filter(App.category_id == category_id)
+        if max_age is not None:
+            query = query.filter(App.age_rating_value <= max_age)
+        if sort:
+            query = query.order_by(*self._sort_order(sort))
+        elif fields:
+            # Выборка нескольких столбцов может пойти по покрывающему индексу в другом порядке
+            query = query.order_by(App.id)
         
         return query.offset(offset).limit(limit).all()
     
+    @staticmethod
+    def _sort_order(sort: str) -> list:
+        """Выражения ORDER BY для сортировки списка (используют составные индексы)"""
+        if sort == "rating":
+            return [App.rating.desc(), App.id]
+        if sort == "downloads":
+            return [App.downloads_count.desc(), App.id]
+        if sort == "newest":
+            return [App.id.desc()]
+        if sort == "name":
+            return [App.name, App.id]
+        raise HTTPException(status_code=400, detail=f"Неизвестная сортировка: {sort}")
+    
     def get_app_by_id(self, app_id: int) -> Optional[App]:
         """Получить приложение по ID"""
         return self.db.query(App).filter(
             and_(App.id == app_id, App.is_active == True)
         ).first()
     
+    def get_app_fragment_key(self, app_id: int) -> Optional[tuple]:
+        """
+        Все, от чего зависит AppResponse приложения, без загрузки объекта
+        
+        data_hash не покрывает время изменения и скриншоты, поэтому они
+        добавляются к ключу явно: (id, data_hash, updated_at, скриншоты).
+        None - приложения нет или оно неактивно.
+        """
+        row = self.db.query(App.data_hash, App.updated_at).filter(
+            and_(App.id == app_id, App.is_active == True)
+        ).first()
+        if not row:
+            return None
+        
+        screenshots = self.db.query(
+            Screenshot.id, Screenshot.image_url, Screenshot.order_index, Screenshot.created_at
+        ).filter(Screenshot.app_id == app_id).order_by(Screenshot.id).all()
+        return (app_id, row.data_hash, row.updated_at, tuple(tuple(screenshot) for screenshot in screenshots))
+    
+    def get_app_fields(self, app_id: int, fields: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """Получить только указанные поля приложения (скриншоты - только если запрошены)"""
+        row = self.db.query(App.id, *self._columns(fields)).filter(
+            and_(App.id == app_id, App.is_active == True)
+        ).first()
+        if not row:
+            return None
+        
+        data = dict(row._mapping)
+        if "screenshots" in fields:
+            data["screenshots"] = self.db.query(Screenshot).filter(
+                Screenshot.app_id == app_id
+            ).order_by(Screenshot.id).all()
+        return data
+    
+    @staticmethod
+    def _columns(fields: Sequence[str]) -> list:
+        """Столбцы приложения для набора полей ответа (связи загружаются отдельно)"""
+        return [getattr(App, name) for name in fields if name != "screenshots"]
+    
+    def get_apps_by_ids(self, app_ids: List[int]) -> List[App]:
+        """Получить активные приложения по списку ID вместе со скриншотами"""
+        if not app_ids:
+            return []
+        
+        # Два запроса на любое количество ID: приложения и все их скриншоты
+        return self.db.query(App).options(selectinload(App.screenshots)).filter(
+            and_(App.id.in_(app_ids), App.is_active == True)
+        ).all()
+    
     def get_app_by_hash(self, data_hash: str) -> Optional[App]:
         """Получить приложение по хешу данных"""
         return self.db.query(App).filter(
@@ -74,8 +176,11 @@ class AppService:
         # Вычисляем и сохраняем хеш данных
         app_dict = HashUtils.get_data_for_hash(app)
         app.data_hash = HashUtils.calculate_app_hash(app_dict)
+        mark_catalog_changed(self.db, "app", app.id)
+        # Изменился apps_count категории
+        mark_catalog_changed(self.db, "category", app.category_id)
         
-        self.db.commit()
+        commit_session(self.db)
         self.db.refresh(app)
         return app
     
@@ -109,17 +214,143 @@ class AppService:
             raise HTTPException(status_code=400, detail="Приложение с такими данными уже существует")
         
         # Применяем обновления
+        old_category_id = app.category_id
         for field, value in update_data.items():
             setattr(app, field, value)
         
         # Пересчитываем хеш после обновления
         app_dict = HashUtils.get_data_for_hash(app)
         app.data_hash = HashUtils.calculate_app_hash(app_dict)
+        mark_catalog_changed(self.db, "app", app.id)
+        if app.category_id != old_category_id:
+            # apps_count изменился у обеих категорий
+            mark_catalog_changed(self.db, "category", old_category_id)
+            mark_catalog_changed(self.db, "category", app.category_id)
         
-        self.db.commit()
+        commit_session(self.db)
         self.db.refresh(app)
         return app
     
+    def bulk_update_apps(self, updates: List[AppBulkUpdateItem]) -> List[Dict[str, Any]]:
+        """
+        Пакетное частичное обновление приложений в одной транзакции
+        
+        Приложения читаются одним запросом, хеши пересчитываются в памяти,
+        совпадения хешей с другими приложениями проверяются одним запросом,
+        изменения записываются одним UPDATE ... CASE ... RETURNING на пачку строк.
+        Такие UPDATE обходят события модели App, поэтому производные поля,
+        триграммы поиска и MinHash поддерживаются здесь явно.
+        
+        Returns:
+            Результат по каждому элементу в порядке запроса
+        """
+        table = App.__table__
+        app_ids = list(dict.fromkeys(item.id for item in updates))
+        rows = {
+            row["id"]: dict(row)
+            for row in self.db.execute(
+                select(table).where(table.c.id.in_(app_ids), table.c.is_active == True)
+            ).mappings()
+        }
+        
+        # Новые значения и хеши считаются в памяти
+        results: List[Dict[str, Any]] = []
+        planned: List[tuple] = []
+        seen = set()
+        for item in updates:
+            row = rows.get(item.id)
+            if row is None:
+                results.append({"id": item.id, "status": "not_found", "detail": "Приложение не найдено"})
+                continue
+            if item.id in seen:
+                results.append({"id": item.id, "status": "conflict", "detail": "ID повторяется в запросе"})
+                continue
+            seen.add(item.id)
+            values = {**row, **item.dict(exclude_unset=True, exclude={"id"})}
+            temp_app = App(**{column: values[column] for column in table.columns.keys()})
+            temp_app.refresh_derived_fields()
+            for field in _DERIVED_FIELDS:
+                values[field] = getattr(temp_app, field)
+            values["data_hash"] = HashUtils.calculate_app_hash(HashUtils.get_data_for_hash(temp_app))
+            planned.append((item.id, values, len(results)))
+            results.append({"id": item.id})
+        
+        # Владельцы хешей: приложения из запроса (пока со старыми хешами) и остальные приложения с новыми хешами
+        owners = {row["data_hash"]: app_id for app_id, row in rows.items() if row["data_hash"]}
+        new_hashes = {values["data_hash"] for _, values, _ in planned}
+        for app_id, data_hash in self.db.execute(
+            select(table.c.id, table.c.data_hash).where(table.c.data_hash.in_(new_hashes), table.c.is_active == True)
+        ).all():
+            if app_id not in rows:
+                owners[data_hash] = app_id
+        
+        changed: Dict[int, Dict[str, Any]] = {}
+        for app_id, values, index in planned:
+            row = rows[app_id]
+            owner = owners.get(values["data_hash"])
+            if owner is not None and owner != app_id:
+                results[index].update(
+                    status="conflict", data_hash=row["data_hash"], detail="Приложение с такими данными уже существует"
+                )
+                continue
+            diff = {column: value for column, value in values.items() if row[column] != value}
+            if not diff:
+                results[index].update(status="unchanged", data_hash=row["data_hash"], updated_at=row["updated_at"])
+                continue
+            if owners.get(row["data_hash"]) == app_id:
+                del owners[row["data_hash"]]
+            owners[values["data_hash"]] = app_id
+            changed[app_id] = diff
+            results[index].update(status="updated", data_hash=values["data_hash"])
+        
+        if changed:
+            returned = self._apply_bulk_update(changed)
+            connection = self.db.connection()
+            for app_id, diff in changed.items():
+                values = {**rows[app_id], **diff}
+                if "search_key" in diff:
+                    replace_app_trigrams(connection, app_id, values["search_key"])
+                if "name" in diff or "description" in diff:
+                    replace_app_minhash(connection, app_id, values["name"], values["description"])
+                mark_catalog_changed(self.db, "app", app_id)
+                if "category_id" in diff:
+                    mark_catalog_changed(self.db, "category", rows[app_id]["category_id"])
+                    mark_catalog_changed(self.db, "category", diff["category_id"])
+            for result in results:
+                if result.get("status") == "updated":
+                    result["updated_at"] = returned[result["id"]]
+            # Загруженные в сессию объекты этих приложений устарели после UPDATE в обход ORM
+            for obj in list(self.db.identity_map.values()):
+                if isinstance(obj, App) and obj.id in changed:
+                    self.db.expire(obj)
+        
+        commit_session(self.db)
+        return results
+    
+    def _apply_bulk_update(self, changed: Dict[int, Dict[str, Any]]) -> Dict[int, Any]:
+        """Записать изменения пачками UPDATE ... SET столбец = CASE id ... RETURNING; возвращает updated_at по ID"""
+        table = App.__table__
+        returned = {}
+        items = list(changed.items())
+        for start in range(0, len(items), _BULK_UPDATE_CHUNK):
+            chunk = items[start:start + _BULK_UPDATE_CHUNK]
+            columns = sorted({column for _, diff in chunk for column in diff})
+            statement = (
+                update(table)
+                .where(table.c.id.in_([app_id for app_id, _ in chunk]))
+                .values({
+                    column: case(
+                        {app_id: diff[column] for app_id, diff in chunk if column in diff},
+                        value=table.c.id,
+                        else_=table.c[column]
+                    )
+                    for column in columns
+                })
+                .returning(table.c.id, table.c.updated_at)
+            )
+            returned.update(self.db.execute(statement).all())
+        return returned
+    
     def delete_app(self, app_id: int) -> bool:
         """Удалить приложение (мягкое удаление)"""
         app = self.get_app_by_id(app_id)
@@ -127,17 +358,64 @@ class AppService:
             return False
         
         app.is_active = False
-        self.db.commit()
+        mark_catalog_changed(self.db, "app", app.id)
+        commit_session(self.db)
         return True
     
-    def search_apps(self, query: str, limit: int = 50, offset: int = 0) -> List[App]:
-        """Поиск приложений по названию и описанию"""
-        return self.db.query(App).filter(
-            and_(
-                App.is_active == True,
-                App.name.ilike(f"%{query}%")
-            )
-        ).offset(offset).limit(limit).all()
+    def search_apps(
+        self,
+        query: str,
+        limit: int = 50,
+        offset: int = 0,
+        sort: Optional[str] = None,
+        max_age: Optional[int] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[App]:
+        """
+        Нечеткий поиск приложений по названию и компании
+        
+        Запрос и названия сравниваются по ключу поиска (регистр Unicode,
+        ё=е, транслитерация), поэтому "вк музыка" находит "VK Music".
+        Кандидаты выбираются по индексу триграмм и сортируются по доле
+        совпавших триграмм запроса, что прощает опечатки, если не задана
+        другая сортировка. Если передан набор полей, читаются только эти
+        столбцы (строки вместо объектов App).
+        """
+        candidates = self._search_candidates(query)
+        if candidates is None:
+            return []
+        
+        apps = self.db.query(*self._columns(fields)) if fields else self.db.query(App)
+        apps = apps.join(candidates, App.id == candidates.c.app_id).filter(
+            App.is_active == True
+        )
+        if max_age is not None:
+            apps = apps.filter(App.age_rating_value <= max_age)
+        if sort:
+            apps = apps.order_by(*self._sort_order(sort))
+        else:
+            apps = apps.order_by(candidates.c.matched.desc(), func.length(App.search_key), App.id)
+        
+        return apps.offset(offset).limit(limit).all()
+    
+    def search_app_ids(self, query: str) -> List[int]:
+        """ID всех приложений, найденных поиском (без пагинации, только по индексу триграмм)"""
+        candidates = self._search_candidates(query)
+        if candidates is None:
+            return []
+        return [app_id for (app_id,) in self.db.query(candidates.c.app_id).all()]
+    
+    def _search_candidates(self, query: str):
+        """Подзапрос (app_id, matched) с кандидатами поиска из индекса триграмм"""
+        query_trigrams = TextUtils.trigrams(TextUtils.search_key(query))
+        if not query_trigrams:
+            return None
+        min_matched = max(1, math.ceil(len(query_trigrams) * settings.SEARCH_SIMILARITY_THRESHOLD))
+        
+        matched = func.count(AppSearchTrigram.trigram).label("matched")
+        return select(AppSearchTrigram.app_id, matched).where(
+            AppSearchTrigram.trigram.in_(query_trigrams)
+        ).group_by(AppSearchTrigram.app_id).having(matched >= min_matched).subquery()
     
     def verify_app_integrity(self, app_id: int) -> bool:
         """Проверка целостности данных приложения"""
@@ -157,35 +435,104 @@ class AppService:
         app_dict = HashUtils.get_data_for_hash(app)
         new_hash = HashUtils.calculate_app_hash(app_dict)
         app.data_hash = new_hash
+        mark_catalog_changed(self.db, "app", app.id)
         
-        self.db.commit()
+        commit_session(self.db)
         return new_hash
     
     def get_featured_apps(self, limit: int = 5) -> List[App]:
         """Получить топ приложений по рейтингу"""
+        if catalog_read_model.enabled:
+            return catalog_read_model.get_featured_apps(limit)
+        
         return self.db.query(App).filter(
             and_(App.is_active == True, App.rating.isnot(None))
         ).order_by(App.rating.desc()).limit(limit).all()
     
     def find_duplicate_apps(self) -> List[Dict[str, Any]]:
         """Найти дублирующиеся приложения по хешу"""
-        from sqlalchemy import func
+        # Хеши, которые встречаются более одного раза
+        duplicate_hashes = select(App.data_hash).where(App.is_active == True).group_by(
+            App.data_hash
+        ).having(func.count(App.id) > 1)
         
-        # Находим хеши, которые встречаются более одного раза
-        duplicate_hashes = self.db.query(App.data_hash).filter(
-            App.is_active == True
-        ).group_by(App.data_hash).having(func.count(App.id) > 1).all()
+        # Все приложения с такими хешами - одним запросом, сгруппированные по хешу
+        rows = self.db.query(App.data_hash, App.id, App.name).filter(
+            and_(App.is_active == True, App.data_hash.in_(duplicate_hashes))
+        ).order_by(App.data_hash, App.id).all()
         
         duplicates = []
-        for (data_hash,) in duplicate_hashes:
-            apps_with_same_hash = self.db.query(App).filter(
-                and_(App.data_hash == data_hash, App.is_active == True)
-            ).all()
-            
+        for data_hash, group in groupby(rows, key=lambda row: row.data_hash):
+            apps = [{"id": row.id, "name": row.name} for row in group]
             duplicates.append({
                 "hash": data_hash,
-                "count": len(apps_with_same_hash),
-                "apps": [{"id": app.id, "name": app.name} for app in apps_with_same_hash]
+                "count": len(apps),
+                "apps": apps
             })
         
         return duplicates
+    
+    def find_near_duplicate_apps(self, threshold: float = settings.NEAR_DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+        """
+        Найти почти одинаковые приложения по названию и описанию
+        
+        Кандидаты - пары приложений, попавшие в одну корзину LSH хотя бы
+        в одной полосе сигнатуры MinHash (один запрос по индексу корзин).
+        Для кандидатов сходство оценивается по сигнатурам, пары выше порога
+        объединяются в группы.
+        
+        Args:
+            threshold: Минимальная оценка коэффициента Жаккара шинглов
+            
+        Returns:
+            Группы почти одинаковых приложений с попарными оценками сходства
+        """
+        first, second = aliased(AppLshBucket), aliased(AppLshBucket)
+        first_app, second_app = aliased(App), aliased(App)
+        candidates = self.db.query(first.app_id, second.app_id).join(
+            second, and_(second.band == first.band, second.bucket == first.bucket, second.app_id > first.app_id)
+        ).join(first_app, first_app.id == first.app_id).join(second_app, second_app.id == second.app_id).filter(
+            and_(first_app.is_active == True, second_app.is_active == True)
+        ).distinct().all()
+        if not candidates:
+            return []
+        
+        app_ids = sorted({app_id for pair in candidates for app_id in pair})
+        apps = {}
+        for start in range(0, len(app_ids), 500):
+            for app_id, name, signature in self.db.query(App.id, App.name, AppMinHash.signature).join(
+                AppMinHash, AppMinHash.app_id == App.id
+            ).filter(App.id.in_(app_ids[start:start + 500])):
+                apps[app_id] = (name, MinHashUtils.from_bytes(signature))
+        
+        # Объединение пар в группы (система непересекающихся множеств)
+        parent = {}
+        
+        def find(app_id: int) -> int:
+            while parent.setdefault(app_id, app_id) != app_id:
+                parent[app_id] = parent[parent[app_id]]
+                app_id = parent[app_id]
+            return app_id
+        
+        pairs = []
+        for first_id, second_id in candidates:
+            similarity = MinHashUtils.similarity(apps[first_id][1], apps[second_id][1])
+            if similarity >= threshold:
+                pairs.append({"app_ids": [first_id, second_id], "similarity": round(similarity, 3)})
+                parent[find(second_id)] = find(first_id)
+        
+        groups: Dict[int, Dict[str, Any]] = {}
+        for pair in sorted(pairs, key=lambda p: (-p["similarity"], p["app_ids"])):
+            group = groups.setdefault(find(pair["app_ids"][0]), {"app_ids": set(), "pairs": []})
+            group["app_ids"].update(pair["app_ids"])
+            group["pairs"].append(pair)
+        
+        result = [
+            {
+                "count": len(group["app_ids"]),
+                "apps": [{"id": app_id, "name": apps[app_id][0]} for app_id in sorted(group["app_ids"])],
+                "pairs": group["pairs"]
+            }
+            for group in groups.values()
+        ]
+        return sorted(result, key=lambda g: (-g["count"], g["apps"][0]["id"]))
@@ -0,0 +1,160 @@
+"""
+Сервис архива удаленных приложений
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.database import commit_session
+from app.models.app import App
+from app.models.app_archive import ArchivedApp, ArchivedScreenshot
+from app.models.app_event_stats import AppEventStats
+from app.models.app_minhash import AppLshBucket, AppMinHash
+from app.models.screenshot import Screenshot
+from app.models.search_trigram import AppSearchTrigram
+from app.models.similar_app import AppSimilarityState, SimilarApp
+from app.utils.catalog_version import mark_catalog_changed
+from app.utils.write_queue import write_queue
+from config import settings
+
+
+class ArchiveService:
+    """
+    Перенос мягко удаленных приложений в архивные таблицы
+
+    delete_app только снимает is_active, поэтому apps и screenshots копят
+    мертвые строки. Приложения, неактивные дольше срока хранения, вместе
+    со скриншотами копируются в apps_archive и screenshots_archive и
+    удаляются из горячих таблиц и производных данных (триграммы, MinHash,
+    похожие, счетчики событий). Каждая пачка - отдельная операция очереди
+    записи, поэтому запись каталога не блокируется надолго и не конкурирует
+    с писателем за блокировку базы. Перенос меняет apps_count категорий и
+    счетчики главного экрана, поэтому приложения и их категории отмечаются
+    измененными и кеши каталога сбрасываются.
+
+    Записи журнала изменений остаются: по ним клиенты узнают об удалении,
+    а проверка хешей отличает удаленные ID от неизвестных.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def archive_inactive_apps(
+        self,
+        retention_days: float = settings.ARCHIVE_RETENTION_DAYS,
+        chunk_size: int = settings.ARCHIVE_CHUNK_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Перенести в архив приложения, неактивные дольше retention_days
+
+        Returns:
+            Количество перенесенных приложений и скриншотов, число пачек и граница срока хранения
+        """
+        # Время хранится в UTC без часового пояса (CURRENT_TIMESTAMP SQLite)
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days)
+
+        result = {"archived_apps": 0, "archived_screenshots": 0, "chunks": 0, "cutoff": cutoff}
+        while True:
+            apps, screenshots = write_queue.submit_sync(
+                lambda db: ArchiveService(db)._archive_next_chunk(cutoff, chunk_size)
+            )
+            if not apps:
+                break
+            result["archived_apps"] += apps
+            result["archived_screenshots"] += screenshots
+            result["chunks"] += 1
+            if apps < chunk_size:
+                break
+        return result
+
+    def _archive_next_chunk(self, cutoff: datetime, chunk_size: int) -> Tuple[int, int]:
+        """Перенести следующую пачку (операция очереди записи); возвращает число приложений и скриншотов"""
+        # Приложение с наибольшим ID не переносится: иначе SQLite выдаст его ID новому приложению
+        max_id = select(func.max(App.id)).scalar_subquery()
+        ids = self.db.execute(
+            select(App.id)
+            .where(
+                App.is_active == False,
+                func.coalesce(App.updated_at, App.created_at) < cutoff,
+                App.id < max_id
+            )
+            .order_by(App.id)
+            .limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return 0, 0
+
+        category_ids = self.db.execute(
+            select(App.category_id).where(App.id.in_(ids)).distinct()
+        ).scalars().all()
+        screenshots = self._archive_chunk(ids)
+        for app_id in ids:
+            mark_catalog_changed(self.db, "app", app_id)
+        for category_id in category_ids:
+            mark_catalog_changed(self.db, "category", category_id)
+        commit_session(self.db)
+        return len(ids), screenshots
+
+    def _archive_chunk(self, ids: List[int]) -> int:
+        """Скопировать пачку приложений со скриншотами в архив и удалить их из горячих таблиц"""
+        archived_at = literal(datetime.now(timezone.utc).replace(tzinfo=None), ArchivedApp.archived_at.type)
+
+        app_columns = [column.name for column in ArchivedApp.__table__.columns if column.name != "archived_at"]
+        self.db.execute(
+            insert(ArchivedApp).from_select(
+                app_columns + ["archived_at"],
+                select(*[App.__table__.c[name] for name in app_columns], archived_at).where(App.id.in_(ids))
+            )
+        )
+        screenshot_columns = [column.name for column in ArchivedScreenshot.__table__.columns]
+        self.db.execute(
+            insert(ArchivedScreenshot).from_select(
+                screenshot_columns,
+                select(*[Screenshot.__table__.c[name] for name in screenshot_columns]).where(Screenshot.app_id.in_(ids))
+            )
+        )
+
+        screenshots = self.db.execute(delete(Screenshot).where(Screenshot.app_id.in_(ids))).rowcount
+        for model in (AppSearchTrigram, AppMinHash, AppLshBucket, AppSimilarityState, AppEventStats):
+            self.db.execute(delete(model).where(model.app_id.in_(ids)))
+        self.db.execute(delete(SimilarApp).where(or_(SimilarApp.app_id.in_(ids), SimilarApp.similar_app_id.in_(ids))))
+        self.db.execute(delete(App).where(App.id.in_(ids)))
+        return screenshots
+
+    def get_archived_apps(self, limit: int = 50, offset: int = 0) -> List[ArchivedApp]:
+        """Архивные приложения, последние перенесенные первыми"""
+        return (
+            self.db.query(ArchivedApp)
+            .options(selectinload(ArchivedApp.screenshots))
+            .order_by(ArchivedApp.archived_at.desc(), ArchivedApp.id.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    def get_archived_app(self, app_id: int) -> Optional[ArchivedApp]:
+        """Архивное приложение со скриншотами"""
+        return (
+            self.db.query(ArchivedApp)
+            .options(selectinload(ArchivedApp.screenshots))
+            .filter(ArchivedApp.id == app_id)
+            .first()
+        )
+
+    def get_stats(self) -> Dict[str, int]:
+        """Размер горячих и архивных таблиц в строках"""
+        active, inactive = self.db.execute(
+            select(
+                func.count().filter(App.is_active == True),
+                func.count().filter(App.is_active == False)
+            )
+        ).one()
+        return {
+            "active_apps": active,
+            "inactive_apps": inactive,
+            "screenshots": self.db.scalar(select(func.count()).select_from(Screenshot)),
+            "archived_apps": self.db.scalar(select(func.count()).select_from(ArchivedApp)),
+            "archived_screenshots": self.db.scalar(select(func.count()).select_from(ArchivedScreenshot))
+        }
@@ -0,0 +1,237 @@
+"""
+Сервис загружаемых файлов: сборка мусора в хранилище и проверка статических файлов
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select, union
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.database import commit_session
+from app.models.app import App
+from app.models.app_archive import ArchivedApp, ArchivedScreenshot
+from app.models.asset_checksum import AssetChecksum
+from app.models.screenshot import Screenshot
+from app.utils.admission import request_deadline
+from app.utils.asset_store import STATIC_URL_PREFIX, asset_store, hash_file
+from config import settings
+
+# Доля оставшегося до дедлайна запроса времени, отводимая на хеширование;
+# остаток - на сохранение манифеста
+_HASH_TIME_SHARE = 0.8
+
+
+class AssetService:
+    """Сервис загружаемых файлов"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_referenced_urls(self) -> Set[str]:
+        """
+        Все URL файлов, на которые ссылаются приложения и скриншоты
+
+        Учитываются и удаленные, и архивные приложения: их можно восстановить
+        или получить из архива вместе с файлами.
+        """
+        query = union(*[
+            select(column).where(column.isnot(None))
+            for column in (
+                App.icon_url, App.header_image_url, App.apk_url, Screenshot.image_url,
+                ArchivedApp.icon_url, ArchivedApp.header_image_url, ArchivedApp.apk_url, ArchivedScreenshot.image_url
+            )
+        ])
+        return set(self.db.execute(query).scalars())
+
+    def collect_garbage(
+        self,
+        grace_hours: float = settings.ASSET_GC_GRACE_HOURS,
+        dry_run: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Сборка мусора: отметить файлы, на которые есть ссылки, и удалить остальные,
+        если они старше grace_hours
+        """
+        return asset_store.sweep(self.get_referenced_urls(), grace_hours * 3600, dry_run)
+
+    def verify_assets(
+        self,
+        update_manifest: bool = False,
+        full: bool = False,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Проверить статические файлы, на которые ссылаются активные приложения и скриншоты
+
+        - missing: файла по ссылке /static/... нет в каталоге статики
+        - orphaned: файл в каталогах приложений, на который не ссылается ни одна
+          строка (включая удаленные и архивные приложения)
+        - modified: содержимое не совпадает с манифестом asset_checksums или,
+          для файлов хранилища, с хешем в имени
+
+        Файлы с теми же размером и mtime, что в манифесте, не перечитываются
+        (full=True - перечитать все). Остальные хешируются через mmap в пуле
+        из ASSET_SCAN_WORKERS потоков. Новые файлы заносятся в манифест;
+        измененные - только при update_manifest=True, иначе расхождение
+        сообщается при каждой проверке. Если до дедлайна запроса хеширование
+        не закончено, результат отмечается complete=False, а уже посчитанные
+        хеши сохраняются, так что следующий запуск продолжит работу.
+
+        Списки missing, orphaned и modified возвращаются страницей
+        (limit записей каждого списка начиная с offset), количества - полные.
+        """
+        references, external = self._get_active_references()
+        referenced_paths = {
+            path for path in (asset_store.resolve(url) for url in self.get_referenced_urls()) if path
+        }
+
+        files: Dict[str, os.stat_result] = dict(asset_store.iter_asset_files())
+        orphaned = [
+            {"path": path, "size": stat.st_size}
+            for path, stat in sorted(files.items()) if path not in referenced_paths
+        ]
+        missing = []
+        for path in sorted(references):
+            if path in files:
+                continue
+            full_path = os.path.join(asset_store.root, path)
+            if os.path.isfile(full_path):
+                files[path] = os.stat(full_path)
+            else:
+                missing.append({"url": STATIC_URL_PREFIX + path, "references": references[path]})
+
+        manifest = {
+            row.path: row for row in self.db.execute(
+                select(AssetChecksum.path, AssetChecksum.size, AssetChecksum.mtime_ns, AssetChecksum.sha256)
+            )
+        }
+        to_hash = [
+            path for path, stat in sorted(files.items())
+            if full or path not in manifest
+            or (manifest[path].size, manifest[path].mtime_ns) != (stat.st_size, stat.st_mtime_ns)
+        ]
+        hashed, pending = self._hash_files(to_hash)
+
+        modified = []
+        checksums = []
+        for path, digest in hashed.items():
+            stat = files[path]
+            expected = asset_store.blob_digest(path) or (manifest[path].sha256 if path in manifest else None)
+            if expected is not None and digest != expected:
+                modified.append({
+                    "path": path,
+                    "expected_sha256": expected,
+                    "actual_sha256": digest,
+                    "references": references.get(path, [])
+                })
+                if not update_manifest:
+                    continue
+            checksums.append({"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest})
+
+        if checksums:
+            statement = insert(AssetChecksum)
+            self.db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[AssetChecksum.path],
+                    set_={
+                        "size": statement.excluded.size,
+                        "mtime_ns": statement.excluded.mtime_ns,
+                        "sha256": statement.excluded.sha256,
+                        "verified_at": statement.excluded.verified_at
+                    }
+                ),
+                checksums
+            )
+        # Суммы пропавших файлов хранятся, пока на файл есть ссылка: восстановленный файл сверяется с ними
+        stale = [path for path in manifest if path not in files and path not in referenced_paths]
+        for start in range(0, len(stale), 500):
+            self.db.execute(delete(AssetChecksum).where(AssetChecksum.path.in_(stale[start:start + 500])))
+        commit_session(self.db)
+
+        modified.sort(key=lambda item: item["path"])
+        return {
+            "complete": not pending,
+            "files": len(files),
+            "hashed": len(hashed),
+            "skipped_unchanged": len(files) - len(to_hash),
+            "pending": len(pending),
+            "bytes_hashed": sum(files[path].st_size for path in hashed),
+            "external_urls": external,
+            "missing_count": len(missing),
+            "orphaned_count": len(orphaned),
+            "modified_count": len(modified),
+            "missing": missing[offset:offset + limit],
+            "orphaned": orphaned[offset:offset + limit],
+            "modified": modified[offset:offset + limit]
+        }
+
+    def _get_active_references(self) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+        """Файлы статики, на которые ссылаются активные приложения и их скриншоты, и число внешних URL"""
+        references: Dict[str, List[Dict[str, Any]]] = {}
+        external = 0
+
+        def add(url: Optional[str], entity: str, entity_id: int, field: str) -> None:
+            nonlocal external
+            if not url:
+                return
+            path = asset_store.resolve(url)
+            if path is None:
+                external += 1
+                return
+            references.setdefault(path, []).append({"entity": entity, "id": entity_id, "field": field})
+
+        apps = self.db.execute(
+            select(App.id, App.icon_url, App.header_image_url, App.apk_url).where(App.is_active.is_(True))
+        )
+        for app_id, icon_url, header_image_url, apk_url in apps:
+            add(icon_url, "app", app_id, "icon_url")
+            add(header_image_url, "app", app_id, "header_image_url")
+            add(apk_url, "app", app_id, "apk_url")
+        screenshots = self.db.execute(
+            select(Screenshot.id, Screenshot.image_url)
+            .join(App, App.id == Screenshot.app_id)
+            .where(App.is_active.is_(True))
+        )
+        for screenshot_id, image_url in screenshots:
+            add(image_url, "screenshot", screenshot_id, "image_url")
+        return references, external
+
+    @staticmethod
+    def _hash_files(paths: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        Хеши файлов в пуле потоков
+
+        Returns:
+            Хеши по путям и пути, до которых не дошла очередь до дедлайна запроса
+            (а также пропавшие во время проверки файлы)
+        """
+        deadline = request_deadline.get()
+        stop_at = None
+        if deadline is not None:
+            now = time.monotonic()
+            stop_at = now + max(0.0, deadline - now) * _HASH_TIME_SHARE
+
+        def hash_one(path: str) -> Optional[str]:
+            # Потоки пула не видят контекст запроса: дедлайн передается явно
+            if stop_at is not None and time.monotonic() > stop_at:
+                return None
+            try:
+                return hash_file(os.path.join(asset_store.root, path))
+            except FileNotFoundError:
+                return None
+
+        hashed: Dict[str, str] = {}
+        pending: List[str] = []
+        if not paths:
+            return hashed, pending
+        with ThreadPoolExecutor(max_workers=settings.ASSET_SCAN_WORKERS, thread_name_prefix="asset-scan") as pool:
+            for path, digest in zip(paths, pool.map(hash_one, paths)):
+                if digest is None:
+                    pending.append(path)
+                else:
+                    hashed[path] = digest
+        return hashed, pending
@@ -0,0 +1,198 @@
+"""
+Базовый класс индексов каталога в памяти воркера
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.catalog_change import CatalogChangeRecord
+from app.utils.catalog_version import CatalogChange, catalog_version
+
+logger = logging.getLogger("uvicorn.error")
+
+# Приложений в одном запросе при догоняющем обновлении
+_CATCH_UP_CHUNK = 500
+
+
+def _on_event_loop() -> bool:
+    """Выполняется ли код в потоке цикла событий (а не в пуле потоков)"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class CatalogIndex:
+    """
+    Индекс каталога в памяти воркера, согласованный с версией каталога
+
+    Индекс строится целиком один раз (при прогреве или первом обращении).
+    Записи в этом воркере применяются точечно: после COMMIT перечитываются
+    только измененные приложения. Если версия каталога ушла вперед из-за
+    записи в другом воркере, индекс догоняет ее по журналу изменений:
+    перечитываются только приложения с записями журнала после последней
+    учтенной (журнал хранит последнюю запись каждого объекта). Из цикла
+    событий догоняющее обновление запускается в фоне, а запрос получает
+    прежний индекс; из пула потоков оно выполняется сразу.
+
+    Наследники реализуют загрузку строк и их добавление и удаление.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._version: Optional[int] = None
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._catch_up_lock = threading.Lock()
+        self._catch_up_thread: Optional[threading.Thread] = None
+        catalog_version.subscribe(self._on_catalog_change)
+
+    @property
+    def built(self) -> bool:
+        """Построен ли индекс"""
+        return self._version is not None
+
+    def ensure_fresh(self) -> None:
+        """Догнать изменения каталога, сделанные в других воркерах"""
+        if self._version is None:
+            self.ensure_built()
+        elif self._version != catalog_version.current():
+            if _on_event_loop():
+                self._start_catch_up()
+            else:
+                self.catch_up()
+
+    def ensure_built(self) -> None:
+        """Построить индекс, если он еще не построен (одно построение на все ждущие запросы)"""
+        if self._version is None:
+            with self._catch_up_lock:
+                if self._version is None:
+                    self._rebuild()
+
+    def rebuild(self) -> None:
+        """Полностью перестроить индекс"""
+        with self._catch_up_lock:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        version = catalog_version.current()
+        db = self._session_factory()
+        try:
+            # Номер журнала читается до строк: изменения после него будут применены повторно
+            seq = self._current_seq(db)
+            rows = self._load_rows(db)
+        finally:
+            db.close()
+        with self._lock:
+            self._reset()
+            self._bulk_load(rows)
+            self._after_change()
+            self._version = version
+            self._seq = seq
+
+    def catch_up(self) -> None:
+        """Применить изменения приложений из журнала, пока индекс отстает от версии каталога"""
+        with self._catch_up_lock:
+            while self._version is not None and self._version != catalog_version.current():
+                # Версия растет после COMMIT, поэтому записи журнала всех учтенных ею изменений уже видны
+                version = catalog_version.current()
+                db = self._session_factory()
+                try:
+                    seq = self._current_seq(db)
+                    app_ids = list(db.execute(
+                        select(CatalogChangeRecord.entity_id).where(
+                            CatalogChangeRecord.entity == "app",
+                            CatalogChangeRecord.seq > self._seq,
+                            CatalogChangeRecord.seq <= seq
+                        )
+                    ).scalars())
+                    rows = [
+                        row
+                        for start in range(0, len(app_ids), _CATCH_UP_CHUNK)
+                        for row in self._load_rows(db, app_ids[start:start + _CATCH_UP_CHUNK])
+                    ]
+                finally:
+                    db.close()
+                with self._lock:
+                    self._apply(app_ids, rows)
+                    self._version = version
+                    self._seq = seq
+
+    def _start_catch_up(self) -> None:
+        with self._lock:
+            if self._catch_up_thread and self._catch_up_thread.is_alive():
+                return
+            self._catch_up_thread = threading.Thread(
+                target=self._run_catch_up, name=f"{type(self).__name__}-catch-up", daemon=True
+            )
+            self._catch_up_thread.start()
+
+    def _run_catch_up(self) -> None:
+        try:
+            self.catch_up()
+        except Exception as e:
+            logger.warning("%s catch-up failed: %s", type(self).__name__, e)
+
+    def _on_catalog_change(self, changes: Set[CatalogChange], version: int) -> None:
+        """Точечно обновить изменившиеся приложения после записи в этом воркере"""
+        with self._lock:
+            if self._version is None:
+                return
+            if version != self._version + 1:
+                # Пропущены изменения других воркеров - догоним по журналу при следующем обращении
+                return
+
+            app_ids = [entity_id for entity, entity_id in changes if entity == "app"]
+            if app_ids:
+                self._apply(app_ids, self._fetch_rows(app_ids))
+            self._version = version
+
+    def _apply(self, app_ids: List[int], rows: List[Any]) -> None:
+        if not app_ids:
+            return
+        for app_id in app_ids:
+            self._remove(app_id)
+        for row in rows:
+            self._add(row)
+        self._after_change()
+
+    @staticmethod
+    def _current_seq(db: Session) -> int:
+        return db.execute(select(func.max(CatalogChangeRecord.seq))).scalar() or 0
+
+    def _fetch_rows(self, app_ids: Optional[Iterable[int]] = None) -> List[Any]:
+        db = self._session_factory()
+        try:
+            return self._load_rows(db, app_ids)
+        finally:
+            db.close()
+
+    def _bulk_load(self, rows: List[Any]) -> None:
+        """Загрузить строки в пустой индекс (наследники могут ускорить)"""
+        for row in rows:
+            self._add(row)
+
+    def _after_change(self) -> None:
+        """Вызывается после загрузки или точечного обновления"""
+
+    def _load_rows(self, db: Session, app_ids: Optional[Iterable[int]] = None) -> List[Any]:
+        """Прочитать строки приложений (все или только указанные)"""
+        raise NotImplementedError
+
+    def _reset(self) -> None:
+        """Очистить индекс"""
+        raise NotImplementedError
+
+    def _add(self, row: Any) -> None:
+        """Добавить приложение в индекс"""
+        raise NotImplementedError
+
+    def _remove(self, app_id: int) -> None:
+        """Удалить приложение из индекса"""
+        raise NotImplementedError
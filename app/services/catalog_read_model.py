@@ -0,0 +1,245 @@
+"""
+Колоночная модель чтения каталога в памяти воркера
+"""
+import math
+import sys
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.app import App
+from app.services.catalog_index import CatalogIndex
+from config import settings
+
+# Значение вместо NULL в целочисленных столбцах
+_NO_VALUE = -1
+# Начальная емкость столбцов; при заполнении емкость удваивается
+_INITIAL_CAPACITY = 1024
+
+_NUMERIC_COLUMNS = {
+    "id": np.int64,
+    "category_id": np.int64,
+    "age_rating_value": np.int64,
+    "downloads_count": np.int64,
+    "rating": np.float64,
+    "file_size": np.float64,
+    "active": np.bool_
+}
+_STRING_COLUMNS = (
+    "name", "short_description", "company", "icon_url", "header_image_url", "age_rating", "downloads", "data_hash"
+)
+
+
+class AppListRow(NamedTuple):
+    """Строка списка приложений (поля AppListResponse и data_hash для фрагментов JSON)"""
+    id: int
+    name: str
+    short_description: str
+    company: str
+    icon_url: str
+    header_image_url: Optional[str]
+    category_id: int
+    age_rating: str
+    rating: Optional[float]
+    downloads: Optional[str]
+    file_size: Optional[float]
+    data_hash: Optional[str]
+
+
+class CatalogReadModel(CatalogIndex):
+    """
+    Модель чтения для списков приложений
+
+    Хранит только поля списков (без description и скриншотов) в колонках:
+    числа - в массивах NumPy, строки - в списках интернированных строк.
+    Порядок каждой сортировки (argsort по позициям активных приложений)
+    вычисляется один раз после изменения каталога; страница - булева маска
+    фильтров над этим порядком и срез, без цикла Python по каталогу.
+    Удаленные приложения освобождают позицию, которую занимает следующее
+    добавленное.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reset()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.READ_MODEL_ENABLED
+
+    def get_apps(
+        self,
+        category_id: Optional[int] = None,
+        limit: int = 50,
+        offset: int = 0,
+        sort: Optional[str] = None,
+        max_age: Optional[int] = None
+    ) -> List[AppListRow]:
+        """Список приложений с теми же фильтрами и порядком, что AppService.get_apps"""
+        self.ensure_fresh()
+        with self._lock:
+            order = self._order(sort)
+            mask = None
+            if category_id:
+                mask = self._columns["category_id"][order] == category_id
+            if max_age is not None:
+                age = self._columns["age_rating_value"][order]
+                age_mask = (age != _NO_VALUE) & (age <= max_age)
+                mask = age_mask if mask is None else mask & age_mask
+            if mask is not None:
+                order = order[mask]
+            return [self._row(slot) for slot in order[offset:offset + limit]]
+
+    def get_featured_apps(self, limit: int = 5) -> List[AppListRow]:
+        """Топ приложений по рейтингу, как AppService.get_featured_apps"""
+        self.ensure_fresh()
+        with self._lock:
+            order = self._order("rating")
+            # Приложения без рейтинга стоят в конце порядка и в топ не попадают
+            rated = order[~np.isnan(self._columns["rating"][order])]
+            return [self._row(slot) for slot in rated[:limit]]
+
+    def memory_footprint(self) -> Dict[str, int]:
+        """Объем памяти модели в байтах по группам столбцов"""
+        with self._lock:
+            numeric = sum(column.nbytes for column in self._columns.values())
+            lists = sum(sys.getsizeof(self._strings[name]) for name in _STRING_COLUMNS)
+            unique = {id(value): value for name in _STRING_COLUMNS for value in self._strings[name] if value}
+            strings = sum(sys.getsizeof(value) for value in unique.values())
+            orders = sum(order.nbytes for order in self._orders.values())
+            return {
+                "apps": len(self._slot_by_id),
+                "slots": self._size,
+                "numeric_columns": numeric,
+                "string_columns": lists + strings,
+                "sort_orders": orders,
+                "total": numeric + lists + strings + orders
+            }
+
+    def _order(self, sort: Optional[str]) -> np.ndarray:
+        """Позиции активных приложений в порядке сортировки (как ORDER BY в AppService)"""
+        key = sort or "id"
+        order = self._orders.get(key)
+        if order is None:
+            columns = {name: column[:self._size] for name, column in self._columns.items()}
+            slots = np.flatnonzero(columns["active"])
+            ids = columns["id"][slots]
+            # np.lexsort сортирует по последнему ключу, предыдущие разрешают равенство
+            if key == "rating":
+                rating = columns["rating"][slots]
+                # DESC в SQLite ставит NULL последними
+                positions = np.lexsort((ids, np.where(np.isnan(rating), np.inf, -rating)))
+            elif key == "downloads":
+                downloads = columns["downloads_count"][slots]
+                positions = np.lexsort((ids, -downloads, downloads == _NO_VALUE))
+            elif key == "newest":
+                positions = np.argsort(-ids, kind="stable")
+            elif key == "name":
+                names = np.array([self._strings["name"][slot] for slot in slots], dtype=str)
+                positions = np.lexsort((ids, names))
+            else:
+                positions = np.argsort(ids, kind="stable")
+            order = slots[positions]
+            self._orders[key] = order
+        return order
+
+    def _row(self, slot: int) -> AppListRow:
+        columns = self._columns
+        strings = self._strings
+        rating = float(columns["rating"][slot])
+        file_size = float(columns["file_size"][slot])
+        return AppListRow(
+            id=int(columns["id"][slot]),
+            name=strings["name"][slot],
+            short_description=strings["short_description"][slot],
+            company=strings["company"][slot],
+            icon_url=strings["icon_url"][slot],
+            header_image_url=strings["header_image_url"][slot],
+            category_id=int(columns["category_id"][slot]),
+            age_rating=strings["age_rating"][slot],
+            rating=None if math.isnan(rating) else rating,
+            downloads=strings["downloads"][slot],
+            file_size=None if math.isnan(file_size) else file_size,
+            data_hash=strings["data_hash"][slot]
+        )
+
+    def _load_rows(self, db: Session, app_ids: Optional[Iterable[int]] = None) -> List[Any]:
+        query = db.query(
+            App.id, App.category_id, App.age_rating_value, App.downloads_count, App.rating, App.file_size,
+            *(getattr(App, name) for name in _STRING_COLUMNS)
+        ).filter(App.is_active == True)
+        if app_ids is not None:
+            query = query.filter(App.id.in_(list(app_ids)))
+        return query.all()
+
+    def _reset(self) -> None:
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.zeros(_INITIAL_CAPACITY, dtype=dtype) for name, dtype in _NUMERIC_COLUMNS.items()
+        }
+        self._size = 0
+        self._strings: Dict[str, List[Optional[str]]] = {name: [] for name in _STRING_COLUMNS}
+        self._slot_by_id: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._orders: Dict[str, np.ndarray] = {}
+
+    def _bulk_load(self, rows: List[Any]) -> None:
+        # Столбцы создаются целиком, без роста массивов по одной строке
+        capacity = max(_INITIAL_CAPACITY, len(rows))
+        values = [self._numeric_values(row) for row in rows]
+        for name, dtype in _NUMERIC_COLUMNS.items():
+            column = np.zeros(capacity, dtype=dtype)
+            column[:len(rows)] = [row_values[name] for row_values in values]
+            self._columns[name] = column
+        for name in _STRING_COLUMNS:
+            self._strings[name] = [self._intern(getattr(row, name)) for row in rows]
+        self._slot_by_id = {row.id: slot for slot, row in enumerate(rows)}
+        self._size = len(rows)
+
+    def _add(self, row: Any) -> None:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            for name in _STRING_COLUMNS:
+                self._strings[name][slot] = self._intern(getattr(row, name))
+        else:
+            slot = self._size
+            if slot == len(self._columns["id"]):
+                for name, column in self._columns.items():
+                    grown = np.zeros(len(column) * 2, dtype=column.dtype)
+                    grown[:slot] = column
+                    self._columns[name] = grown
+            self._size += 1
+            for name in _STRING_COLUMNS:
+                self._strings[name].append(self._intern(getattr(row, name)))
+        for name, value in self._numeric_values(row).items():
+            self._columns[name][slot] = value
+        self._slot_by_id[row.id] = slot
+
+    def _remove(self, app_id: int) -> None:
+        slot = self._slot_by_id.pop(app_id, None)
+        if slot is not None:
+            self._columns["active"][slot] = False
+            self._free_slots.append(slot)
+
+    def _after_change(self) -> None:
+        self._orders.clear()
+
+    @staticmethod
+    def _numeric_values(row: Any) -> Dict[str, Any]:
+        return {
+            "id": row.id,
+            "category_id": row.category_id,
+            "age_rating_value": _NO_VALUE if row.age_rating_value is None else row.age_rating_value,
+            "downloads_count": _NO_VALUE if row.downloads_count is None else row.downloads_count,
+            "rating": math.nan if row.rating is None else row.rating,
+            "file_size": math.nan if row.file_size is None else row.file_size,
+            "active": True
+        }
+
+    @staticmethod
+    def _intern(value: Optional[str]) -> Optional[str]:
+        # Повторяющиеся строки (компании, рейтинги, загрузки) хранятся в одном экземпляре
+        return sys.intern(value) if value is not None else None
+
+
+catalog_read_model = CatalogReadModel()
@@ -1,7 +1,12 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from sqlalchemy import func, select
+from itertools import groupby
+from typing import List, Optional, Dict, Any, Sequence
+from app.database import commit_session
+from app.models.app import App
 from app.models.category import Category
-from app.schemas.category import CategoryCreate, CategoryUpdate
+from app.schemas.category import CategoryCreate, CategoryResponse, CategoryUpdate
+from app.utils.catalog_version import mark_catalog_changed
 from app.utils.hash_utils import HashUtils
 from fastapi import HTTPException
 
@@ -11,14 +16,60 @@ class CategoryService:
     def __init__(self, db: Session):
         self.db = db
     
-    def get_categories(self) -> List[Category]:
-        """Получить все категории"""
+    def get_categories(self, fields: Optional[Sequence[str]] = None) -> List[Category]:
+        """
+        Получить все категории
+        
+        Если передан набор полей, читаются только эти столбцы (строки вместо объектов Category)
+        """
+        if fields:
+            # Выборка нескольких столбцов может пойти по покрывающему индексу в другом порядке
+            return self.db.query(*self._columns(fields)).order_by(Category.id).all()
         return self.db.query(Category).all()
     
     def get_category_by_id(self, category_id: int) -> Optional[Category]:
         """Получить категорию по ID"""
         return self.db.query(Category).filter(Category.id == category_id).first()
     
+    def get_categories_by_ids(self, category_ids: List[int]) -> List[Any]:
+        """Получить категории по списку ID (количество приложений - в том же запросе)"""
+        if not category_ids:
+            return []
+        return self.db.query(*self._columns(tuple(CategoryResponse.model_fields))).filter(
+            Category.id.in_(category_ids)
+        ).all()
+    
+    def get_category_rows(self, category_id: Optional[int] = None) -> List[Any]:
+        """
+        Категории строками со всеми полями ответа и data_hash, без загрузки объектов
+        
+        data_hash категории не пересчитывается при добавлении приложений,
+        поэтому ключ готового JSON-фрагмента - data_hash вместе с apps_count.
+        """
+        query = self.db.query(*self._columns(tuple(CategoryResponse.model_fields)), Category.data_hash)
+        if category_id is not None:
+            query = query.filter(Category.id == category_id)
+        return query.order_by(Category.id).all()
+    
+    def get_category_fields(self, category_id: int, fields: Sequence[str]) -> Optional[Any]:
+        """Получить только указанные поля категории"""
+        return self.db.query(*self._columns(fields)).filter(Category.id == category_id).first()
+    
+    @staticmethod
+    def _columns(fields: Sequence[str]) -> list:
+        """Столбцы категории для набора полей ответа"""
+        columns = []
+        for name in fields:
+            if name == "apps_count":
+                # Количество считается в том же запросе, без загрузки приложений категории
+                columns.append(
+                    select(func.count(App.id)).where(App.category_id == Category.id)
+                    .correlate(Category).scalar_subquery().label("apps_count")
+                )
+            else:
+                columns.append(getattr(Category, name))
+        return columns
+    
     def get_category_by_name(self, name: str) -> Optional[Category]:
         """Получить категорию по названию"""
         return self.db.query(Category).filter(Category.name == name).first()
@@ -57,8 +108,9 @@ class CategoryService:
         # Вычисляем и сохраняем хеш данных
         category_dict = HashUtils.get_data_for_hash(category)
         category.data_hash = HashUtils.calculate_category_hash(category_dict)
+        mark_catalog_changed(self.db, "category", category.id)
         
-        self.db.commit()
+        commit_session(self.db)
         self.db.refresh(category)
         return category
     
@@ -91,8 +143,9 @@ class CategoryService:
         # Пересчитываем хеш после обновления
         category_dict = HashUtils.get_data_for_hash(category)
         category.data_hash = HashUtils.calculate_category_hash(category_dict)
+        mark_catalog_changed(self.db, "category", category.id)
         
-        self.db.commit()
+        commit_session(self.db)
         self.db.refresh(category)
         return category
     
@@ -103,7 +156,8 @@ class CategoryService:
             return False
         
         self.db.delete(category)
-        self.db.commit()
+        mark_catalog_changed(self.db, "category", category_id)
+        commit_session(self.db)
         return True
     
     def verify_category_integrity(self, category_id: int) -> bool:
@@ -124,29 +178,30 @@ class CategoryService:
         category_dict = HashUtils.get_data_for_hash(category)
         new_hash = HashUtils.calculate_category_hash(category_dict)
         category.data_hash = new_hash
+        mark_catalog_changed(self.db, "category", category.id)
         
-        self.db.commit()
+        commit_session(self.db)
         return new_hash
     
     def find_duplicate_categories(self) -> List[Dict[str, Any]]:
         """Найти дублирующиеся категории по хешу"""
-        from sqlalchemy import func
-        
-        # Находим хеши, которые встречаются более одного раза
-        duplicate_hashes = self.db.query(Category.data_hash).group_by(
+        # Хеши, которые встречаются более одного раза
+        duplicate_hashes = select(Category.data_hash).group_by(
             Category.data_hash
-        ).having(func.count(Category.id) > 1).all()
+        ).having(func.count(Category.id) > 1)
+        
+        # Все категории с такими хешами - одним запросом, сгруппированные по хешу
+        rows = self.db.query(Category.data_hash, Category.id, Category.name).filter(
+            Category.data_hash.in_(duplicate_hashes)
+        ).order_by(Category.data_hash, Category.id).all()
         
         duplicates = []
-        for (data_hash,) in duplicate_hashes:
-            categories_with_same_hash = self.db.query(Category).filter(
-                Category.data_hash == data_hash
-            ).all()
-            
+        for data_hash, group in groupby(rows, key=lambda row: row.data_hash):
+            categories = [{"id": row.id, "name": row.name} for row in group]
             duplicates.append({
                 "hash": data_hash,
-                "count": len(categories_with_same_hash),
-                "categories": [{"id": cat.id, "name": cat.name} for cat in categories_with_same_hash]
+                "count": len(categories),
+                "categories": categories
             })
         
         return duplicates
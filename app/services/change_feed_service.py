@@ -0,0 +1,63 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+from app.models.catalog_change import CatalogChangeRecord
+from app.services.app_service import AppService
+from app.services.category_service import CategoryService
+
+class ChangeFeedService:
+    """Сервис журнала изменений каталога"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_changes(self, since: int = 0, limit: int = 500) -> Dict[str, Any]:
+        """
+        Получить изменения каталога после номера since
+        
+        Журнал хранит только последнюю запись каждого объекта, поэтому
+        клиент получает по одной записи на изменившийся объект независимо
+        от того, сколько раз он менялся.
+        
+        Args:
+            since: Номер последнего изменения, полученного клиентом
+            limit: Максимальное количество изменений на странице
+            
+        Returns:
+            Изменения с текущими данными объектов, номер для следующего
+            запроса и признак наличия следующей страницы
+        """
+        records = self.db.query(CatalogChangeRecord).filter(
+            CatalogChangeRecord.seq > since
+        ).order_by(CatalogChangeRecord.seq).limit(limit + 1).all()
+        has_more = len(records) > limit
+        records = records[:limit]
+        
+        upserts = {
+            entity: [r.entity_id for r in records if r.entity == entity and r.op == "upsert"]
+            for entity in ("app", "category")
+        }
+        apps = {app.id: app for app in AppService(self.db).get_apps_by_ids(upserts["app"])}
+        categories = {
+            category.id: category
+            for category in CategoryService(self.db).get_categories_by_ids(upserts["category"])
+        }
+        
+        changes: List[Dict[str, Any]] = []
+        for record in records:
+            change = {
+                "seq": record.seq,
+                "entity": record.entity,
+                "entity_id": record.entity_id,
+                "op": record.op,
+                "data_hash": record.data_hash,
+                "changed_at": record.changed_at
+            }
+            if record.op == "upsert":
+                change[record.entity] = (apps if record.entity == "app" else categories).get(record.entity_id)
+            changes.append(change)
+        
+        return {
+            "changes": changes,
+            "next_since": records[-1].seq if records else since,
+            "has_more": has_more
+        }
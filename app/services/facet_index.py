@@ -0,0 +1,182 @@
+"""
+Битовый индекс для фасетной фильтрации и подсчета
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.app import App
+from app.services.catalog_index import CatalogIndex
+
+# Диапазоны рейтинга: (название, нижняя граница включительно)
+RATING_BANDS = (("4.5+", 4.5), ("4.0-4.5", 4.0), ("3.0-4.0", 3.0), ("<3.0", float("-inf")))
+NO_RATING_BAND = "none"
+
+
+def get_rating_band(rating: Optional[float]) -> str:
+    """Диапазон рейтинга приложения"""
+    if rating is None:
+        return NO_RATING_BAND
+    for band, lower in RATING_BANDS:
+        if rating >= lower:
+            return band
+    return NO_RATING_BAND
+
+
+def bitset_from_ids(ids: Iterable[int]) -> int:
+    """Битовое множество, в котором установлены биты с номерами ID"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class FacetIndex(CatalogIndex):
+    """
+    Битовый индекс приложений по категории, возрастному рейтингу,
+    диапазону рейтинга и активности
+
+    Каждое значение фасета хранится как битовое множество (int), где номер
+    бита - ID приложения. Комбинация фильтров - побитовое И, количество -
+    подсчет единичных битов. Все счетчики всех фасетов вычисляются за один
+    проход без запросов к базе.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reset()
+
+    def facets(
+        self,
+        candidates: Optional[int] = None,
+        category_id: Optional[int] = None,
+        max_age: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Количество приложений, подходящих под фильтры, и счетчики фасетов
+
+        Счетчики фасета вычисляются со всеми фильтрами, кроме фильтра по
+        самому фасету, чтобы клиент видел, сколько даст выбор другого значения.
+
+        Args:
+            candidates: Битовое множество кандидатов (например, результатов поиска)
+            category_id: Фильтр по категории
+            max_age: Фильтр по максимальному возрастному рейтингу
+
+        Returns:
+            Словарь с общим количеством и счетчиками по каждому фасету
+        """
+        self.ensure_fresh()
+        with self._lock:
+            base = self._active if candidates is None else self._active & candidates
+            filters = {
+                "category_id": self._by_category.get(category_id, 0) if category_id else None,
+                "age_rating": self._union(
+                    bits for age, bits in self._by_age.items()
+                    if self._age_values.get(age) is not None and self._age_values[age] <= max_age
+                ) if max_age is not None else None
+            }
+
+            def apply(exclude: Optional[str] = None) -> int:
+                bits = base
+                for name, bitset in filters.items():
+                    if bitset is not None and name != exclude:
+                        bits &= bitset
+                return bits
+
+            matched = apply()
+            return {
+                "total": matched.bit_count(),
+                "facets": {
+                    "category_id": self._count(apply("category_id"), self._by_category),
+                    "age_rating": self._count(apply("age_rating"), self._by_age),
+                    "rating_band": self._count(matched, self._by_band)
+                }
+            }
+
+    @staticmethod
+    def _union(bitsets: Iterable[int]) -> int:
+        result = 0
+        for bits in bitsets:
+            result |= bits
+        return result
+
+    @staticmethod
+    def _count(bits: int, values: Dict[Any, int]) -> List[Dict[str, Any]]:
+        counts = [
+            {"value": value, "count": (bits & value_bits).bit_count()}
+            for value, value_bits in values.items()
+        ]
+        return sorted((c for c in counts if c["count"]), key=lambda c: -c["count"])
+
+    def _load_rows(self, db: Session, app_ids: Optional[Iterable[int]] = None) -> List[Any]:
+        # Неактивные приложения тоже индексируются: активность - отдельное множество
+        query = db.query(
+            App.id, App.category_id, App.age_rating, App.age_rating_value, App.rating, App.is_active
+        )
+        if app_ids is not None:
+            query = query.filter(App.id.in_(list(app_ids)))
+        return query.all()
+
+    def _reset(self) -> None:
+        self._active = 0
+        self._by_category: Dict[int, int] = {}
+        self._by_age: Dict[str, int] = {}
+        self._by_band: Dict[str, int] = {}
+        self._age_values: Dict[str, Optional[int]] = {}
+        self._values: Dict[int, tuple] = {}
+
+    def _bulk_load(self, rows: List[Any]) -> None:
+        # Множества собираются из списков ID за один проход: побитовое ИЛИ
+        # по одному биту на больших int было бы квадратичным
+        ids_by_value: Dict[tuple, List[int]] = {}
+        active_ids = []
+        for row in rows:
+            for key in self._remember(row):
+                ids_by_value.setdefault(key, []).append(row.id)
+            if row.is_active:
+                active_ids.append(row.id)
+
+        self._active = bitset_from_ids(active_ids)
+        for (dimension, value), ids in ids_by_value.items():
+            self._dimension(dimension)[value] = bitset_from_ids(ids)
+
+    def _add(self, row: Any) -> None:
+        bit = 1 << row.id
+        for dimension, value in self._remember(row):
+            values = self._dimension(dimension)
+            values[value] = values.get(value, 0) | bit
+        if row.is_active:
+            self._active |= bit
+
+    def _remove(self, app_id: int) -> None:
+        mask = ~(1 << app_id)
+        for dimension, value in self._values.pop(app_id, ()):
+            values = self._dimension(dimension)
+            values[value] = values.get(value, 0) & mask
+            if not values[value]:
+                del values[value]
+        self._active &= mask
+
+    def _remember(self, row: Any) -> tuple:
+        keys = (
+            ("category_id", row.category_id),
+            ("age_rating", row.age_rating),
+            ("rating_band", get_rating_band(row.rating))
+        )
+        self._values[row.id] = keys
+        self._age_values[row.age_rating] = row.age_rating_value
+        return keys
+
+    def _dimension(self, dimension: str) -> Dict[Any, int]:
+        if dimension == "category_id":
+            return self._by_category
+        if dimension == "age_rating":
+            return self._by_age
+        return self._by_band
+
+
+facet_index = FacetIndex()
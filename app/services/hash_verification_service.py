@@ -1,12 +1,18 @@
 """
 Сервис для проверки целостности данных с помощью хешей
 """
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Tuple
 from app.models.app import App
+from app.models.catalog_change import CatalogChangeRecord
 from app.models.category import Category
+from app.utils.catalog_version import mark_catalog_changed
 from app.utils.hash_utils import HashUtils
 
+# Размер пачки ID в условиях IN при проверке хешей клиента
+_CHECK_CHUNK = 500
+
 
 class HashVerificationService:
     """Сервис для проверки целостности данных"""
@@ -153,6 +159,7 @@ class HashVerificationService:
                     category_dict = HashUtils.get_data_for_hash(category)
                     new_hash = HashUtils.calculate_category_hash(category_dict)
                     category.data_hash = new_hash
+                    mark_catalog_changed(self.db, "category", category.id)
                     
                     fixed["categories"]["fixed"].append({
                         "id": category.id,
@@ -181,6 +188,7 @@ class HashVerificationService:
                     app_dict = HashUtils.get_data_for_hash(app)
                     new_hash = HashUtils.calculate_app_hash(app_dict)
                     app.data_hash = new_hash
+                    mark_catalog_changed(self.db, "app", app.id)
                     
                     fixed["apps"]["fixed"].append({
                         "id": app.id,
@@ -227,6 +235,8 @@ class HashVerificationService:
             try:
                 category_dict = HashUtils.get_data_for_hash(category)
                 new_hash = HashUtils.calculate_category_hash(category_dict)
+                if category.data_hash != new_hash:
+                    mark_catalog_changed(self.db, "category", category.id)
                 category.data_hash = new_hash
                 results["categories"]["recalculated"] += 1
             except Exception as e:
@@ -242,6 +252,8 @@ class HashVerificationService:
             try:
                 app_dict = HashUtils.get_data_for_hash(app)
                 new_hash = HashUtils.calculate_app_hash(app_dict)
+                if app.data_hash != new_hash:
+                    mark_catalog_changed(self.db, "app", app.id)
                 app.data_hash = new_hash
                 results["apps"]["recalculated"] += 1
             except Exception as e:
@@ -261,3 +273,51 @@ class HashVerificationService:
             results["commit_error"] = str(e)
         
         return results
+    
+    def check_hashes(self, entity: str, hashes: Dict[int, str]) -> Dict[str, List[int]]:
+        """
+        Сравнивает хеши объектов на клиенте с текущими
+        
+        Хеши читаются пачками ID одним запросом по первичному ключу, без
+        загрузки объектов. Для ID, которых нет в таблице, надгробия журнала
+        изменений отличают удаленные объекты от никогда не существовавших.
+        
+        Args:
+            entity: "app" или "category"
+            hashes: Хеши клиента {ID: data_hash}
+        
+        Returns:
+            ID устаревших (stale), удаленных (deleted) и неизвестных (unknown) объектов
+        """
+        model = App if entity == "app" else Category
+        columns = [model.id, model.data_hash]
+        if model is App:
+            columns.append(App.is_active)
+        
+        result = {"stale": [], "deleted": [], "unknown": []}
+        ids = sorted(hashes)
+        for start in range(0, len(ids), _CHECK_CHUNK):
+            chunk = ids[start:start + _CHECK_CHUNK]
+            found = set()
+            for row in self.db.execute(select(*columns).where(model.id.in_(chunk))):
+                found.add(row.id)
+                if model is App and not row.is_active:
+                    result["deleted"].append(row.id)
+                elif row.data_hash != hashes[row.id].lower():
+                    result["stale"].append(row.id)
+            
+            missing = [entity_id for entity_id in chunk if entity_id not in found]
+            if missing:
+                tombstones = set(self.db.execute(
+                    select(CatalogChangeRecord.entity_id).where(
+                        CatalogChangeRecord.entity == entity,
+                        CatalogChangeRecord.entity_id.in_(missing),
+                        CatalogChangeRecord.op == "delete"
+                    )
+                ).scalars())
+                for entity_id in missing:
+                    result["deleted" if entity_id in tombstones else "unknown"].append(entity_id)
+        
+        for ids_list in result.values():
+            ids_list.sort()
+        return result
@@ -0,0 +1,71 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, select
+from typing import Any, Dict, List
+from app.models.app import App
+from app.models.category import Category
+from app.services.app_service import AppService
+
+
+class HomeService:
+    """Сервис для данных главного экрана"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_home(self, apps_per_category: int = 10, featured_limit: int = 5) -> Dict[str, Any]:
+        """
+        Получить данные главного экрана одним набором запросов
+        
+        Args:
+            apps_per_category: Количество первых приложений в каждой категории
+            featured_limit: Количество приложений в топе
+            
+        Returns:
+            Словарь с топом приложений и категориями с первыми приложениями
+        """
+        categories = self.db.query(Category).order_by(Category.id).all()
+        apps_count = self._get_apps_count()
+        apps_by_category = self._get_first_apps_by_category(apps_per_category)
+        
+        return {
+            "featured": AppService(self.db).get_featured_apps(limit=featured_limit),
+            "categories": [
+                {
+                    "id": category.id,
+                    "name": category.name,
+                    "description": category.description,
+                    "tag": category.tag,
+                    "tag_color": category.tag_color,
+                    "apps_count": apps_count.get(category.id, 0),
+                    "apps": apps_by_category.get(category.id, [])
+                }
+                for category in categories
+            ]
+        }
+    
+    def _get_apps_count(self) -> Dict[int, int]:
+        """Количество приложений по категориям одним запросом (как Category.apps_count)"""
+        rows = self.db.query(App.category_id, func.count(App.id)).group_by(App.category_id).all()
+        return dict(rows)
+    
+    def _get_first_apps_by_category(self, limit: int) -> Dict[int, List[App]]:
+        """
+        Первые приложения каждой категории одним оконным запросом
+        
+        ROW_NUMBER() OVER (PARTITION BY category_id ORDER BY id) нумерует
+        приложения внутри категории в том же порядке, что и первая страница
+        GET /api/v1/apps/?category_id=..., и отсекает лишние в SQL.
+        """
+        ranked = select(
+            App.id.label("id"),
+            func.row_number().over(partition_by=App.category_id, order_by=App.id).label("position")
+        ).where(App.is_active == True).subquery()
+        
+        apps = self.db.query(App).join(ranked, App.id == ranked.c.id).filter(
+            ranked.c.position <= limit
+        ).order_by(App.category_id, ranked.c.position).all()
+        
+        apps_by_category: Dict[int, List[App]] = {}
+        for app in apps:
+            apps_by_category.setdefault(app.category_id, []).append(app)
+        return apps_by_category
@@ -0,0 +1,266 @@
+"""
+Фоновая проверка целостности каталога небольшими срезами
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, commit_session
+from app.models.app import App
+from app.models.category import Category
+from app.models.scrub import ScrubMismatch, ScrubState
+from app.utils.admission import admission_controller
+from app.utils.hash_utils import CATEGORY_HASH_FIELDS, HashUtils
+from config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Проверяемые объекты в порядке обхода
+SCRUB_MODELS = {"category": Category, "app": App}
+
+
+class ScrubService:
+    """
+    Проверка хешей объектов каталога срезами по возрастанию ID
+
+    Позиция обхода каждого типа объектов хранится в scrub_state, поэтому
+    проверка продолжается с того же места после перезапуска, а воркеры
+    не проверяют один срез дважды: срез засчитывается условным UPDATE
+    по прежней позиции. Следующий срез любого типа разрешен не раньше,
+    чем через (строк в срезе / SCRUB_ROWS_PER_SECOND), так что бюджет
+    общий для всех воркеров. Найденные расхождения хранятся в
+    scrub_mismatches, пока следующий проход не найдет объект исправленным
+    или удаленным.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def scrub_slice(
+        self,
+        slice_size: int = settings.SCRUB_SLICE_SIZE,
+        rows_per_second: float = settings.SCRUB_ROWS_PER_SECOND
+    ) -> Tuple[Optional[int], float]:
+        """
+        Проверить следующий срез типа объектов, проход по которому завершался давнее всего
+
+        Returns:
+            Количество проверенных строк (None - срез не взят: бюджет исчерпан
+            или срез взял другой воркер) и момент (Unix time), когда можно брать следующий
+        """
+        states = self._states()
+        now = time.time()
+        next_slice_at = max(state.next_slice_at for state in states)
+        if now < next_slice_at:
+            return None, next_slice_at
+
+        # Сначала тип, проход по которому еще не завершался или завершился раньше
+        state = min(
+            states,
+            key=lambda s: (s.last_pass_completed_at is not None, s.last_pass_completed_at or 0, s.entity)
+        )
+        model = SCRUB_MODELS[state.entity]
+        rows = self.db.query(model).filter(model.id > state.cursor).order_by(model.id).limit(slice_size).all()
+        mismatches = [
+            mismatch for mismatch in (self._verify(state.entity, row) for row in rows) if mismatch is not None
+        ]
+        upper = rows[-1].id if rows else None
+        self.db.expunge_all()
+
+        next_slice_at = now + max(len(rows), 1) / rows_per_second
+        values: Dict[str, Any] = {
+            "next_slice_at": next_slice_at,
+            "last_verified_at": func.now(),
+            "verified_rows": ScrubState.verified_rows + len(rows)
+        }
+        if upper is None:
+            # Проход завершен: следующий начнется с начала
+            values.update(cursor=0, passes=ScrubState.passes + 1, last_pass_completed_at=func.now())
+        else:
+            values["cursor"] = upper
+            if state.cursor == 0:
+                values["pass_started_at"] = func.now()
+
+        claimed = self.db.execute(
+            update(ScrubState)
+            .where(
+                ScrubState.entity == state.entity,
+                ScrubState.cursor == state.cursor,
+                select(func.max(ScrubState.next_slice_at)).scalar_subquery() <= now
+            )
+            .values(**values)
+        ).rowcount
+        if not claimed:
+            self.db.rollback()
+            return None, next_slice_at
+
+        # Расхождения в проверенном диапазоне заменяются найденными сейчас
+        in_range = [ScrubMismatch.entity == state.entity, ScrubMismatch.entity_id > state.cursor]
+        if upper is not None:
+            in_range.append(ScrubMismatch.entity_id <= upper)
+        self.db.execute(
+            delete(ScrubMismatch).where(
+                *in_range, ScrubMismatch.entity_id.notin_([mismatch["entity_id"] for mismatch in mismatches])
+            )
+        )
+        if mismatches:
+            statement = insert(ScrubMismatch)
+            self.db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[ScrubMismatch.entity, ScrubMismatch.entity_id],
+                    set_={
+                        "issue": statement.excluded.issue,
+                        "stored_hash": statement.excluded.stored_hash,
+                        "calculated_hash": statement.excluded.calculated_hash
+                    }
+                ),
+                mismatches
+            )
+        commit_session(self.db)
+        return len(rows), next_slice_at
+
+    def get_state(self) -> List[Dict[str, Any]]:
+        """Позиция и время последней проверки по каждому типу объектов"""
+        mismatches = dict(
+            self.db.execute(select(ScrubMismatch.entity, func.count()).group_by(ScrubMismatch.entity)).all()
+        )
+        return [
+            {
+                "entity": state.entity,
+                "cursor": state.cursor,
+                "last_verified_at": state.last_verified_at,
+                "pass_started_at": state.pass_started_at,
+                "last_pass_completed_at": state.last_pass_completed_at,
+                "passes": state.passes,
+                "verified_rows": state.verified_rows,
+                "mismatches": mismatches.get(state.entity, 0)
+            }
+            for state in self._states()
+        ]
+
+    def get_mismatches(self, entity: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[ScrubMismatch]:
+        """Найденные расхождения, новые первыми"""
+        query = self.db.query(ScrubMismatch)
+        if entity:
+            query = query.filter(ScrubMismatch.entity == entity)
+        return (
+            query.order_by(ScrubMismatch.detected_at.desc(), ScrubMismatch.entity, ScrubMismatch.entity_id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    def _states(self) -> List[Any]:
+        """Строки scrub_state всех типов объектов (недостающие создаются)"""
+        states = self.db.execute(select(ScrubState.__table__)).all()
+        if len(states) < len(SCRUB_MODELS):
+            self.db.execute(
+                insert(ScrubState).on_conflict_do_nothing(),
+                [
+                    {"entity": entity, "cursor": 0, "next_slice_at": 0, "passes": 0, "verified_rows": 0}
+                    for entity in SCRUB_MODELS
+                ]
+            )
+            commit_session(self.db)
+            states = self.db.execute(select(ScrubState.__table__)).all()
+        return states
+
+    @staticmethod
+    def _verify(entity: str, row: Any) -> Optional[Dict[str, Any]]:
+        """Расхождение данных объекта с сохраненным хешем или None"""
+        # Удаленные приложения не выдаются клиентам и не проверяются (как в /hash/verify-apps)
+        if entity == "app" and not row.is_active:
+            return None
+        if not row.data_hash:
+            return {"entity": entity, "entity_id": row.id, "issue": "No hash found", "stored_hash": None,
+                    "calculated_hash": None}
+        if entity == "category":
+            # Только хешируемые столбцы: to_dict загрузил бы все приложения категории ради apps_count
+            calculated = HashUtils.calculate_category_hash({field: getattr(row, field) for field in CATEGORY_HASH_FIELDS})
+        else:
+            calculated = HashUtils.calculate_app_hash(HashUtils.get_data_for_hash(row))
+        if calculated == row.data_hash:
+            return None
+        return {"entity": entity, "entity_id": row.id, "issue": "Hash mismatch", "stored_hash": row.data_hash,
+                "calculated_hash": calculated}
+
+
+class IntegrityScrubber:
+    """
+    Фоновый поток проверки целостности
+
+    Берет срез за срезом в пределах бюджета SCRUB_ROWS_PER_SECOND
+    и уступает запросам: если сглаженная задержка чтения каталога этого
+    воркера выше SCRUB_PAUSE_LATENCY_MS или запросы ждут в очереди,
+    проверка откладывается на SCRUB_PAUSE_SECONDS.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats = {"slices": 0, "rows": 0, "skipped": 0, "pauses": 0, "errors": 0}
+
+    def start(self) -> None:
+        """Запустить фоновую проверку"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="integrity-scrubber", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановить фоновую проверку"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики проверки этого воркера"""
+        return {"running": bool(self._thread and self._thread.is_alive()), **self._stats}
+
+    def scrub_once(self) -> float:
+        """Проверить один срез; возвращает паузу до следующего, с"""
+        db = self._session_factory()
+        try:
+            rows, next_slice_at = ScrubService(db).scrub_slice()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if rows is None:
+            self._stats["skipped"] += 1
+        else:
+            self._stats["slices"] += 1
+            self._stats["rows"] += rows
+        return max(0.0, next_slice_at - time.time())
+
+    @staticmethod
+    def _overloaded() -> bool:
+        catalog = admission_controller.groups["catalog"]
+        return catalog.recent_latency() * 1000 > settings.SCRUB_PAUSE_LATENCY_MS or catalog.waiting > 0
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            if self._overloaded():
+                self._stats["pauses"] += 1
+                self._stopping.wait(settings.SCRUB_PAUSE_SECONDS)
+                continue
+            try:
+                delay = self.scrub_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning("Integrity scrub failed: %s", e)
+                delay = settings.SCRUB_PAUSE_SECONDS
+            self._stopping.wait(delay)
+
+
+integrity_scrubber = IntegrityScrubber()
@@ -0,0 +1,457 @@
+"""
+Похожие приложения: векторы TF-IDF и предрасчитанные ближайшие соседи
+"""
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, commit_session
+from app.models.app import App
+from app.models.catalog_change import CatalogChangeRecord
+from app.models.similar_app import AppSimilarityLease, AppSimilarityState, SimilarApp
+from app.utils.catalog_version import CatalogChange, catalog_version
+from app.utils.text_utils import TextUtils
+from app.utils.write_queue import write_queue
+from config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Вес признаков по полям: совпадение в названии важнее совпадения в описании
+_FIELD_WEIGHTS = {"name": 2.0, "short_description": 1.5, "description": 1.0}
+# Вес общей категории и компании
+_CATEGORY_WEIGHT = 3.0
+_COMPANY_WEIGHT = 1.0
+# Размер пачки ID в условиях IN
+_IN_CHUNK = 500
+# Единственная строка аренды пересчета
+_LEASE_ID = 1
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SimilarityService:
+    """
+    Сервис похожих приложений
+
+    Текст приложения превращается в вектор TF-IDF по хешированным словам
+    и парам слов (размер вектора фиксирован, словарь не хранится), к нему
+    добавляются признаки категории и компании. Для каждого приложения
+    заранее считаются top-k соседей по косинусной близости и сохраняются
+    в таблицу app_similar, так что выдача - одно чтение по индексу.
+
+    Пересчет сравнивает data_hash приложений с хешами последнего расчета:
+    пересчитываются только изменившиеся приложения и те, чьи списки
+    соседей они затрагивают. Полный пересчет идет пачками строк матрицы.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_similar_apps(self, app_id: int, limit: int = 10) -> List[App]:
+        """Получить похожие приложения (одно чтение по первичному ключу app_similar)"""
+        return self.db.query(App).join(SimilarApp, SimilarApp.similar_app_id == App.id).filter(
+            SimilarApp.app_id == app_id, App.is_active == True
+        ).order_by(SimilarApp.rank).limit(limit).all()
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Пересчитать соседей приложений, данные которых изменились
+
+        Если ничего не изменилось, читаются только ID и хеши приложений.
+        Тексты читаются и разбираются только для изменившихся приложений:
+        векторы частот остальных хранятся в app_similarity_state. Соседи
+        считаются без открытой транзакции, а записываются пачками через
+        очередь записи (транзакция на пачку), поэтому блокировка записи
+        не держится на время расчета и не задерживает запись каталога.
+
+        Args:
+            full: Пересчитать соседей всех приложений
+
+        Returns:
+            Режим пересчета и количество пересчитанных и удаленных приложений
+        """
+        current = dict(self.db.execute(
+            select(App.id, App.data_hash).where(App.is_active == True).order_by(App.id)
+        ).all())
+        known = {
+            row.app_id: row
+            for row in self.db.execute(select(
+                AppSimilarityState.app_id, AppSimilarityState.data_hash,
+                AppSimilarityState.vector.isnot(None).label("has_vector")
+            ))
+        }
+        changed = {
+            app_id for app_id, data_hash in current.items()
+            if app_id not in known or known[app_id].data_hash != data_hash or not known[app_id].has_vector
+        }
+        removed = set(known) - set(current)
+
+        if not full and not changed and not removed:
+            self.db.rollback()
+            return {"mode": "none", "recomputed": 0, "removed": 0, "apps": len(current)}
+
+        # Векторы неизменившихся приложений берутся из состояния; с другой размерностью - считаются заново
+        term_vectors: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        if not full:
+            for app_id, blob in self.db.execute(
+                select(AppSimilarityState.app_id, AppSimilarityState.vector).where(
+                    AppSimilarityState.vector.isnot(None)
+                )
+            ):
+                if app_id in current and app_id not in changed:
+                    vector = self._decode_vector(blob)
+                    if vector is None:
+                        changed.add(app_id)
+                    else:
+                        term_vectors[app_id] = vector
+
+        full = full or not known or len(changed) + len(removed) > len(current) * settings.SIMILAR_APPS_FULL_REBUILD_RATIO
+        if full:
+            changed = set(current)
+            # Строки приложений, для которых нет состояния, тоже удаляются
+            removed = (set(known) | set(self.db.execute(select(SimilarApp.app_id).distinct()).scalars())) - set(current)
+        for chunk in _chunks(sorted(changed), _IN_CHUNK):
+            for row in self.db.execute(
+                select(
+                    App.id, App.name, App.short_description, App.description, App.company, App.category_id
+                ).where(App.id.in_(chunk))
+            ):
+                term_vectors[row.id] = self._term_vector(row)
+
+        ids = np.array(sorted(current), dtype=np.int64)
+        vectors = self._weigh(ids, term_vectors)
+        positions = {int(app_id): i for i, app_id in enumerate(ids)}
+        if full:
+            affected = list(range(len(ids)))
+        else:
+            affected = sorted(positions[app_id] for app_id in self._affected_apps(vectors, ids, positions, changed, removed))
+        # Чтение закончено: дальше расчет без транзакции и короткие транзакции записи
+        self.db.rollback()
+
+        for chunk in _chunks(sorted(removed), _IN_CHUNK):
+            write_queue.submit_sync(lambda db, chunk=chunk: SimilarityService._remove_apps(db, chunk))
+        for chunk in _chunks(affected, settings.SIMILAR_APPS_CHUNK_SIZE):
+            app_ids = [int(ids[i]) for i in chunk]
+            neighbours = self._top_neighbours(vectors, ids, np.array(chunk, dtype=np.int64))
+            states = [
+                {"app_id": app_id, "data_hash": current[app_id], "vector": self._encode_vector(term_vectors[app_id])}
+                for app_id in app_ids if app_id in changed
+            ]
+            write_queue.submit_sync(
+                lambda db, app_ids=app_ids, neighbours=neighbours, states=states:
+                SimilarityService._write_chunk(db, app_ids, neighbours, states)
+            )
+
+        return {
+            "mode": "full" if full else "incremental",
+            "recomputed": len(affected),
+            "removed": len(removed),
+            "apps": len(current)
+        }
+
+    @staticmethod
+    def _remove_apps(db: Session, app_ids: List[int]) -> None:
+        """Удалить соседей и состояние приложений, которых больше нет среди активных"""
+        db.execute(delete(SimilarApp).where(SimilarApp.app_id.in_(app_ids)))
+        db.execute(delete(AppSimilarityState).where(AppSimilarityState.app_id.in_(app_ids)))
+        commit_session(db)
+
+    @staticmethod
+    def _write_chunk(
+        db: Session,
+        app_ids: List[int],
+        neighbours: List[Dict[str, Any]],
+        states: List[Dict[str, Any]]
+    ) -> None:
+        """Заменить соседей пачки приложений и сохранить состояние изменившихся из них"""
+        db.execute(delete(SimilarApp).where(SimilarApp.app_id.in_(app_ids)))
+        if neighbours:
+            db.execute(insert(SimilarApp), neighbours)
+        if states:
+            statement = sqlite_insert(AppSimilarityState)
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[AppSimilarityState.app_id],
+                    set_={"data_hash": statement.excluded.data_hash, "vector": statement.excluded.vector}
+                ),
+                states
+            )
+        commit_session(db)
+
+    def _affected_apps(
+        self,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        positions: Dict[int, int],
+        changed: Set[int],
+        removed: Set[int]
+    ) -> Set[int]:
+        """Изменившиеся приложения и приложения, чей список соседей они затрагивают"""
+        affected = set(changed)
+        touched = list(changed | removed)
+
+        # Списки, в которых изменившееся приложение уже есть: его место могло поменяться
+        for chunk in _chunks(touched, _IN_CHUNK):
+            affected.update(
+                app_id for (app_id,) in self.db.query(SimilarApp.app_id).filter(
+                    SimilarApp.similar_app_id.in_(chunk)
+                ).distinct()
+            )
+
+        # Списки, в которые изменившееся приложение теперь попадает: близость выше k-го соседа
+        thresholds = np.zeros(len(ids), dtype=np.float32)
+        for app_id, score in self.db.query(SimilarApp.app_id, func.min(SimilarApp.score)).group_by(
+            SimilarApp.app_id
+        ).having(func.count() >= settings.SIMILAR_APPS_TOP_K):
+            if app_id in positions:
+                thresholds[positions[app_id]] = score
+
+        changed_positions = np.array([positions[app_id] for app_id in changed], dtype=np.int64)
+        for chunk in _chunks(changed_positions, settings.SIMILAR_APPS_CHUNK_SIZE):
+            scores = vectors[chunk] @ vectors.T
+            scores[np.arange(len(chunk)), chunk] = 0
+            entering = np.flatnonzero(scores.max(axis=0) > thresholds)
+            affected.update(int(ids[i]) for i in entering)
+
+        return affected
+
+    @staticmethod
+    def _top_neighbours(vectors: np.ndarray, ids: np.ndarray, chunk: np.ndarray) -> List[Dict[str, Any]]:
+        """Строки app_similar для пачки приложений: top-k соседей с положительной близостью"""
+        k = min(settings.SIMILAR_APPS_TOP_K, len(ids) - 1)
+        if k <= 0:
+            return []
+
+        scores = vectors[chunk] @ vectors.T
+        scores[np.arange(len(chunk)), chunk] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+
+        neighbours = []
+        for row, position in enumerate(chunk):
+            rank = 0
+            for column in order[row]:
+                score = float(top_scores[row, column])
+                if score <= 0:
+                    break
+                neighbours.append({
+                    "app_id": int(ids[position]),
+                    "rank": rank,
+                    "similar_app_id": int(ids[top[row, column]]),
+                    "score": score
+                })
+                rank += 1
+        return neighbours
+
+    @staticmethod
+    def _features(row: Any) -> Counter:
+        """Хешируемые признаки приложения с весами (слова, пары слов, категория, компания)"""
+        features: Counter = Counter()
+        for field, weight in _FIELD_WEIGHTS.items():
+            words = [word for word in TextUtils.search_key(getattr(row, field) or "").split(" ") if word]
+            for word in words:
+                features[word] += weight
+            for first, second in zip(words, words[1:]):
+                features[f"{first} {second}"] += weight
+        features[f"category:{row.category_id}"] += _CATEGORY_WEIGHT
+        features[f"company:{TextUtils.search_key(row.company or '')}"] += _COMPANY_WEIGHT
+        return features
+
+    @classmethod
+    def _term_vector(cls, row: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Разреженный вектор частот признаков приложения: индексы и значения"""
+        dimensions = settings.SIMILAR_APPS_DIMENSIONS
+        weights: Dict[int, float] = {}
+        for feature, weight in cls._features(row).items():
+            # crc32 стабилен между процессами, в отличие от hash()
+            index = zlib.crc32(feature.encode("utf-8")) % dimensions
+            weights[index] = weights.get(index, 0.0) + 1 + math.log(weight)
+        return (
+            np.fromiter(weights.keys(), dtype=np.int32, count=len(weights)),
+            np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+        )
+
+    @staticmethod
+    def _encode_vector(vector: Tuple[np.ndarray, np.ndarray]) -> bytes:
+        indices, values = vector
+        return np.int32(settings.SIMILAR_APPS_DIMENSIONS).tobytes() + indices.tobytes() + values.tobytes()
+
+    @staticmethod
+    def _decode_vector(blob: bytes) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Вектор из состояния (None - посчитан для другой размерности)"""
+        if int(np.frombuffer(blob, dtype=np.int32, count=1)[0]) != settings.SIMILAR_APPS_DIMENSIONS:
+            return None
+        size = (len(blob) - 4) // 8
+        return (
+            np.frombuffer(blob, dtype=np.int32, count=size, offset=4),
+            np.frombuffer(blob, dtype=np.float32, count=size, offset=4 + size * 4)
+        )
+
+    @staticmethod
+    def _weigh(ids: np.ndarray, term_vectors: Dict[int, Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        """Нормированные векторы TF-IDF приложений (по строке на приложение в порядке ids)"""
+        vectors = np.zeros((len(ids), settings.SIMILAR_APPS_DIMENSIONS), dtype=np.float32)
+        for i, app_id in enumerate(ids):
+            indices, values = term_vectors[int(app_id)]
+            vectors[i, indices] = values
+
+        document_frequency = np.count_nonzero(vectors, axis=0)
+        vectors *= np.log((1 + len(ids)) / (1 + document_frequency)).astype(np.float32) + 1
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+
+class SimilarityRefresher:
+    """
+    Фоновый пересчет похожих приложений после изменения каталога
+
+    Запись в этом воркере планирует пересчет; несколько записей подряд
+    объединяются в один пересчет после паузы SIMILAR_APPS_REFRESH_DELAY.
+    Пересчитывает один воркер за раз: аренда в app_similarity_lease
+    берется условным UPDATE (свободна или истекла через
+    SIMILAR_APPS_LEASE_SECONDS) и при освобождении запоминает номер
+    журнала изменений, по которому выполнен пересчет. Воркер, не взявший
+    аренду, повторяет попытку после паузы, а если этот номер журнала уже
+    пересчитан другим воркером, ничего не делает - поэтому одновременно
+    стартующие воркеры пересчитывают соседей один раз.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self._session_factory = session_factory
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._stopping = threading.Event()
+        catalog_version.subscribe(self._on_catalog_change)
+
+    def start(self) -> None:
+        """Запустить фоновый поток и запланировать проверку при старте"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="similar-apps", daemon=True)
+            self._thread.start()
+        self._pending.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановить фоновый поток"""
+        self._stopping.set()
+        self._pending.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Пересчитать соседей сейчас (409, если пересчет уже выполняет другой воркер или поток)"""
+        result = self._refresh_leased(full=full)
+        if result is None:
+            raise HTTPException(status_code=409, detail="Similar apps refresh is already running")
+        return result
+
+    def _refresh_leased(self, full: bool = False, skip_refreshed: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Пересчитать соседей под арендой
+
+        Args:
+            full: Пересчитать соседей всех приложений
+            skip_refreshed: Не пересчитывать, если текущий номер журнала уже пересчитан
+
+        Returns:
+            Результат пересчета (None - аренду держит другой воркер)
+        """
+        db = self._session_factory()
+        try:
+            seq = db.execute(select(func.max(CatalogChangeRecord.seq))).scalar() or 0
+            if skip_refreshed and db.execute(
+                select(AppSimilarityLease.catalog_seq).where(AppSimilarityLease.id == _LEASE_ID)
+            ).scalar() == seq:
+                return {"mode": "none", "recomputed": 0, "removed": 0}
+            if not self._acquire(db):
+                return None
+
+            refreshed = False
+            try:
+                result = SimilarityService(db).refresh(full=full)
+                refreshed = True
+                return result
+            finally:
+                db.rollback()
+                self._release(db, seq if refreshed else None)
+        finally:
+            db.close()
+
+    def _acquire(self, db: Session) -> bool:
+        """Взять аренду, если она свободна или истекла"""
+        now = time.time()
+        db.execute(
+            sqlite_insert(AppSimilarityLease).on_conflict_do_nothing(),
+            [{"id": _LEASE_ID, "owner": None, "expires_at": 0}]
+        )
+        claimed = db.execute(
+            update(AppSimilarityLease)
+            .where(
+                AppSimilarityLease.id == _LEASE_ID,
+                or_(AppSimilarityLease.owner.is_(None), AppSimilarityLease.expires_at <= now)
+            )
+            .values(owner=self._owner, expires_at=now + settings.SIMILAR_APPS_LEASE_SECONDS)
+        ).rowcount
+        commit_session(db)
+        return bool(claimed)
+
+    def _release(self, db: Session, seq: Optional[int]) -> None:
+        """Освободить аренду и запомнить пересчитанный номер журнала (None - пересчет не удался)"""
+        values: Dict[str, Any] = {"owner": None, "expires_at": 0}
+        if seq is not None:
+            values["catalog_seq"] = seq
+        db.execute(
+            update(AppSimilarityLease)
+            .where(AppSimilarityLease.id == _LEASE_ID, AppSimilarityLease.owner == self._owner)
+            .values(**values)
+        )
+        commit_session(db)
+
+    def _on_catalog_change(self, changes: Set[CatalogChange], version: int) -> None:
+        if any(entity == "app" for entity, _ in changes):
+            self._pending.set()
+
+    def _run(self) -> None:
+        while True:
+            self._pending.wait()
+            if self._stopping.is_set():
+                return
+            # Ждем, пока серия записей закончится
+            self._stopping.wait(settings.SIMILAR_APPS_REFRESH_DELAY)
+            if self._stopping.is_set():
+                return
+            self._pending.clear()
+            try:
+                result = self._refresh_leased(skip_refreshed=True)
+                if result is None:
+                    # Пересчитывает другой воркер: после паузы проверим, учел ли он наши записи
+                    self._pending.set()
+                elif result["mode"] != "none":
+                    logger.info("Similar apps refreshed: %s", result)
+            except Exception as e:
+                logger.warning("Similar apps refresh failed: %s", e)
+
+
+similarity_refresher = SimilarityRefresher()
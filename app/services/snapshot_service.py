@@ -0,0 +1,261 @@
+"""
+Снимок каталога для первой загрузки на клиенте
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from app.database import SessionLocal
+from app.models.app import App
+from app.models.catalog_change import CatalogChangeRecord
+from app.models.category import Category
+from app.schema import SCHEMA_VERSION
+from app.schemas.app import AppResponse
+from app.schemas.category import CategoryResponse
+from app.services.category_service import CategoryService
+from app.utils.catalog_version import CatalogChange, catalog_version
+from config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+_SNAPSHOT_NAME = re.compile(r"^catalog-(\d+)\.ndjson\.gz$")
+# Приложений в одном запросе при выгрузке
+_APPS_CHUNK = 500
+
+
+class SnapshotService:
+    """
+    Сборка снимка каталога
+
+    Снимок - gzip NDJSON: первая строка - заголовок с номером журнала
+    изменений (seq), затем категории и активные приложения со скриншотами
+    и хешами, по объекту на строку. После загрузки снимка клиент
+    продолжает синхронизацию через /api/v1/changes?since=<seq>.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_current_seq(self) -> int:
+        """Номер последнего изменения каталога"""
+        return self.db.query(func.max(CatalogChangeRecord.seq)).scalar() or 0
+
+    def build(self, directory: str) -> Tuple[int, str]:
+        """
+        Собрать снимок в каталоге directory
+
+        Номер seq читается до данных, поэтому снимок не старше seq: изменения,
+        попавшие в снимок после чтения номера, клиент повторно получит
+        из журнала, и их применение ничего не испортит. Файл пишется
+        во временный и создается под итоговым именем эксклюзивно: если снимок
+        с тем же seq уже собрал другой воркер, остается его файл, поэтому
+        все воркеры отдают под одним seq одно и то же содержимое.
+
+        Returns:
+            Номер seq снимка и путь к файлу
+        """
+        seq = self.get_current_seq()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"catalog-{seq}.ndjson.gz")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+
+        try:
+            # Имя в заголовке gzip - итоговое, а не временного файла
+            with open(temp_path, "wb") as raw, gzip.GzipFile(
+                filename=os.path.basename(path), mode="wb", fileobj=raw, compresslevel=6
+            ) as snapshot:
+                for line in self._lines(seq):
+                    snapshot.write(line)
+            try:
+                os.link(temp_path, path)
+            except FileExistsError:
+                pass
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return seq, path
+
+    def _lines(self, seq: int) -> Iterator[bytes]:
+        header = {
+            "type": "snapshot",
+            "seq": seq,
+            "schema_version": SCHEMA_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        yield json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+        category_hashes = dict(self.db.query(Category.id, Category.data_hash).all())
+        for category in CategoryService(self.db).get_categories_by_ids(list(category_hashes)):
+            data = CategoryResponse.model_validate(category).model_dump(mode="json")
+            yield self._line("category", data, category_hashes[category.id])
+
+        # Приложения выгружаются пачками по ID, чтобы не держать весь каталог в памяти
+        last_id = 0
+        while True:
+            apps = self.db.query(App).options(selectinload(App.screenshots)).filter(
+                App.is_active == True, App.id > last_id
+            ).order_by(App.id).limit(_APPS_CHUNK).all()
+            if not apps:
+                break
+            for app in apps:
+                yield self._line("app", AppResponse.model_validate(app).model_dump(mode="json"), app.data_hash)
+            last_id = apps[-1].id
+            self.db.expunge_all()
+
+    @staticmethod
+    def _line(entity: str, data: Dict[str, Any], data_hash: Optional[str]) -> bytes:
+        record = {"type": entity, **data, "data_hash": data_hash}
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class Snapshot:
+    """
+    Файл снимка, отображенный в память
+
+    ETag включает хеш содержимого: докачка по If-Range с другого воркера
+    не склеит байты разных файлов.
+    """
+
+    def __init__(self, seq: int, path: str):
+        self.seq = seq
+        self.path = path
+        with open(path, "rb") as snapshot_file:
+            self.size = os.fstat(snapshot_file.fileno()).st_size
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.etag = f'"catalog-{seq}-{hashlib.sha256(self._map).hexdigest()[:32]}"'
+        self.data = memoryview(self._map)
+
+
+class SnapshotStore:
+    """
+    Текущий снимок каталога и его фоновое обновление
+
+    Текущим считается файл с наибольшим seq в SNAPSHOT_DIR, поэтому снимок,
+    собранный любым воркером, сразу отдают все. Файл отображается в память
+    один раз; ответы - срезы memoryview без копирования содержимого.
+    После записи в этом воркере снимок пересобирается в фоне с паузой
+    SNAPSHOT_REFRESH_DELAY, чтобы серия записей дала одну сборку.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.SNAPSHOT_DIR,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        self._directory = directory
+        self._session_factory = session_factory
+        self._current: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = threading.Event()
+        self._stopping = threading.Event()
+        catalog_version.subscribe(self._on_catalog_change)
+
+    def current(self) -> Optional[Snapshot]:
+        """
+        Самый новый снимок на диске (None, если снимков еще нет)
+
+        Другой воркер может удалить найденный файл до его открытия, собрав
+        более новый снимок: тогда поиск повторяется и находит новый файл.
+        """
+        while True:
+            latest = self._latest_file()
+            if latest is None:
+                return None
+            seq, path = latest
+            with self._lock:
+                if self._current is not None and self._current.seq == seq:
+                    return self._current
+                try:
+                    self._current = Snapshot(seq, path)
+                except FileNotFoundError:
+                    continue
+                return self._current
+
+    def refresh(self) -> Snapshot:
+        """Собрать снимок, если каталог изменился после последнего, и вернуть текущий"""
+        with self._build_lock:
+            db = self._session_factory()
+            try:
+                service = SnapshotService(db)
+                latest = self._latest_file()
+                if latest is None or latest[0] < service.get_current_seq():
+                    seq, path = service.build(self._directory)
+                    logger.info("Catalog snapshot built: seq %s, %s bytes", seq, os.path.getsize(path))
+                    self._remove_old(keep=settings.SNAPSHOT_KEEP)
+            finally:
+                db.close()
+        return self.current()
+
+    def start(self) -> None:
+        """Запустить фоновый поток и проверить актуальность снимка"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="catalog-snapshot", daemon=True)
+            self._thread.start()
+        self._pending.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Остановить фоновый поток"""
+        self._stopping.set()
+        self._pending.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _on_catalog_change(self, changes: Set[CatalogChange], version: int) -> None:
+        self._pending.set()
+
+    def _run(self) -> None:
+        while True:
+            self._pending.wait()
+            if self._stopping.is_set():
+                return
+            # Ждем, пока серия записей закончится
+            self._stopping.wait(settings.SNAPSHOT_REFRESH_DELAY)
+            if self._stopping.is_set():
+                return
+            self._pending.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Catalog snapshot build failed: %s", e)
+
+    def _latest_file(self) -> Optional[Tuple[int, str]]:
+        files = self._snapshot_files()
+        return max(files) if files else None
+
+    def _snapshot_files(self) -> List[Tuple[int, str]]:
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return []
+        files = []
+        for name in names:
+            match = _SNAPSHOT_NAME.match(name)
+            if match:
+                files.append((int(match.group(1)), os.path.join(self._directory, name)))
+        return files
+
+    def _remove_old(self, keep: int) -> None:
+        # Старые файлы удаляются с диска; уже отображенные в память остаются доступны до закрытия
+        for _, path in sorted(self._snapshot_files(), reverse=True)[keep:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+snapshot_store = SnapshotStore()
@@ -0,0 +1,118 @@
+"""
+Префиксный индекс подсказок для поиска по мере ввода
+"""
+import heapq
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.app import App
+from app.services.catalog_index import CatalogIndex
+from app.utils.text_utils import TextUtils
+
+# Сколько последних ответов на префиксы запоминается до следующего изменения индекса
+_MEMO_SIZE = 4096
+
+
+class SuggestIndex(CatalogIndex):
+    """
+    Индекс подсказок в памяти воркера
+
+    Отсортированный массив пар (ключ поиска, ID приложения) по названиям
+    и компаниям, включая каждое слово названия, так что "music" и "вк"
+    находят "VK Music". Поиск по префиксу - два бинарных поиска и выбор
+    лучших по рейтингу внутри найденного диапазона; ответы на популярные
+    префиксы запоминаются. К базе индекс обращается только для
+    обновления после изменения каталога.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._memo: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self._reset()
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Подсказки по префиксу
+
+        Args:
+            prefix: Введенный пользователем текст
+            limit: Максимальное количество подсказок
+
+        Returns:
+            Приложения, название или компания которых начинается с префикса,
+            по убыванию рейтинга
+        """
+        self.ensure_fresh()
+        key = TextUtils.search_key(prefix)
+        if not key:
+            return []
+
+        memo_key = (key, limit)
+        with self._lock:
+            cached = self._memo.get(memo_key)
+            if cached is not None:
+                self._memo.move_to_end(memo_key)
+                return cached
+
+            start = bisect_left(self._keys, (key,))
+            end = bisect_left(self._keys, (key + "\uffff",))
+            app_ids = {app_id for _, app_id in self._keys[start:end]}
+            best = heapq.nlargest(limit, app_ids, key=self._rank)
+            result = [self._apps[app_id] for app_id in best]
+
+            self._memo[memo_key] = result
+            if len(self._memo) > _MEMO_SIZE:
+                self._memo.popitem(last=False)
+            return result
+
+    def _load_rows(self, db: Session, app_ids: Optional[Iterable[int]] = None) -> List[Any]:
+        query = db.query(App.id, App.name, App.company, App.icon_url, App.rating).filter(App.is_active == True)
+        if app_ids is not None:
+            query = query.filter(App.id.in_(list(app_ids)))
+        return query.all()
+
+    def _reset(self) -> None:
+        self._keys: List[Tuple[str, int]] = []
+        self._keys_by_app: Dict[int, List[str]] = {}
+        self._apps: Dict[int, Dict[str, Any]] = {}
+
+    def _add(self, row: Any) -> None:
+        keys = set()
+        for text in (row.name, row.company):
+            words = TextUtils.search_key(text).split(" ")
+            # Ключ для каждого слова: "vk music" находится и по "vk", и по "mus"
+            for i in range(len(words)):
+                if words[i]:
+                    keys.add(" ".join(words[i:]))
+
+        self._apps[row.id] = {
+            "id": row.id,
+            "name": row.name,
+            "company": row.company,
+            "icon_url": row.icon_url,
+            "rating": row.rating
+        }
+        self._keys_by_app[row.id] = list(keys)
+        # Порядок восстанавливается в _after_change одной сортировкой
+        self._keys.extend((key, row.id) for key in keys)
+
+    def _remove(self, app_id: int) -> None:
+        for key in self._keys_by_app.pop(app_id, []):
+            position = bisect_left(self._keys, (key, app_id))
+            if position < len(self._keys) and self._keys[position] == (key, app_id):
+                del self._keys[position]
+        self._apps.pop(app_id, None)
+
+    def _after_change(self) -> None:
+        self._keys.sort()
+        self._memo.clear()
+
+    def _rank(self, app_id: int) -> Tuple[float, int]:
+        rating = self._apps[app_id]["rating"]
+        return (rating if rating is not None else -1.0, -app_id)
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,122 @@
+"""
+Запуск и остановка приложения (lifespan)
+"""
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterator
+
+from fastapi import FastAPI
+
+from app.api.routes.apps import render_apps_page, render_featured
+from app.api.routes.categories import render_categories
+from app.api.routes.home import render_home
+from app.database import SessionLocal
+from app.services.app_event_service import app_event_recorder
+from app.models.category import Category
+from app.schema import ensure_schema
+from app.services.catalog_read_model import catalog_read_model
+from app.services.facet_index import facet_index
+from app.services.scrub_service import integrity_scrubber
+from app.services.similarity_service import similarity_refresher
+from app.services.snapshot_service import snapshot_store
+from app.services.suggest_index import suggest_index
+from app.utils.write_queue import write_queue
+from config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@contextmanager
+def _phase(timings: Dict[str, float], name: str) -> Iterator[None]:
+    """Замер длительности этапа запуска в миллисекундах"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+def warmup_hot_paths() -> Dict[str, int]:
+    """
+    Прогрев горячих путей чтения: главный экран, категории, топ, первые страницы,
+    индексы подсказок и фасетов и модель чтения каталога
+
+    Ответы вычисляются заранее и попадают в кеш каталога, поэтому первые
+    запросы клиентов не платят за открытие соединения, компиляцию SQL,
+    построение валидаторов и чтение страниц базы с диска.
+
+    Returns:
+        Количество прогретых ответов по каждому пути
+    """
+    db = SessionLocal()
+    try:
+        # Модель чтения загружается первой: списки ниже уже строятся из нее
+        if catalog_read_model.enabled:
+            catalog_read_model.rebuild()
+        render_home(db)
+        render_categories(db)
+        render_featured(db)
+        render_apps_page(db)
+        category_ids = [category_id for (category_id,) in db.query(Category.id).all()]
+        for category_id in category_ids:
+            render_apps_page(db, category_id=category_id)
+        # Индексы подсказок и фасетов читают async-маршруты: первое построение не должно идти в цикле событий
+        suggest_index.rebuild()
+        facet_index.rebuild()
+
+        return {
+            "home": 1, "categories": 1, "featured": 1, "apps_pages": len(category_ids) + 1, "suggest_index": 1,
+            "facet_index": 1, "read_model": int(catalog_read_model.enabled)
+        }
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Подготовка воркера до приема запросов и корректная остановка"""
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    with _phase(timings, "schema"):
+        schema = ensure_schema()
+    with _phase(timings, "write_queue"):
+        write_queue.start()
+    with _phase(timings, "app_events"):
+        # События приложений копятся в памяти и записываются пачками
+        app_event_recorder.start()
+    with _phase(timings, "similar_apps"):
+        # Пересчет соседей изменившихся приложений идет в фоне
+        similarity_refresher.start()
+    with _phase(timings, "snapshot"):
+        # Снимок каталога собирается в фоне, если устарел
+        snapshot_store.start()
+    if settings.SCRUB_ENABLED:
+        with _phase(timings, "scrubber"):
+            # Целостность проверяется в фоне небольшими срезами
+            integrity_scrubber.start()
+    if settings.WARMUP_ON_STARTUP:
+        with _phase(timings, "warmup"):
+            try:
+                logger.info("Warmup: %s", warmup_hot_paths())
+            except Exception as e:
+                # Прогрев ускоряет первые запросы, но не должен мешать запуску
+                logger.warning("Warmup failed: %s", e)
+
+    if schema["from"] != schema["to"]:
+        logger.info("Database schema upgraded: %s -> %s", schema["from"], schema["to"])
+    logger.info(
+        "Startup completed in %.1f ms (%s)",
+        (time.perf_counter() - started) * 1000,
+        ", ".join(f"{name}: {ms:.1f} ms" for name, ms in timings.items())
+    )
+
+    yield
+
+    # Дописываем накопленные в очереди изменения перед остановкой
+    write_queue.stop()
+    app_event_recorder.stop()
+    similarity_refresher.stop()
+    snapshot_store.stop()
+    integrity_scrubber.stop()
@@ -0,0 +1,326 @@
+"""
+Контроль допуска запросов: лимиты клиентов, конкурентность групп маршрутов,
+сброс нагрузки и дедлайны
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Optional
+
+from sqlalchemy.exc import OperationalError
+from starlette.responses import JSONResponse
+
+from config import settings
+
+# Момент (time.monotonic), после которого работа запроса прерывается.
+# Переменная контекста видна и в потоках, где FastAPI выполняет синхронный код
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# Дорогие маршруты обслуживания (проверка хешей клиента и состояние фоновой проверки - обычное чтение)
+_MAINTENANCE_PREFIXES = ("/api/v1/hash/", "/api/v1/apps/similar/refresh", "/api/v1/archive/run", "/api/v1/assets/")
+_CATALOG_PATHS = ("/api/v1/hash/check", "/api/v1/hash/scrub", "/api/v1/hash/scrub/mismatches")
+# Статистика должна отвечать и под перегрузкой
+_EXEMPT_PREFIXES = ("/api/v1/system/",)
+# Сглаживание задержки запросов группы и срок, после которого замер без новых запросов устаревает, с
+_LATENCY_ALPHA = 0.1
+_LATENCY_WINDOW = 10.0
+
+
+def deadline_exceeded() -> bool:
+    """Истек ли дедлайн текущего запроса"""
+    deadline = request_deadline.get()
+    return deadline is not None and time.monotonic() > deadline
+
+
+class TokenBucket:
+    """Корзина токенов одного клиента"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, cost: float, rate: float, burst: float, now: float) -> float:
+        """
+        Списать cost токенов
+
+        Returns:
+            0, если запрос допущен, иначе сколько секунд ждать до нужного числа токенов
+        """
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate
+
+
+class RouteGroup:
+    """
+    Группа маршрутов с ограничением одновременных запросов
+
+    Запросы сверх max_concurrency ждут в очереди не дольше queue_timeout;
+    если в очереди уже max_queue запросов, новый сразу получает 503:
+    ожидание в длинной очереди только растит задержку для всех.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, deadline: float, cost: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.cost = cost
+        self.in_flight = 0
+        self._latency = 0.0
+        self._latency_updated = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.stats = {"admitted": 0, "shed": 0, "queue_timeouts": 0, "deadline_exceeded": 0, "max_waiting": 0}
+
+    async def acquire(self, timeout: float) -> bool:
+        """Занять место; False - запрос нужно отклонить"""
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.stats["shed"] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["max_waiting"] = max(self.stats["max_waiting"], len(self._waiters))
+        try:
+            # Место передает release: in_flight при этом не меняется
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.stats["queue_timeouts"] += 1
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.stats["admitted"] += 1
+        return True
+
+    def release(self) -> None:
+        """Освободить место или передать его первому ждущему"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @property
+    def waiting(self) -> int:
+        """Запросов в очереди группы"""
+        return len(self._waiters)
+
+    def observe(self, seconds: float) -> None:
+        """Учесть длительность обработки запроса"""
+        self._latency += _LATENCY_ALPHA * (seconds - self._latency)
+        self._latency_updated = time.monotonic()
+
+    def recent_latency(self) -> float:
+        """Сглаженная задержка последних запросов, с (0, если запросов давно не было)"""
+        if time.monotonic() - self._latency_updated > _LATENCY_WINDOW:
+            return 0.0
+        return self._latency
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "deadline": self.deadline,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "latency_ms": round(self.recent_latency() * 1000, 1),
+            **self.stats
+        }
+
+
+class AdmissionController:
+    """
+    Решение о допуске запросов воркера
+
+    Каждый клиент (известный X-API-Key или IP) тратит токены своей корзины: запрос
+    каталога стоит 1 токен, запрос обслуживания - ADMISSION_MAINTENANCE_COST.
+    Затем запрос занимает место в своей группе маршрутов: дорогое
+    обслуживание (проверка и пересчет хешей, пересчет похожих) не может
+    занять все места, нужные чтению каталога.
+    """
+
+    def __init__(self):
+        self.enabled = settings.ADMISSION_ENABLED
+        self.rate = settings.ADMISSION_RATE
+        self.burst = settings.ADMISSION_BURST
+        self.max_clients = settings.ADMISSION_MAX_CLIENTS
+        self.api_keys = settings.ADMISSION_API_KEYS
+        self.queue_timeout = settings.ADMISSION_QUEUE_TIMEOUT
+        self.groups = {
+            "catalog": RouteGroup(
+                "catalog",
+                settings.ADMISSION_CATALOG_CONCURRENCY,
+                settings.ADMISSION_CATALOG_QUEUE,
+                settings.ADMISSION_CATALOG_DEADLINE,
+                cost=1
+            ),
+            "maintenance": RouteGroup(
+                "maintenance",
+                settings.ADMISSION_MAINTENANCE_CONCURRENCY,
+                settings.ADMISSION_MAINTENANCE_QUEUE,
+                settings.ADMISSION_MAINTENANCE_DEADLINE,
+                cost=settings.ADMISSION_MAINTENANCE_COST
+            )
+        }
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.stats = {"rate_limited": 0}
+
+    def classify(self, path: str) -> Optional[RouteGroup]:
+        """Группа маршрута (None - запрос не ограничивается)"""
+        if not path.startswith("/api/") or path.startswith(_EXEMPT_PREFIXES):
+            return None
+        if path.startswith(_MAINTENANCE_PREFIXES) and path not in _CATALOG_PATHS:
+            return self.groups["maintenance"]
+        return self.groups["catalog"]
+
+    def take_tokens(self, client: str, cost: float) -> float:
+        """Списать токены клиента; возвращает паузу в секундах, если токенов не хватает"""
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.burst, now)
+            self._buckets[client] = bucket
+            # Корзины давно не приходивших клиентов вытесняются
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+
+        wait = bucket.take(cost, self.rate, self.burst, now)
+        if wait:
+            self.stats["rate_limited"] += 1
+        return wait
+
+    def client_key(self, scope: Dict[str, Any]) -> str:
+        """
+        Корзина клиента: известный ключ из ADMISSION_API_KEYS или IP
+
+        Непроверенный X-API-Key не дает своей корзины: иначе случайный ключ
+        в каждом запросе обходил бы лимит и вытеснял корзины других клиентов.
+        """
+        for name, value in scope.get("headers", ()):
+            if name == b"x-api-key" and value:
+                key = value.decode("latin-1")
+                if key in self.api_keys:
+                    return "key:" + key
+                break
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rate_limit": {
+                "rate": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                **self.stats
+            },
+            "groups": {name: group.get_stats() for name, group in self.groups.items()}
+        }
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware контроля допуска
+
+    - 429 с Retry-After, если у клиента кончились токены
+    - 503 с Retry-After, если очередь группы полна или место не освободилось
+      за ADMISSION_QUEUE_TIMEOUT
+    - 504, если обработчик не начал ответ до дедлайна группы. Ожидающий код
+      отменяется, а запросы SQLite прерываются обработчиком прогресса
+      (см. app/database.py), поэтому работа не продолжается впустую
+    """
+
+    def __init__(self, app: Callable, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        group = self.controller.classify(scope["path"]) if scope["type"] == "http" else None
+        if group is None or not self.controller.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        wait = self.controller.take_tokens(self.controller.client_key(scope), group.cost)
+        if wait:
+            await self._reject(scope, receive, send, 429, "Слишком много запросов", wait)
+            return
+        if not await group.acquire(self.controller.queue_timeout):
+            await self._reject(scope, receive, send, 503, "Сервер перегружен", self.controller.queue_timeout)
+            return
+
+        started = asyncio.Event()
+        abandoned = False
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            # После ответа 504 поздний ответ обработчика никуда не отправляется
+            if abandoned:
+                return
+            if message["type"] == "http.response.start":
+                started.set()
+            await send(message)
+
+        admitted = time.monotonic()
+        token = request_deadline.set(admitted + group.deadline)
+        try:
+            # Задача копирует контекст вместе с дедлайном
+            task = asyncio.ensure_future(self.app(scope, receive, send_wrapper))
+        finally:
+            request_deadline.reset(token)
+        def finished(_: asyncio.Future) -> None:
+            # Место освобождается, когда обработчик действительно закончил
+            group.observe(time.monotonic() - admitted)
+            group.release()
+
+        task.add_done_callback(finished)
+
+        waiter = asyncio.ensure_future(started.wait())
+        done, _ = await asyncio.wait({task, waiter}, timeout=group.deadline, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        if not done:
+            abandoned = True
+            task.cancel()
+            # Синхронный код в потоке отмену не видит: его исключение только забираем
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            group.stats["deadline_exceeded"] += 1
+            await self._reject(scope, receive, send, 504, "Превышено время обработки запроса")
+            return
+
+        try:
+            # Ответ начат: дослать его без ограничения по времени
+            await task
+        except OperationalError as e:
+            if started.is_set() or "interrupted" not in str(e):
+                raise
+            group.stats["deadline_exceeded"] += 1
+            await self._reject(scope, receive, send, 504, "Превышено время обработки запроса")
+
+    @staticmethod
+    async def _reject(
+        scope: Dict[str, Any],
+        receive: Callable,
+        send: Callable,
+        status_code: int,
+        detail: str,
+        retry_after: Optional[float] = None
+    ) -> None:
+        headers = {"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after is not None else None
+        response = JSONResponse({"detail": detail}, status_code=status_code, headers=headers)
+        await response(scope, receive, send)
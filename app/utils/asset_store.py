@@ -0,0 +1,294 @@
+"""
+Хранилище загружаемых файлов по содержимому (content-addressed)
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+# Допустимые расширения загружаемых файлов: изображения и APK
+ASSET_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".apk"}
+# Каталог файлов внутри каталога статики и их URL
+BLOBS_DIR = "blobs"
+BLOBS_URL_PREFIX = f"/static/{BLOBS_DIR}/"
+STATIC_URL_PREFIX = "/static/"
+# Каталоги статики с файлами приложений (остальное - данные заполнения базы)
+ASSET_DIRS = ("icons", "headers", "screenshots", "apks", BLOBS_DIR)
+# Часть файла, передаваемая в SHA-256 за раз
+_HASH_BLOCK = 8 * 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """
+    SHA-256 файла через отображение в память
+
+    Файл не копируется в буферы Python, а hashlib отпускает GIL
+    на больших блоках, поэтому несколько потоков хешируют параллельно
+    и скорость упирается в диск.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for start in range(0, size, _HASH_BLOCK):
+                        digest.update(view[start:start + _HASH_BLOCK])
+                finally:
+                    view.release()
+    return digest.hexdigest()
+
+
+@dataclass
+class StoredBlob:
+    """Сохраненный файл"""
+    url: str
+    sha256: str
+    size: int
+    deduplicated: bool
+
+
+class BlobWriter:
+    """Запись одного файла во временный файл с подсчетом SHA-256 по ходу записи"""
+
+    def __init__(self, store: "AssetStore", extension: str):
+        self._store = store
+        self._extension = extension
+        self._hash = hashlib.sha256()
+        self.size = 0
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self._store.max_bytes:
+            raise HTTPException(status_code=413, detail=f"Файл больше {self._store.max_bytes} байт")
+        self._hash.update(data)
+        self._file.write(data)
+
+    def commit(self) -> StoredBlob:
+        """Переместить файл на место по его хешу; одинаковый файл хранится один раз"""
+        self._file.close()
+        digest = self._hash.hexdigest()
+        relative = f"{digest[:2]}/{digest}{self._extension}"
+        path = os.path.join(self._store.blob_dir, relative)
+        deduplicated = False
+        if os.path.exists(path):
+            try:
+                # Свежая отметка времени защищает файл от сборки мусора, пока на него не сослались
+                os.utime(path)
+                deduplicated = True
+            except FileNotFoundError:
+                # Сборка мусора удалила файл после проверки: сохраняем загруженную копию
+                pass
+        if deduplicated:
+            os.remove(self._tmp_path)
+        else:
+            os.chmod(self._tmp_path, 0o644)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(self._tmp_path, path)
+            except FileNotFoundError:
+                # Сборка мусора удалила опустевший каталог между созданием и переносом
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(self._tmp_path, path)
+        return StoredBlob(url=BLOBS_URL_PREFIX + relative, sha256=digest, size=self.size, deduplicated=deduplicated)
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class AssetStore:
+    """
+    Файлы иконок, заголовков, скриншотов и APK под data/blobs
+
+    Имя файла - SHA-256 его содержимого, поэтому одинаковые файлы хранятся
+    один раз, а URL файла не меняется, пока не меняется содержимое.
+    Загрузка пишется во временный файл по частям и хешируется по ходу
+    записи, так что память не зависит от размера файла. Файлы, на которые
+    не ссылается ни одно приложение или скриншот, удаляет сборка мусора.
+    """
+
+    def __init__(self, root: str = settings.STATIC_DIR, max_bytes: int = settings.ASSET_MAX_BYTES):
+        self.root = root
+        self.blob_dir = os.path.join(root, BLOBS_DIR)
+        self.tmp_dir = os.path.join(self.blob_dir, "tmp")
+        self.max_bytes = max_bytes
+
+    def open(self, filename: str) -> BlobWriter:
+        """Начать запись файла с расширением, взятым из имени загружаемого файла"""
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in ASSET_EXTENSIONS:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Допустимые расширения файлов: {', '.join(sorted(ASSET_EXTENSIONS))}"
+            )
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return BlobWriter(self, extension)
+
+    async def receive(self, request: Request, field_name: str = "file") -> StoredBlob:
+        """
+        Принять файл из тела multipart/form-data, не загружая его в память
+
+        Тело читается из потока запроса и разбирается по мере поступления;
+        данные поля field_name пишутся в файл в пуле потоков.
+        """
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Ожидается multipart/form-data")
+
+        events: List[Tuple[str, Any]] = []
+        header: Dict[str, bytes] = {"name": b"", "value": b""}
+
+        def on_header_field(data: bytes, start: int, end: int) -> None:
+            header["name"] += data[start:end]
+
+        def on_header_value(data: bytes, start: int, end: int) -> None:
+            header["value"] += data[start:end]
+
+        def on_header_end() -> None:
+            events.append(("header", (header["name"].lower(), header["value"])))
+            header["name"] = header["value"] = b""
+
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": lambda: events.append(("begin", None)),
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": lambda: events.append(("headers", None)),
+            "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+            "on_part_end": lambda: events.append(("end", None))
+        })
+
+        writer: Optional[BlobWriter] = None
+        blob: Optional[StoredBlob] = None
+        disposition = b""
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for kind, value in events:
+                    if kind == "begin":
+                        disposition = b""
+                    elif kind == "header" and value[0] == b"content-disposition":
+                        disposition = value[1]
+                    elif kind == "headers" and blob is None and writer is None:
+                        _, options = parse_options_header(disposition)
+                        if options.get(b"name", b"").decode("utf-8", "replace") == field_name:
+                            filename = options.get(b"filename", b"").decode("utf-8", "replace")
+                            writer = self.open(filename)
+                    elif kind == "data" and writer is not None:
+                        await run_in_threadpool(writer.write, value)
+                    elif kind == "end" and writer is not None:
+                        blob = await run_in_threadpool(writer.commit)
+                        writer = None
+                events.clear()
+            parser.finalize()
+        except MultipartParseError as e:
+            raise HTTPException(status_code=400, detail=f"Некорректное тело multipart/form-data: {e}")
+        finally:
+            if writer is not None:
+                await run_in_threadpool(writer.abort)
+
+        if blob is None:
+            raise HTTPException(status_code=400, detail=f"Файл не передан в поле {field_name}")
+        return blob
+
+    def resolve(self, url: str) -> Optional[str]:
+        """Путь файла относительно каталога статики по URL /static/...; None - внешний или недопустимый URL"""
+        path = unquote(urlparse(url).path)
+        if not path.startswith(STATIC_URL_PREFIX):
+            return None
+        relative = os.path.normpath(path[len(STATIC_URL_PREFIX):]).replace(os.sep, "/")
+        if relative.startswith(("../", "/")) or relative in ("..", "."):
+            return None
+        return relative
+
+    def iter_asset_files(self) -> Iterator[Tuple[str, os.stat_result]]:
+        """Файлы приложений в каталоге статики: (путь относительно статики, stat), без временных загрузок"""
+        for name in ASSET_DIRS:
+            top = os.path.join(self.root, name)
+            for directory, directories, files in os.walk(top):
+                if directory == top and name == BLOBS_DIR and "tmp" in directories:
+                    directories.remove("tmp")
+                for file_name in files:
+                    path = os.path.join(directory, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield os.path.relpath(path, self.root).replace(os.sep, "/"), stat
+
+    @staticmethod
+    def blob_digest(relative: str) -> Optional[str]:
+        """Ожидаемый SHA-256 файла хранилища по его имени (None - файл не из хранилища)"""
+        if not relative.startswith(BLOBS_DIR + "/"):
+            return None
+        name = os.path.splitext(os.path.basename(relative))[0]
+        return name if len(name) == 64 else None
+
+    def iter_blobs(self) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """Сохраненные файлы: (URL, путь, stat), включая незавершенные временные"""
+        if not os.path.isdir(self.blob_dir):
+            return
+        for directory, _, files in os.walk(self.blob_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.blob_dir).replace(os.sep, "/")
+                yield BLOBS_URL_PREFIX + relative, path, os.stat(path)
+
+    def sweep(self, referenced: Set[str], grace_seconds: float, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Удалить файлы, URL которых нет в referenced
+
+        Файлы моложе grace_seconds не удаляются: их могли загрузить,
+        но еще не сохранить ссылку в приложении.
+        """
+        referenced = {urlparse(url).path for url in referenced if url}
+        cutoff = time.time() - grace_seconds
+        result = {"blobs": 0, "referenced": 0, "recent": 0, "removed": 0, "freed_bytes": 0, "dry_run": dry_run}
+        for url, path, stat in self.iter_blobs():
+            result["blobs"] += 1
+            if url in referenced:
+                result["referenced"] += 1
+                continue
+            if stat.st_mtime > cutoff:
+                result["recent"] += 1
+                continue
+            if not dry_run:
+                try:
+                    # Файл могли загрузить повторно после обхода: загрузка обновляет mtime
+                    if os.stat(path).st_mtime > cutoff:
+                        result["recent"] += 1
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                self._remove_empty_dir(os.path.dirname(path))
+            result["removed"] += 1
+            result["freed_bytes"] += stat.st_size
+        return result
+
+    def _remove_empty_dir(self, directory: str) -> None:
+        if directory in (self.blob_dir, self.tmp_dir):
+            return
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+asset_store = AssetStore()
@@ -0,0 +1,219 @@
+"""
+Версия каталога, общая для всех воркеров, и кеш, проверяющий ее
+"""
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, List, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
+
+# Изменение каталога: ("app" | "category", id)
+CatalogChange = Tuple[str, int]
+CatalogListener = Callable[[Set[CatalogChange], int], None]
+
+_VERSION_FORMAT = "<Q"
+_VERSION_SIZE = struct.calcsize(_VERSION_FORMAT)
+
+
+class CatalogVersion:
+    """
+    Монотонно растущий номер версии каталога
+
+    Хранится в небольшом файле, отображенном в память каждого воркера:
+    проверка версии - это чтение 8 байт без системных вызовов и запросов
+    к базе. Увеличение версии выполняется под файловой блокировкой,
+    поэтому номера не теряются при одновременной записи из разных воркеров.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._fd = None
+        self._map = None
+        self._lock = threading.Lock()
+        self._listeners: List[CatalogListener] = []
+
+    def _ensure_open(self) -> mmap.mmap:
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+                    if os.fstat(fd).st_size < _VERSION_SIZE:
+                        os.ftruncate(fd, _VERSION_SIZE)
+                    self._fd = fd
+                    self._map = mmap.mmap(fd, _VERSION_SIZE)
+        return self._map
+
+    def current(self) -> int:
+        """Текущая версия каталога"""
+        return struct.unpack_from(_VERSION_FORMAT, self._ensure_open())[0]
+
+    def bump(self) -> int:
+        """Увеличить версию каталога и вернуть новое значение"""
+        version_map = self._ensure_open()
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                version = struct.unpack_from(_VERSION_FORMAT, version_map)[0] + 1
+                struct.pack_into(_VERSION_FORMAT, version_map, 0, version)
+            finally:
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return version
+
+    def subscribe(self, listener: CatalogListener) -> None:
+        """
+        Подписаться на изменения каталога в текущем воркере
+
+        Слушатель вызывается после фиксации транзакции с набором измененных
+        записей и новой версией. Изменения из других воркеров слушатель
+        не получает: их нужно обнаруживать сравнением версии.
+        """
+        self._listeners.append(listener)
+
+    def notify(self, changes: Set[CatalogChange], version: int) -> None:
+        for listener in self._listeners:
+            listener(changes, version)
+
+
+catalog_version = CatalogVersion(settings.CATALOG_VERSION_FILE)
+
+
+def mark_catalog_changed(db: Session, entity: str, entity_id: int) -> None:
+    """
+    Отметить изменение каталога в текущей транзакции
+
+    Версия каталога увеличивается только после успешного COMMIT,
+    поэтому читатели не увидят новую версию раньше новых данных.
+    """
+    db.info.setdefault("catalog_changes", set()).add((entity, entity_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_catalog_version(session: Session) -> None:
+    # Фиксация точки сохранения (SAVEPOINT) еще не делает данные видимыми
+    if session.in_nested_transaction():
+        return
+    changes = session.info.pop("catalog_changes", None)
+    if changes:
+        catalog_version.notify(changes, catalog_version.bump())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session: Session) -> None:
+    if not session.in_nested_transaction():
+        session.info.pop("catalog_changes", None)
+
+
+class CatalogCache:
+    """
+    Кеш данных каталога в памяти воркера
+
+    Каждая запись помнит версию каталога, с которой была вычислена.
+    Перед выдачей версия сверяется с общей, поэтому запись в любом
+    воркере делает устаревшими кеши во всех остальных.
+
+    Одновременные промахи по одному ключу объединяются (single-flight):
+    значение вычисляет первый запрос, остальные ждут его результат
+    (или ошибку) не дольше wait_timeout, а не повторяют тот же запрос
+    к базе и ту же сериализацию.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.CATALOG_CACHE_MAX_ENTRIES,
+        wait_timeout: float = settings.CATALOG_CACHE_WAIT_TIMEOUT
+    ):
+        self._entries: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self._max_entries = max_entries
+        self._wait_timeout = wait_timeout
+        self._flights: Dict[Tuple[Hashable, int], Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.wait_timeouts = 0
+
+    def get_or_set(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Вернуть значение из кеша или вычислить и сохранить его"""
+        # Версия читается до вычисления: если каталог изменится во время
+        # вычисления, запись окажется устаревшей и будет пересчитана
+        version = catalog_version.current()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            # Вычисление для другой версии не подходит: ключ полета включает версию
+            flight = self._flights.get((key, version))
+            if flight is None:
+                flight = Future()
+                self._flights[(key, version)] = flight
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            try:
+                return flight.result(timeout=self._wait_timeout)
+            except FutureTimeoutError:
+                with self._lock:
+                    self.wait_timeouts += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Данные каталога еще вычисляются, повторите запрос позже",
+                    headers={"Retry-After": "1"}
+                )
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._flights[(key, version)]
+            flight.set_exception(e)
+            raise
+
+        # Запись появляется в кеше до снятия полета: новый запрос увидит одно из двух
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            del self._flights[(key, version)]
+        flight.set_result(value)
+        return value
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "wait_timeouts": self.wait_timeouts,
+                "in_flight": len(self._flights)
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+catalog_cache = CatalogCache()
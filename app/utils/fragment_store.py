@@ -0,0 +1,77 @@
+"""
+Готовые JSON-фрагменты объектов каталога
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+from config import settings
+
+
+class FragmentStore:
+    """
+    JSON-байты отдельных приложений и категорий с вытеснением LRU по объему
+
+    Ключ фрагмента включает data_hash объекта, версию схемы и все, что
+    попадает в ответ помимо хешируемых данных (например, скриншоты),
+    поэтому изменение объекта дает новый ключ: фрагменты не нужно
+    сбрасывать, и устаревший фрагмент не может быть выдан. Старые
+    фрагменты просто вытесняются, когда объем превышает max_bytes.
+    Списки собираются склейкой фрагментов элементов.
+    """
+
+    def __init__(self, max_bytes: int = settings.FRAGMENT_STORE_MAX_BYTES):
+        self._fragments: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], bytes]) -> bytes:
+        """Вернуть фрагмент по ключу или отрендерить и сохранить его"""
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+
+        fragment = render()
+        with self._lock:
+            self.misses += 1
+            # Фрагмент больше всего хранилища не сохраняется, чтобы не вытеснить все остальные
+            if len(fragment) > self._max_bytes or key in self._fragments:
+                return fragment
+            self._fragments[key] = fragment
+            self._bytes += len(fragment)
+            while self._bytes > self._max_bytes:
+                _, evicted = self._fragments.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return fragment
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "fragments": len(self._fragments),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fragments.clear()
+            self._bytes = 0
+
+
+def join_fragments(fragments: Iterable[bytes]) -> bytes:
+    """JSON-массив из готовых фрагментов элементов"""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+fragment_store = FragmentStore()
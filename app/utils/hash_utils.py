@@ -5,6 +5,10 @@ import hashlib
 import json
 from typing import Any, Dict, Optional
 
+# Поля категории, входящие в хеш. apps_count не входит: он меняется при записи приложений,
+# а не категории, и его расчет загружает все приложения категории
+CATEGORY_HASH_FIELDS = ("name", "description", "tag", "tag_color")
+
 
 class HashUtils:
     """Утилиты для работы с хешами данных"""
@@ -77,9 +81,9 @@ class HashUtils:
             category_data: Данные категории
             
         Returns:
-            SHA-256 хеш категории
+            SHA-256 хеш категории (без apps_count)
         """
-        return HashUtils.calculate_data_hash(category_data)
+        return HashUtils.calculate_data_hash(category_data, exclude_fields=["apps_count"])
     
     @staticmethod
     def get_data_for_hash(obj: Any) -> Dict[str, Any]:
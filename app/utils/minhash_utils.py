@@ -0,0 +1,91 @@
+"""
+Утилиты MinHash и LSH для поиска почти одинаковых текстов
+"""
+import zlib
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.utils.text_utils import TextUtils
+
+# Количество перестановок MinHash (длина сигнатуры)
+_PERMUTATIONS = 128
+# Простое число Мерсенна 2^31 - 1: a * x + b помещается в uint64 без переполнения
+_PRIME = (1 << 31) - 1
+# Коэффициенты перестановок h(x) = (a * x + b) mod p, одинаковые во всех процессах
+_random = np.random.RandomState(20240517)
+_A = _random.randint(1, _PRIME, size=_PERMUTATIONS).astype(np.uint64)
+_B = _random.randint(0, _PRIME, size=_PERMUTATIONS).astype(np.uint64)
+
+
+class MinHashUtils:
+    """Утилиты для сигнатур MinHash и корзин LSH"""
+    
+    # Параметры хранятся вместе с сигнатурами: при изменении сигнатуры нужно пересчитать
+    PERMUTATIONS = _PERMUTATIONS
+    BANDS = 16
+    ROWS_PER_BAND = PERMUTATIONS // BANDS
+    SHINGLE_SIZE = 5
+    
+    @staticmethod
+    def shingles(text: str) -> Set[str]:
+        """
+        Множество символьных шинглов текста
+        
+        Args:
+            text: Исходный текст
+            
+        Returns:
+            Подстроки длины SHINGLE_SIZE ключа поиска текста (см. TextUtils.search_key);
+            короткий текст дает один шингл
+        """
+        key = TextUtils.search_key(text)
+        size = MinHashUtils.SHINGLE_SIZE
+        if len(key) <= size:
+            return {key} if key else set()
+        return {key[i:i + size] for i in range(len(key) - size + 1)}
+    
+    @staticmethod
+    def signature(text: str) -> Optional[np.ndarray]:
+        """
+        Сигнатура MinHash текста
+        
+        Args:
+            text: Исходный текст
+            
+        Returns:
+            Массив из PERMUTATIONS значений uint32 или None для пустого текста
+        """
+        shingles = MinHashUtils.shingles(text)
+        if not shingles:
+            return None
+        # crc32 стабилен между процессами, в отличие от hash()
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % _PRIME for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+    
+    @staticmethod
+    def bands(signature: np.ndarray) -> List[Tuple[int, int]]:
+        """Корзины LSH сигнатуры: пары (номер полосы, хеш полосы)"""
+        rows = MinHashUtils.ROWS_PER_BAND
+        return [
+            (band, zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()))
+            for band in range(MinHashUtils.BANDS)
+        ]
+    
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Оценка коэффициента Жаккара по двум сигнатурам"""
+        return float(np.count_nonzero(first == second)) / len(first)
+    
+    @staticmethod
+    def to_bytes(signature: np.ndarray) -> bytes:
+        return signature.astype("<u4").tobytes()
+    
+    @staticmethod
+    def from_bytes(data: bytes) -> np.ndarray:
+        return np.frombuffer(data, dtype="<u4")
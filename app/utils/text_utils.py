@@ -0,0 +1,130 @@
+"""
+Утилиты для нормализации текста
+"""
+import re
+from typing import Optional, Set
+
+
+class TextUtils:
+    """Утилиты для работы с текстом"""
+    
+    _WHITESPACE_RE = re.compile(r"\s+")
+    _NON_WORD_RE = re.compile(r"[^\w ]+")
+    
+    _NUMBER_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*([^\d\s+.,]*)")
+    _MULTIPLIERS = {
+        "": 1,
+        "k": 10 ** 3, "к": 10 ** 3, "тыс": 10 ** 3,
+        "m": 10 ** 6, "м": 10 ** 6, "млн": 10 ** 6,
+        "b": 10 ** 9, "млрд": 10 ** 9
+    }
+    
+    # Транслитерация кириллицы в латиницу: "ВК Музыка" и "vk muzyka" дают один ключ
+    _TRANSLIT = str.maketrans({
+        "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh",
+        "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n",
+        "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f",
+        "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "",
+        "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya"
+    })
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Приводит текст к виду для сравнения и поиска
+        
+        Args:
+            text: Исходный текст
+            
+        Returns:
+            Текст в нижнем регистре (Unicode casefold), с заменой ё на е
+            и схлопнутыми пробелами
+        """
+        if not text:
+            return ""
+        text = text.casefold().replace("ё", "е")
+        return TextUtils._WHITESPACE_RE.sub(" ", text).strip()
+    
+    @staticmethod
+    def transliterate(text: str) -> str:
+        """
+        Транслитерирует кириллицу в латиницу
+        
+        Args:
+            text: Нормализованный текст (см. normalize)
+            
+        Returns:
+            Текст, в котором русские буквы заменены латинскими
+        """
+        return text.translate(TextUtils._TRANSLIT)
+    
+    @staticmethod
+    def search_key(text: str) -> str:
+        """
+        Вычисляет ключ для поиска
+        
+        Args:
+            text: Исходный текст
+            
+        Returns:
+            Нормализованный текст без знаков препинания в латинской транслитерации
+        """
+        key = TextUtils._NON_WORD_RE.sub(" ", TextUtils.normalize(text))
+        return TextUtils.normalize(TextUtils.transliterate(key))
+    
+    @staticmethod
+    def trigrams(key: str) -> Set[str]:
+        """
+        Разбивает ключ поиска на триграммы
+        
+        Каждое слово дополняется двумя пробелами в начале и одним в конце,
+        как в pg_trgm, поэтому даже короткие запросы дают триграммы,
+        а совпадение начала слова весит больше.
+        
+        Args:
+            key: Ключ поиска (см. search_key)
+            
+        Returns:
+            Множество триграмм
+        """
+        result = set()
+        for word in key.split(" "):
+            if not word:
+                continue
+            padded = f"  {word} "
+            for i in range(len(padded) - 2):
+                result.add(padded[i:i + 3])
+        return result
+    
+    @staticmethod
+    def parse_downloads(downloads: Optional[str]) -> Optional[int]:
+        """
+        Преобразует количество загрузок в число
+        
+        Args:
+            downloads: Строка вида "10M+", "1.5K", "500+" или "10 млн+"
+            
+        Returns:
+            Количество загрузок или None, если строку не удалось разобрать
+        """
+        match = TextUtils._NUMBER_RE.search(TextUtils.normalize(downloads or "").replace(" ", ""))
+        if not match:
+            return None
+        multiplier = TextUtils._MULTIPLIERS.get(match.group(2).rstrip("."))
+        if multiplier is None:
+            return None
+        return int(float(match.group(1).replace(",", ".")) * multiplier)
+    
+    @staticmethod
+    def parse_age_rating(age_rating: Optional[str]) -> Optional[int]:
+        """
+        Преобразует возрастной рейтинг в число
+        
+        Args:
+            age_rating: Строка вида "12+"
+            
+        Returns:
+            Минимальный возраст или None, если строку не удалось разобрать
+        """
+        match = re.search(r"\d+", age_rating or "")
+        return int(match.group()) if match else None
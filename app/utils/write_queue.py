@@ -0,0 +1,207 @@
+"""
+Очередь записи с групповой фиксацией транзакций (group commit)
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from config import settings
+
+# Единица работы: получает сессию писателя и возвращает результат для вызывающего
+WriteUnit = Callable[[Session], Any]
+
+
+class WriteQueue:
+    """
+    Единственный писатель в базу данных
+
+    Запросы на запись кладут единицы работы в ограниченную очередь.
+    Фоновый поток забирает все накопившиеся единицы и выполняет их
+    в одной транзакции: каждая единица - в своей точке сохранения
+    (SAVEPOINT), поэтому ошибка одной не откатывает остальные.
+    Результаты и ошибки возвращаются вызывающим только после COMMIT.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_depth: int = settings.WRITE_QUEUE_MAX_DEPTH,
+        max_batch: int = settings.WRITE_QUEUE_MAX_BATCH,
+        tick_ms: float = settings.WRITE_QUEUE_TICK_MS,
+        submit_timeout: float = settings.WRITE_QUEUE_SUBMIT_TIMEOUT,
+        result_timeout: float = settings.WRITE_QUEUE_RESULT_TIMEOUT
+    ):
+        self._session_factory = session_factory
+        self._queue: "queue.Queue[Tuple[WriteUnit, Future]]" = queue.Queue(maxsize=max_depth)
+        self._max_batch = max_batch
+        self._tick = tick_ms / 1000
+        self._submit_timeout = submit_timeout
+        self._result_timeout = result_timeout
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats = {
+            "batches": 0,
+            "units": 0,
+            "failed_units": 0,
+            "failed_batches": 0,
+            "rejected": 0,
+            "result_timeouts": 0,
+            "max_batch_size": 0
+        }
+
+    def start(self) -> None:
+        """Запустить поток писателя (повторный вызов ничего не делает)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Дописать накопленные единицы работы и остановить поток писателя"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    async def submit(self, unit: WriteUnit) -> Any:
+        """
+        Поставить единицу работы в очередь и дождаться результата
+
+        Если очередь переполнена дольше submit_timeout, возвращает 503,
+        чтобы клиент повторил запрос позже, а не копил задержку. Если результата
+        нет дольше result_timeout, возвращает 504; еще не начатая единица работы
+        при этом отменяется.
+        """
+        self.start()
+        future: Future = Future()
+        deadline = time.monotonic() + self._submit_timeout
+        while True:
+            try:
+                self._queue.put_nowait((unit, future))
+                break
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    self._reject()
+                await asyncio.sleep(0.01)
+        try:
+            # Отмена ожидания отменяет и future, если писатель его еще не взял
+            return await asyncio.wait_for(asyncio.wrap_future(future), self._result_timeout)
+        except asyncio.TimeoutError:
+            self._timeout()
+
+    def submit_sync(self, unit: WriteUnit) -> Any:
+        """Синхронный вариант submit для вызова вне цикла событий"""
+        self.start()
+        future: Future = Future()
+        try:
+            self._queue.put((unit, future), timeout=self._submit_timeout)
+        except queue.Full:
+            self._reject()
+        try:
+            return future.result(timeout=self._result_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._timeout()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики очереди записи"""
+        stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = stats["units"] / stats["batches"] if stats["batches"] else 0
+        return stats
+
+    def _reject(self) -> None:
+        self._stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Очередь записи переполнена, повторите запрос позже",
+            headers={"Retry-After": "1"}
+        )
+
+    def _timeout(self) -> None:
+        self._stats["result_timeouts"] += 1
+        raise HTTPException(status_code=504, detail="Запись не подтверждена вовремя, проверьте результат и повторите")
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            if batch:
+                self._execute_batch(batch)
+
+    def _collect_batch(self) -> List[Tuple[WriteUnit, Future]]:
+        """Забрать все ожидающие единицы работы, подождав новые не дольше одного тика"""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self._tick
+        while len(batch) < self._max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _execute_batch(self, batch: List[Tuple[WriteUnit, Future]]) -> None:
+        """Выполнить пачку единиц работы в одной транзакции"""
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        db = self._session_factory()
+        db.info["group_commit"] = True
+        try:
+            if db.get_bind().dialect.name == "sqlite":
+                # Блокировка записи берется сразу: иначе чтение внутри пачки открывает снимок,
+                # и запись после фиксации другого писателя (фоновых задач) сразу падает с "database is locked"
+                db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            for unit, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with db.begin_nested():
+                        result = unit(db)
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._stats["failed_batches"] += 1
+            errors = {id(future): error for future, _, error in outcomes}
+            # Ошибка пачки (в том числе до первой единицы, например "database is locked"
+            # на BEGIN IMMEDIATE) завершает все ее future, иначе вызывающие ждали бы вечно
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(errors.get(id(future)) or e)
+            return
+        finally:
+            db.close()
+
+        self._stats["batches"] += 1
+        self._stats["units"] += len(outcomes)
+        self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(outcomes))
+        for future, result, error in outcomes:
+            if error is not None:
+                self._stats["failed_units"] += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+write_queue = WriteQueue()
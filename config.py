@@ -19,6 +19,102 @@ class Settings:
     # CORS
     ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
     
+    # Очередь записи (group commit)
+    WRITE_QUEUE_MAX_DEPTH = int(os.getenv("WRITE_QUEUE_MAX_DEPTH", "1000"))
+    WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "100"))
+    WRITE_QUEUE_TICK_MS = float(os.getenv("WRITE_QUEUE_TICK_MS", "2"))
+    WRITE_QUEUE_SUBMIT_TIMEOUT = float(os.getenv("WRITE_QUEUE_SUBMIT_TIMEOUT", "2"))
+    WRITE_QUEUE_RESULT_TIMEOUT = float(os.getenv("WRITE_QUEUE_RESULT_TIMEOUT", "30"))
+    
+    # Контроль допуска: лимиты клиентов, группы маршрутов, сброс нагрузки, дедлайны
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", "20"))
+    ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "40"))
+    ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+    # Ключи клиентов с отдельной корзиной (через запятую); остальные запросы считаются по IP
+    ADMISSION_API_KEYS = {key.strip() for key in os.getenv("ADMISSION_API_KEYS", "").split(",") if key.strip()}
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+    ADMISSION_CATALOG_CONCURRENCY = int(os.getenv("ADMISSION_CATALOG_CONCURRENCY", "64"))
+    ADMISSION_CATALOG_QUEUE = int(os.getenv("ADMISSION_CATALOG_QUEUE", "256"))
+    ADMISSION_CATALOG_DEADLINE = float(os.getenv("ADMISSION_CATALOG_DEADLINE", "10"))
+    ADMISSION_MAINTENANCE_CONCURRENCY = int(os.getenv("ADMISSION_MAINTENANCE_CONCURRENCY", "1"))
+    ADMISSION_MAINTENANCE_QUEUE = int(os.getenv("ADMISSION_MAINTENANCE_QUEUE", "2"))
+    ADMISSION_MAINTENANCE_DEADLINE = float(os.getenv("ADMISSION_MAINTENANCE_DEADLINE", "60"))
+    ADMISSION_MAINTENANCE_COST = float(os.getenv("ADMISSION_MAINTENANCE_COST", "10"))
+    
+    # Сервер (run_prod.py)
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "9000"))
+    WORKERS = int(os.getenv("WORKERS", str(os.cpu_count() or 1)))
+    BACKLOG = int(os.getenv("BACKLOG", "2048"))
+    KEEP_ALIVE_TIMEOUT = int(os.getenv("KEEP_ALIVE_TIMEOUT", "15"))
+    
+    # Кеш каталога и версия каталога, общая для воркеров
+    CATALOG_VERSION_FILE = os.getenv("CATALOG_VERSION_FILE", "./rustore.catalog_version")
+    CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+    CATALOG_CACHE_WAIT_TIMEOUT = float(os.getenv("CATALOG_CACHE_WAIT_TIMEOUT", "5"))
+    
+    # Готовые JSON-фрагменты приложений и категорий: предел объема в байтах
+    FRAGMENT_STORE_MAX_BYTES = int(os.getenv("FRAGMENT_STORE_MAX_BYTES", str(32 * 1024 * 1024)))
+    
+    # Поиск: минимальная доля триграмм запроса, найденных в названии
+    SEARCH_SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.3"))
+    
+    # Почти одинаковые приложения: минимальная оценка сходства шинглов (MinHash)
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+    
+    # Похожие приложения
+    SIMILAR_APPS_TOP_K = int(os.getenv("SIMILAR_APPS_TOP_K", "10"))
+    SIMILAR_APPS_DIMENSIONS = int(os.getenv("SIMILAR_APPS_DIMENSIONS", "1024"))
+    SIMILAR_APPS_CHUNK_SIZE = int(os.getenv("SIMILAR_APPS_CHUNK_SIZE", "256"))
+    SIMILAR_APPS_FULL_REBUILD_RATIO = float(os.getenv("SIMILAR_APPS_FULL_REBUILD_RATIO", "0.2"))
+    SIMILAR_APPS_REFRESH_DELAY = float(os.getenv("SIMILAR_APPS_REFRESH_DELAY", "2"))
+    SIMILAR_APPS_LEASE_SECONDS = float(os.getenv("SIMILAR_APPS_LEASE_SECONDS", "600"))
+    
+    # События приложений (просмотры, загрузки) и популярность
+    APP_EVENTS_SHARDS = int(os.getenv("APP_EVENTS_SHARDS", "16"))
+    APP_EVENTS_MAX_PENDING = int(os.getenv("APP_EVENTS_MAX_PENDING", "100000"))
+    APP_EVENTS_FLUSH_INTERVAL = float(os.getenv("APP_EVENTS_FLUSH_INTERVAL", "5"))
+    APP_EVENTS_BATCH_MAX = int(os.getenv("APP_EVENTS_BATCH_MAX", "1000"))
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+    TRENDING_VIEW_WEIGHT = float(os.getenv("TRENDING_VIEW_WEIGHT", "1"))
+    TRENDING_DOWNLOAD_WEIGHT = float(os.getenv("TRENDING_DOWNLOAD_WEIGHT", "10"))
+    
+    # Статические файлы и загрузка файлов в хранилище по содержимому
+    STATIC_DIR = os.getenv("STATIC_DIR", "data")
+    ASSET_MAX_BYTES = int(os.getenv("ASSET_MAX_BYTES", str(256 * 1024 * 1024)))
+    ASSET_GC_GRACE_HOURS = float(os.getenv("ASSET_GC_GRACE_HOURS", "24"))
+    ASSET_SCAN_WORKERS = int(os.getenv("ASSET_SCAN_WORKERS", str(min(8, os.cpu_count() or 1))))
+    
+    # Архив удаленных приложений
+    ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "30"))
+    ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", "500"))
+    
+    # Фоновая проверка целостности
+    SCRUB_ENABLED = os.getenv("SCRUB_ENABLED", "True").lower() == "true"
+    SCRUB_ROWS_PER_SECOND = float(os.getenv("SCRUB_ROWS_PER_SECOND", "200"))
+    SCRUB_SLICE_SIZE = int(os.getenv("SCRUB_SLICE_SIZE", "100"))
+    SCRUB_PAUSE_LATENCY_MS = float(os.getenv("SCRUB_PAUSE_LATENCY_MS", "200"))
+    SCRUB_PAUSE_SECONDS = float(os.getenv("SCRUB_PAUSE_SECONDS", "5"))
+    
+    # Снимок каталога для первой загрузки на клиенте
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+    SNAPSHOT_REFRESH_DELAY = float(os.getenv("SNAPSHOT_REFRESH_DELAY", "5"))
+    SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "2"))
+    
+    # Колоночная модель чтения списков приложений в памяти воркера
+    READ_MODEL_ENABLED = os.getenv("READ_MODEL_ENABLED", "False").lower() == "true"
+    
+    # Пакетная выдача и обновление приложений
+    APPS_BATCH_MAX_IDS = int(os.getenv("APPS_BATCH_MAX_IDS", "100"))
+    APPS_BULK_UPDATE_MAX = int(os.getenv("APPS_BULK_UPDATE_MAX", "1000"))
+    
+    # Проверка актуальности хешей клиента: максимум объектов в запросе
+    HASH_CHECK_MAX_IDS = int(os.getenv("HASH_CHECK_MAX_IDS", "10000"))
+    
+    # Запуск
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "True").lower() == "true"
+    
     # API
     API_V1_STR = "/api/v1"
     PROJECT_NAME = "RuStore Backend API"
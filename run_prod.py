@@ -0,0 +1,22 @@
+"""
+Скрипт для запуска сервера в продакшене (несколько воркеров)
+"""
+import uvicorn
+from config import settings
+
+if __name__ == "__main__":
+    # Воркеры - отдельные процессы. Кеши в их памяти согласуются через
+    # общую версию каталога (app/utils/catalog_version.py), брокер не нужен
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.WORKERS,
+        loop="auto",  # uvloop, если установлен
+        http="auto",  # httptools, если установлен
+        backlog=settings.BACKLOG,
+        timeout_keep_alive=settings.KEEP_ALIVE_TIMEOUT,
+        proxy_headers=True,
+        access_log=False,
+        log_level="info"
+    )
@@ -0,0 +1,92 @@
+"""
+Общие настройки тестов
+
+Переменные окружения задаются до импорта приложения: настройки и движок
+базы данных читают их при импорте.
+"""
+import os
+import tempfile
+import uuid
+
+_TMP_DIR = tempfile.mkdtemp(prefix="rustore-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'rustore.db')}"
+os.environ["CATALOG_VERSION_FILE"] = os.path.join(_TMP_DIR, "rustore.catalog_version")
+os.environ["SNAPSHOT_DIR"] = os.path.join(_TMP_DIR, "snapshots")
+os.environ["SCRUB_ENABLED"] = "False"
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+
+def make_sqlite_engine(path: str, busy_timeout_ms: int = 200) -> Engine:
+    """Движок отдельной файловой базы SQLite с WAL и коротким busy_timeout"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        cursor.close()
+
+    return engine
+
+
+@pytest.fixture
+def sqlite_path(tmp_path) -> str:
+    """Путь к файлу новой базы SQLite теста"""
+    return str(tmp_path / "test.db")
+
+
+@pytest.fixture(scope="session")
+def app_schema() -> None:
+    """Схема общей базы тестов (DATABASE_URL)"""
+    from app.schema import ensure_schema
+    ensure_schema()
+
+
+@pytest.fixture
+def db(app_schema):
+    """Сессия общей базы тестов"""
+    from app.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def make_category(db, **fields):
+    """Создать категорию с уникальным названием"""
+    from app.schemas.category import CategoryCreate
+    from app.services.category_service import CategoryService
+    fields.setdefault("name", f"Category {uuid.uuid4().hex[:8]}")
+    return CategoryService(db).create_category(CategoryCreate(**fields))
+
+
+def make_app(db, category_id: int, **fields):
+    """Создать приложение с уникальными данными"""
+    from app.schemas.app import AppCreate
+    from app.services.app_service import AppService
+    suffix = uuid.uuid4().hex[:8]
+    values = {
+        "name": f"App {suffix}",
+        "description": f"Description {suffix}",
+        "short_description": "Short",
+        "company": "Test Company",
+        "icon_url": "/static/icons/test.png",
+        "category_id": category_id,
+        **fields
+    }
+    return AppService(db).create_app(AppCreate(**values))
+
+
+@pytest.fixture
+def remote_writes(monkeypatch):
+    """
+    Записи как из другого воркера: версия каталога растет и журнал пишется,
+    но подписчики этого воркера не уведомляются
+    """
+    from app.utils.catalog_version import catalog_version
+    monkeypatch.setattr(catalog_version, "notify", lambda changes, version: None)
@@ -0,0 +1,165 @@
+"""
+Тесты контроля допуска: корзины клиентов, сброс нагрузки и дедлайны
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from app.database import engine
+from app.utils.admission import AdmissionController, AdmissionMiddleware, RouteGroup
+
+
+@pytest.fixture
+def controller(monkeypatch) -> AdmissionController:
+    controller = AdmissionController()
+    monkeypatch.setattr(controller, "api_keys", {"partner-key"})
+    monkeypatch.setattr(controller, "burst", 2.0)
+    monkeypatch.setattr(controller, "rate", 0.001)
+    monkeypatch.setattr(controller, "enabled", True)
+    monkeypatch.setattr(controller, "queue_timeout", 0.05)
+    return controller
+
+
+def http_scope(path: str = "/api/v1/apps/", ip: str = "10.0.0.1", api_key: str = None) -> dict:
+    headers = [(b"x-api-key", api_key.encode())] if api_key else []
+    return {"type": "http", "method": "GET", "path": path, "headers": headers, "client": (ip, 1234)}
+
+
+def test_unknown_api_keys_share_the_ip_bucket(controller):
+    # Новый случайный ключ в каждом запросе не дает новой корзины
+    keys = [controller.client_key(http_scope(api_key=f"random-{i}")) for i in range(3)]
+    assert keys == ["ip:10.0.0.1"] * 3
+    assert [controller.take_tokens(key, 1) == 0 for key in keys] == [True, True, False]
+    assert len(controller._buckets) == 1
+
+    assert controller.client_key(http_scope(api_key="partner-key")) == "key:partner-key"
+    assert controller.take_tokens(controller.client_key(http_scope(api_key="partner-key")), 1) == 0
+
+
+async def call(middleware: AdmissionMiddleware, scope: dict) -> dict:
+    """Выполнить запрос через middleware; статус, заголовки и тело ответа"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await middleware(scope, receive, send)
+    start = next(message for message in messages if message["type"] == "http.response.start")
+    return {
+        "status": start["status"],
+        "headers": {name.decode(): value.decode() for name, value in start["headers"]},
+        "body": b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body")
+    }
+
+
+async def ok_app(scope, receive, send):
+    await JSONResponse({"ok": True})(scope, receive, send)
+
+
+def test_client_out_of_tokens_gets_429_with_retry_after(controller):
+    middleware = AdmissionMiddleware(ok_app, controller)
+
+    async def requests():
+        return [await call(middleware, http_scope()) for _ in range(3)]
+
+    responses = asyncio.run(requests())
+    assert [response["status"] for response in responses] == [200, 200, 429]
+    # Токен копится 1000 с при rate=0.001
+    assert responses[2]["headers"]["retry-after"] == "1000"
+    assert controller.stats["rate_limited"] == 1
+
+
+def test_full_queue_is_shed_with_503(controller, monkeypatch):
+    monkeypatch.setattr(controller, "burst", 100.0)
+    group = RouteGroup("catalog", max_concurrency=1, max_queue=1, deadline=5.0, cost=1)
+    monkeypatch.setitem(controller.groups, "catalog", group)
+
+    async def requests():
+        unblock = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await unblock.wait()
+            await ok_app(scope, receive, send)
+
+        middleware = AdmissionMiddleware(slow_app, controller)
+        first = asyncio.ensure_future(call(middleware, http_scope()))
+        queued = asyncio.ensure_future(call(middleware, http_scope()))
+        await asyncio.sleep(0.01)
+        # Место занято, в очереди уже один запрос: третий отклоняется сразу
+        shed = await call(middleware, http_scope())
+        # Ждущий в очереди дольше ADMISSION_QUEUE_TIMEOUT тоже получает 503
+        timed_out = await queued
+        unblock.set()
+        return shed, timed_out, await first
+
+    shed, timed_out, first = asyncio.run(requests())
+    assert (shed["status"], timed_out["status"], first["status"]) == (503, 503, 200)
+    assert shed["headers"]["retry-after"] == "1"
+    assert group.stats["shed"] == 1 and group.stats["queue_timeouts"] == 1
+    assert group.in_flight == 0
+
+
+def test_handler_past_deadline_gets_504_and_is_cancelled(controller, monkeypatch):
+    group = RouteGroup("catalog", max_concurrency=4, max_queue=4, deadline=0.05, cost=1)
+    monkeypatch.setitem(controller.groups, "catalog", group)
+    cancelled = []
+
+    async def hanging_app(scope, receive, send):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def request():
+        response = await call(AdmissionMiddleware(hanging_app, controller), http_scope())
+        await asyncio.sleep(0.01)
+        return response
+
+    response = asyncio.run(request())
+    assert response["status"] == 504
+    assert cancelled == [True]
+    assert group.stats["deadline_exceeded"] == 1 and group.in_flight == 0
+
+
+def test_sqlite_query_is_interrupted_at_deadline(controller, monkeypatch):
+    group = RouteGroup("catalog", max_concurrency=4, max_queue=4, deadline=0.2, cost=1)
+    monkeypatch.setitem(controller.groups, "catalog", group)
+    errors = []
+
+    def endless_query():
+        started = time.monotonic()
+        try:
+            with engine.connect() as connection:
+                connection.execute(text(
+                    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+                ))
+        except OperationalError as e:
+            errors.append((str(e), time.monotonic() - started))
+            raise
+
+    async def sync_handler_app(scope, receive, send):
+        # Как синхронный обработчик FastAPI: в пуле потоков с контекстом запроса
+        await run_in_threadpool(endless_query)
+        await ok_app(scope, receive, send)
+
+    async def request():
+        response = await call(AdmissionMiddleware(sync_handler_app, controller), http_scope())
+        for _ in range(100):
+            if errors:
+                break
+            await asyncio.sleep(0.05)
+        return response
+
+    assert asyncio.run(request())["status"] == 504
+    [(error, elapsed)] = errors
+    # Запрос в потоке не продолжает работу после ответа 504
+    assert "interrupted" in error and elapsed < 2
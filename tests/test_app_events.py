@@ -0,0 +1,101 @@
+"""
+Тесты событий приложений: запись накопленных счетчиков и популярность с затуханием
+"""
+import math
+import time
+
+import pytest
+
+from app.models.app_event_stats import AppEventStats
+from app.services import app_event_service
+from app.services.app_event_service import AppEventRecorder, AppEventService, trending_rate
+from app.services.app_service import AppService
+from tests.conftest import make_app, make_category
+
+
+def stats(db, app_id: int):
+    db.expire_all()
+    return db.get(AppEventStats, app_id)
+
+
+def test_flush_writes_counters_of_active_apps(db):
+    category_id = make_category(db).id
+    app_id = make_app(db, category_id).id
+    deleted_id = make_app(db, category_id).id
+    AppService(db).delete_app(deleted_id)
+
+    recorder = AppEventRecorder(shards=4, max_pending=100)
+    for _ in range(3):
+        assert recorder.record(app_id, "view")
+    recorder.record(app_id, "download")
+    recorder.record(deleted_id, "view")
+    recorder.record(10 ** 9, "view")
+
+    # События удаленного и несуществующего приложений отбрасываются при записи
+    assert recorder.flush() == 1
+    assert (stats(db, app_id).views, stats(db, app_id).downloads) == (3, 1)
+    assert stats(db, deleted_id) is None
+    assert recorder.get_stats()["pending_apps"] == 0
+
+    recorder.record(app_id, "view", count=2)
+    assert recorder.flush() == 1
+    assert (stats(db, app_id).views, stats(db, app_id).downloads) == (5, 1)
+
+
+def test_failed_flush_keeps_counters_for_next_flush(db, monkeypatch):
+    app_id = make_app(db, make_category(db).id).id
+    recorder = AppEventRecorder(shards=4, max_pending=100)
+    recorder.record(app_id, "download", count=2)
+
+    apply = AppEventService.apply
+
+    def fail(self, counts, now):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(AppEventService, "apply", fail)
+    with pytest.raises(RuntimeError):
+        recorder.flush()
+    recorder.record(app_id, "download")
+
+    monkeypatch.setattr(AppEventService, "apply", apply)
+    assert recorder.flush() == 1
+    assert stats(db, app_id).downloads == 3
+    assert recorder.get_stats()["failed_flushes"] == 1
+
+
+def test_full_buffer_drops_events_of_new_apps():
+    recorder = AppEventRecorder(shards=1, max_pending=2)
+    assert recorder.record(1, "view") and recorder.record(2, "view")
+    assert not recorder.record(3, "view")
+    # Приложение, уже ждущее записи, продолжает учитываться
+    assert recorder.record(1, "view")
+    assert recorder.get_stats()["dropped"] == 1
+
+
+def test_trending_key_sums_decayed_weights(db, monkeypatch):
+    monkeypatch.setattr(app_event_service.settings, "TRENDING_HALF_LIFE_HOURS", 1.0)
+    category_id = make_category(db).id
+    recent_views, old_download, fresh_download = (make_app(db, category_id).id for _ in range(3))
+    now = time.time()
+    half_life = 3600
+
+    service = AppEventService(db)
+    # Загрузка весит 10 просмотров, но за два периода полураспада ее вклад падает до 2.5
+    service.apply({old_download: [0, 1]}, now - 2 * half_life)
+    service.apply({recent_views: [3, 0], fresh_download: [0, 1]}, now)
+    assert [app.id for app in service.get_trending_apps(category_id=category_id)] == [
+        fresh_download, recent_views, old_download
+    ]
+
+    # Ключ новой пачки складывается с прежним: ln(Σ w·e^(λ·t))
+    service.apply({old_download: [5, 0]}, now)
+    rate = trending_rate()
+    epoch = app_event_service._EPOCH
+    old_key = math.log(10) + rate * (now - 2 * half_life - epoch)
+    new_key = math.log(5) + rate * (now - epoch)
+    expected = new_key + math.log1p(math.exp(old_key - new_key))
+    assert stats(db, old_download).trending_key == pytest.approx(expected)
+    # 2.5 + 5 больше 3: приложение поднимается выше
+    assert [app.id for app in service.get_trending_apps(category_id=category_id)] == [
+        fresh_download, old_download, recent_views
+    ]
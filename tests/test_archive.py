@@ -0,0 +1,51 @@
+"""
+Тесты переноса удаленных приложений в архив
+"""
+from sqlalchemy import text
+
+from app.models.catalog_change import CatalogChangeRecord
+from app.services.app_service import AppService
+from app.services.archive_service import ArchiveService
+from app.services.category_service import CategoryService
+from app.utils.catalog_version import catalog_version
+from app.utils.write_queue import write_queue
+from tests.conftest import make_app, make_category
+
+
+def apps_count(db, category_id: int) -> int:
+    return CategoryService(db).get_categories_by_ids([category_id])[0].apps_count
+
+
+def test_archive_goes_through_write_queue_and_bumps_catalog_version(db):
+    category = make_category(db)
+    category_id = category.id
+    old = [make_app(db, category_id).id for _ in range(2)]
+    kept = make_app(db, category_id)
+    make_app(db, category_id)  # приложение с наибольшим ID не переносится
+    service = AppService(db)
+    for app_id in old:
+        service.delete_app(app_id)
+    db.execute(
+        text("UPDATE apps SET updated_at = datetime('now', '-60 days') WHERE id IN (:a, :b)"),
+        {"a": old[0], "b": old[1]}
+    )
+    db.commit()
+    assert apps_count(db, category_id) == 4
+
+    version = catalog_version.current()
+    units = write_queue.get_stats()["units"]
+    result = ArchiveService(db).archive_inactive_apps(retention_days=30)
+
+    assert result["archived_apps"] >= 2
+    assert write_queue.get_stats()["units"] > units
+    assert catalog_version.current() > version
+    db.expire_all()
+    assert apps_count(db, category_id) == 2
+    assert service.get_app_by_id(kept.id) is not None
+    changes = {
+        (record.entity, record.entity_id, record.op)
+        for record in db.query(CatalogChangeRecord).filter(CatalogChangeRecord.entity_id.in_(
+            old + [category_id]
+        ))
+    }
+    assert {("app", old[0], "delete"), ("app", old[1], "delete"), ("category", category_id, "upsert")} <= changes
@@ -0,0 +1,94 @@
+"""
+Тесты хранилища файлов: гонка с уборкой мусора и некорректный multipart
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.utils.asset_store import AssetStore
+
+BOUNDARY = "test-boundary"
+
+
+@pytest.fixture
+def store(tmp_path) -> AssetStore:
+    return AssetStore(root=str(tmp_path))
+
+
+def write_blob(store: AssetStore, data: bytes):
+    writer = store.open("icon.png")
+    writer.write(data)
+    return writer.commit()
+
+
+@pytest.mark.parametrize("remove_dir", [False, True])
+def test_commit_restores_blob_removed_by_sweep(store, monkeypatch, remove_dir):
+    first = write_blob(store, b"icon")
+    path = os.path.join(store.root, first.url[len("/static/"):])
+    utime = os.utime
+
+    def sweep_then_utime(target, *args, **kwargs):
+        # Уборка мусора удаляет файл (и опустевший каталог) между exists и utime
+        os.remove(target)
+        if remove_dir:
+            os.rmdir(os.path.dirname(target))
+        return utime(target, *args, **kwargs)
+
+    monkeypatch.setattr(os, "utime", sweep_then_utime)
+    second = write_blob(store, b"icon")
+
+    assert second.url == first.url
+    assert not second.deduplicated
+    with open(path, "rb") as file:
+        assert file.read() == b"icon"
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_commit_deduplicates_existing_blob(store):
+    first = write_blob(store, b"icon")
+    second = write_blob(store, b"icon")
+    assert second.url == first.url
+    assert second.deduplicated
+    assert os.listdir(store.tmp_dir) == []
+
+
+def make_request(*chunks: bytes) -> Request:
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1} for i, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    }
+    return Request(scope, receive)
+
+
+@pytest.mark.parametrize("body", [
+    b"not a multipart body",
+    f"--{BOUNDARY}\r\nContent-Disposition form-data\r\n\r\n".encode()
+])
+def test_malformed_multipart_is_bad_request(store, body):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(store.receive(make_request(body)))
+    assert error.value.status_code == 400
+
+
+def test_malformed_tail_aborts_started_file(store):
+    start = (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="icon.png"\r\n\r\n'
+        "data"
+    ).encode()
+    tail = f"\r\n--{BOUNDARY}\r\nbroken header\r\n\r\n".encode()
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(store.receive(make_request(start, tail)))
+    assert error.value.status_code == 400
+    assert os.listdir(store.tmp_dir) == []
@@ -0,0 +1,93 @@
+"""
+Тесты пакетного обновления приложений: статусы и одновременные пачки в очереди записи
+"""
+import asyncio
+import uuid
+
+from sqlalchemy import select
+
+from app.api.routes.apps import bulk_update_apps
+from app.models.app import App
+from app.models.catalog_change import CatalogChangeRecord
+from app.schemas.app import AppBulkUpdateItem, AppBulkUpdateRequest
+from app.services.app_service import AppService
+from app.utils.hash_utils import HashUtils
+from tests.conftest import make_app, make_category
+
+
+def bulk(*items: dict):
+    request = AppBulkUpdateRequest(updates=[AppBulkUpdateItem(**item) for item in items])
+    return bulk_update_apps(request)
+
+
+def statuses(response):
+    return [(result.id, result.status) for result in response.results]
+
+
+def assert_consistent(db, app_ids):
+    """Хеш каждого приложения совпадает с данными, а в журнале одна запись на приложение"""
+    db.expire_all()
+    for app in AppService(db).get_apps_by_ids(app_ids):
+        assert app.data_hash == HashUtils.calculate_app_hash(HashUtils.get_data_for_hash(app))
+    records = db.execute(
+        select(CatalogChangeRecord.entity_id, CatalogChangeRecord.data_hash).where(
+            CatalogChangeRecord.entity == "app", CatalogChangeRecord.entity_id.in_(app_ids)
+        )
+    ).all()
+    assert sorted(entity_id for entity_id, _ in records) == sorted(app_ids)
+    hashes = dict(db.execute(select(App.id, App.data_hash).where(App.id.in_(app_ids))).all())
+    assert all(data_hash == hashes[entity_id] for entity_id, data_hash in records)
+
+
+def test_bulk_update_reports_status_per_item(db):
+    category_id = make_category(db).id
+    first, second, other = (make_app(db, category_id) for _ in range(3))
+    first_id, second_id, other_id = first.id, second.id, other.id
+    other_data = {"name": other.name, "description": other.description}
+
+    response = asyncio.run(bulk(
+        {"id": first_id, "rating": 4.9},
+        {"id": second_id, "rating": second.rating},
+        {"id": 10 ** 9, "rating": 1.0},
+        {"id": first_id, "rating": 1.0},
+        {"id": second_id, **other_data}
+    ))
+
+    assert statuses(response) == [
+        (first_id, "updated"),
+        (second_id, "unchanged"),
+        (10 ** 9, "not_found"),
+        (first_id, "conflict"),
+        (second_id, "conflict")
+    ]
+    db.expire_all()
+    assert db.get(App, first_id).rating == 4.9
+    assert db.get(App, second_id).name != other_data["name"]
+    assert_consistent(db, [first_id, second_id, other_id])
+
+
+def test_concurrent_batches_share_group_commit(db):
+    category_id = make_category(db).id
+    app_ids = [make_app(db, category_id).id for _ in range(6)]
+    shared = app_ids[0]
+    names = {app_id: f"Renamed {uuid.uuid4().hex[:8]}" for app_id in app_ids[1:]}
+
+    async def run_all():
+        # Пачки пересекаются по shared: каждая пишет свой рейтинг, последняя по порядку очереди побеждает
+        return await asyncio.gather(*[
+            bulk({"id": shared, "rating": 1.0 + i}, {"id": app_id, "name": names[app_id]})
+            for i, app_id in enumerate(app_ids[1:])
+        ])
+
+    responses = asyncio.run(run_all())
+
+    assert all(
+        [status for _, status in statuses(response)] == ["updated", "updated"] for response in responses
+    )
+    db.expire_all()
+    assert db.get(App, shared).rating == 1.0 + len(names) - 1
+    for app_id, name in names.items():
+        assert db.get(App, app_id).name == name
+        # Триграммы поиска обновлены вместе со строкой
+        assert app_id in AppService(db).search_app_ids(name)
+    assert_consistent(db, app_ids)
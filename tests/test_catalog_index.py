@@ -0,0 +1,133 @@
+"""
+Тесты индексов каталога: догоняющее обновление по журналу изменений и первое построение вне цикла событий
+"""
+import asyncio
+import threading
+import uuid
+
+from app.database import SessionLocal
+from app.services.suggest_index import SuggestIndex
+from app.utils.catalog_version import catalog_version
+from tests.conftest import make_app, make_category
+
+
+class RecordingSuggestIndex(SuggestIndex):
+    """Индекс подсказок, запоминающий свои обращения к базе"""
+
+    def __init__(self):
+        self.loads = []
+        self.session_threads = []
+        super().__init__(session_factory=self._session)
+
+    def _session(self):
+        self.session_threads.append(threading.current_thread())
+        return SessionLocal()
+
+    def _load_rows(self, db, app_ids=None):
+        self.loads.append(None if app_ids is None else sorted(app_ids))
+        return super()._load_rows(db, app_ids)
+
+
+def suggest_on_event_loop(index, prefix):
+    async def suggest():
+        return index.suggest(prefix)
+    return asyncio.run(suggest())
+
+
+def test_event_loop_serves_old_index_while_catching_up_in_background(db, remote_writes):
+    category = make_category(db)
+    index = RecordingSuggestIndex()
+    index.rebuild()
+    index.loads.clear()
+    index.session_threads.clear()
+
+    app = make_app(db, category.id, name="Quokkagram Photos")
+
+    # Запрос из цикла событий не ждет базу: отвечает прежним индексом
+    assert suggest_on_event_loop(index, "quokka") == []
+    assert threading.current_thread() not in index.session_threads
+    index._catch_up_thread.join(5)
+
+    assert [item["id"] for item in suggest_on_event_loop(index, "quokka")] == [app.id]
+    # Перечитано только измененное приложение, а не весь каталог
+    assert index.loads == [[app.id]]
+
+
+def test_thread_pool_catches_up_before_answering(db, remote_writes):
+    category = make_category(db)
+    index = RecordingSuggestIndex()
+    index.rebuild()
+    index.loads.clear()
+
+    app = make_app(db, category.id, name="Wombatify Music")
+
+    assert [item["id"] for item in index.suggest("wombat")] == [app.id]
+    assert index.loads == [[app.id]]
+
+
+def test_category_write_does_not_reload_apps(db, remote_writes):
+    index = RecordingSuggestIndex()
+    index.rebuild()
+    index.loads.clear()
+
+    make_category(db)
+
+    assert index.suggest("anything") == []
+    assert index.loads == []
+    assert index._version == catalog_version.current()
+
+
+def test_remote_delete_removes_app(db, remote_writes):
+    from app.services.app_service import AppService
+
+    category = make_category(db)
+    app = make_app(db, category.id, name="Pangolin Notes")
+    index = RecordingSuggestIndex()
+    index.rebuild()
+    assert [item["id"] for item in index.suggest("pangolin")] == [app.id]
+
+    AppService(db).delete_app(app.id)
+
+    assert index.suggest("pangolin") == []
+
+
+def test_search_facets_do_not_rebuild_on_event_loop(db, remote_writes):
+    from app.services.facet_index import FacetIndex
+
+    category = make_category(db)
+    index = FacetIndex()
+    index.rebuild()
+    loads = []
+    load_rows = index._load_rows
+    index._load_rows = lambda session, app_ids=None: loads.append(app_ids) or load_rows(session, app_ids)
+
+    app = make_app(db, category.id, rating=4.7)
+
+    async def facets():
+        return index.facets(category_id=category.id)
+
+    assert asyncio.run(facets())["total"] == 0
+    index._catch_up_thread.join(5)
+    assert asyncio.run(facets())["total"] == 1
+    assert [list(app_ids) for app_ids in loads] == [[app.id]]
+
+
+def test_suggest_route_builds_cold_index_off_the_event_loop(db, monkeypatch):
+    from app.api.routes import apps
+
+    word = f"wombat{uuid.uuid4().hex[:6]}"
+    app = make_app(db, make_category(db).id, name=f"{word} Player")
+    index = RecordingSuggestIndex()
+    monkeypatch.setattr(apps, "suggest_index", index)
+
+    loop_threads = []
+
+    async def suggest():
+        loop_threads.append(threading.current_thread())
+        results = await asyncio.gather(*(apps.suggest_apps(prefix=word, limit=5) for _ in range(3)))
+        return [[item["id"] for item in result] for result in results]
+
+    assert asyncio.run(suggest()) == [[app.id]] * 3
+    # Весь каталог прочитан один раз и не в потоке цикла событий
+    assert index.loads == [None]
+    assert loop_threads[0] not in index.session_threads
@@ -0,0 +1,135 @@
+"""
+Тесты журнала изменений: одна запись на объект и синхронизация страницами во время записей
+"""
+import threading
+
+from sqlalchemy import func, select
+
+from app.models.app import App
+from app.models.catalog_change import CatalogChangeRecord
+from app.schemas.app import AppBulkUpdateItem, AppUpdate
+from app.services.app_service import AppService
+from app.services.change_feed_service import ChangeFeedService
+from app.utils.write_queue import write_queue
+from tests.conftest import make_app, make_category
+
+
+def current_seq(db) -> int:
+    return db.execute(select(func.max(CatalogChangeRecord.seq))).scalar() or 0
+
+
+def app_records(db, app_id: int):
+    return db.execute(
+        select(CatalogChangeRecord.seq, CatalogChangeRecord.op).where(
+            CatalogChangeRecord.entity == "app", CatalogChangeRecord.entity_id == app_id
+        )
+    ).all()
+
+
+def test_repeated_changes_keep_one_record_with_latest_seq(db):
+    app_id = make_app(db, make_category(db).id).id
+    seqs = []
+    for rating in (1.0, 2.0, 3.0):
+        AppService(db).update_app(app_id, AppUpdate(rating=rating))
+        records = app_records(db, app_id)
+        assert len(records) == 1
+        seqs.append(records[0].seq)
+    assert seqs == sorted(seqs) and len(set(seqs)) == 3
+
+    AppService(db).delete_app(app_id)
+    [(seq, op)] = app_records(db, app_id)
+    assert op == "delete" and seq > seqs[-1]
+
+
+def test_paged_sync_during_concurrent_writes_converges(db):
+    category_id = make_category(db).id
+    since = current_seq(db)
+    app_ids = [make_app(db, category_id).id for _ in range(12)]
+    deleted = set(app_ids[::4])
+    stop = threading.Event()
+
+    def writer() -> None:
+        # Записи идут через очередь, как из обработчиков: одни и те же приложения меняются многократно
+        rating = 0.0
+        while not stop.is_set():
+            for app_id in app_ids:
+                rating = (rating + 0.1) % 5
+                if app_id not in deleted:
+                    write_queue.submit_sync(
+                        lambda session, app_id=app_id, rating=rating:
+                        AppService(session).update_app(app_id, AppUpdate(rating=rating))
+                    )
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    client = {}
+    try:
+        # Клиент читает журнал страницами по 3 записи, пока записи продолжаются
+        for _ in range(20):
+            page = ChangeFeedService(db).get_changes(since=since, limit=3)
+            for change in page["changes"]:
+                if change["entity"] == "app":
+                    client[change["entity_id"]] = change["data_hash"] if change["op"] == "upsert" else None
+            since = page["next_since"]
+            db.rollback()
+        for app_id in deleted:
+            write_queue.submit_sync(lambda session, app_id=app_id: AppService(session).delete_app(app_id))
+    finally:
+        stop.set()
+        thread.join()
+
+    # После остановки записей клиент дочитывает журнал и совпадает с базой
+    while True:
+        page = ChangeFeedService(db).get_changes(since=since, limit=3)
+        for change in page["changes"]:
+            if change["entity"] == "app":
+                client[change["entity_id"]] = change["data_hash"] if change["op"] == "upsert" else None
+        since = page["next_since"]
+        if not page["has_more"]:
+            break
+
+    db.expire_all()
+    expected = dict(
+        db.execute(select(App.id, App.data_hash).where(App.id.in_(app_ids), App.is_active == True)).all()
+    )
+    assert {app_id: client.get(app_id) for app_id in app_ids} == {
+        app_id: expected.get(app_id) for app_id in app_ids
+    }
+    assert all(client[app_id] is None for app_id in deleted)
+    assert all(len(app_records(db, app_id)) == 1 for app_id in app_ids)
+
+
+def category_seq(db, category_id: int) -> int:
+    return db.execute(
+        select(CatalogChangeRecord.seq).where(
+            CatalogChangeRecord.entity == "category", CatalogChangeRecord.entity_id == category_id
+        )
+    ).scalar()
+
+
+def test_app_writes_record_categories_whose_apps_count_changed(db):
+    first_id, second_id = make_category(db).id, make_category(db).id
+    before = category_seq(db, first_id)
+
+    app_id = make_app(db, first_id).id
+    assert category_seq(db, first_id) > before
+
+    first_seq, second_seq = category_seq(db, first_id), category_seq(db, second_id)
+    AppService(db).update_app(app_id, AppUpdate(rating=4.0))
+    # Без переноса категории не меняются
+    assert (category_seq(db, first_id), category_seq(db, second_id)) == (first_seq, second_seq)
+
+    AppService(db).update_app(app_id, AppUpdate(category_id=second_id))
+    assert category_seq(db, first_id) > first_seq and category_seq(db, second_id) > second_seq
+    changes = ChangeFeedService(db).get_changes(since=first_seq)["changes"]
+    counts = {change["entity_id"]: change["category"].apps_count for change in changes if change["entity"] == "category"}
+    assert counts == {first_id: 0, second_id: 1}
+
+
+def test_bulk_move_records_both_categories(db):
+    first_id, second_id = make_category(db).id, make_category(db).id
+    app_id = make_app(db, first_id).id
+    first_seq, second_seq = category_seq(db, first_id), category_seq(db, second_id)
+
+    AppService(db).bulk_update_apps([AppBulkUpdateItem(id=app_id, category_id=second_id)])
+    assert category_seq(db, first_id) > first_seq and category_seq(db, second_id) > second_seq
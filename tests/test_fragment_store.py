@@ -0,0 +1,73 @@
+"""
+Тесты готовых JSON-фрагментов: ключи меняются вместе с данными объекта
+"""
+import json
+
+import pytest
+
+from app.api.routes import apps, categories
+from app.models.screenshot import Screenshot
+from app.schemas.app import AppUpdate
+from app.services.app_service import AppService
+from app.services.category_service import CategoryService
+from app.utils.fragment_store import FragmentStore
+from tests.conftest import make_app, make_category
+
+
+@pytest.fixture
+def store(monkeypatch) -> FragmentStore:
+    store = FragmentStore(max_bytes=1 << 20)
+    monkeypatch.setattr(apps, "fragment_store", store)
+    monkeypatch.setattr(categories, "fragment_store", store)
+    return store
+
+
+def test_app_fragment_follows_data_and_screenshots(db, store):
+    app_id = make_app(db, make_category(db).id).id
+
+    first = apps.render_app(db, app_id)
+    assert apps.render_app(db, app_id) is first
+    assert (store.hits, store.misses) == (1, 1)
+
+    # Изменение данных дает новый data_hash и новый ключ
+    AppService(db).update_app(app_id, AppUpdate(name="Renamed fragment app"))
+    renamed = apps.render_app(db, app_id)
+    assert json.loads(renamed)["name"] == "Renamed fragment app"
+
+    # Скриншоты не входят в data_hash, но входят в ключ
+    db.add(Screenshot(app_id=app_id, image_url="/static/screenshots/one.png", order_index=0))
+    db.commit()
+    with_screenshot = apps.render_app(db, app_id)
+    assert [item["image_url"] for item in json.loads(with_screenshot)["screenshots"]] == [
+        "/static/screenshots/one.png"
+    ]
+    assert store.misses == 3
+
+
+def test_category_fragment_follows_apps_count(db, store):
+    category_id = make_category(db).id
+
+    def render() -> dict:
+        [row] = CategoryService(db).get_category_rows(category_id)
+        return json.loads(categories._dump_category(row))
+
+    assert render()["apps_count"] == 0
+    assert render()["apps_count"] == 0
+    # data_hash категории не зависит от apps_count, поэтому он отдельно входит в ключ
+    make_app(db, category_id)
+    assert render()["apps_count"] == 1
+    assert (store.hits, store.misses) == (1, 2)
+
+
+def test_store_evicts_least_recently_used_by_size():
+    store = FragmentStore(max_bytes=10)
+    store.get_or_render("a", lambda: b"aaaa")
+    store.get_or_render("b", lambda: b"bbbb")
+    store.get_or_render("a", lambda: b"stale")
+    store.get_or_render("c", lambda: b"cccc")
+
+    assert store.get_or_render("a", lambda: b"stale") == b"aaaa"
+    assert store.get_or_render("b", lambda: b"new") == b"new"
+    # Фрагмент больше всего хранилища отдается, но не вытесняет остальные
+    assert store.get_or_render("big", lambda: b"x" * 11) == b"x" * 11
+    assert store.get_stats()["fragments"] == 2
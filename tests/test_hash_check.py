@@ -0,0 +1,66 @@
+"""
+Тесты проверки хешей клиента: JSON и компактные бинарные записи
+"""
+import asyncio
+import hashlib
+import json
+import struct
+
+import pytest
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from starlette.requests import Request
+
+from app.api.routes.hash_verification import _parse_hash_check, check_hashes
+from app.services.app_service import AppService
+from tests.conftest import make_app, make_category
+
+
+def records(hashes: dict) -> bytes:
+    return b"".join(struct.pack("<I", app_id) + bytes.fromhex(data_hash) for app_id, data_hash in hashes.items())
+
+
+def make_request(body: bytes, content_type: str) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {"type": "http", "method": "POST", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def test_binary_records_match_json(db):
+    category_id = make_category(db).id
+    current, stale, deleted = (make_app(db, category_id) for _ in range(3))
+    hashes = {
+        current.id: current.data_hash,
+        stale.id: hashlib.sha256(b"old").hexdigest(),
+        deleted.id: deleted.data_hash,
+        2 ** 32 - 1: hashlib.sha256(b"unknown").hexdigest()
+    }
+    AppService(db).delete_app(deleted.id)
+
+    binary = asyncio.run(check_hashes(make_request(records(hashes), "application/octet-stream"), db))
+    body = json.dumps({"apps": hashes}).encode()
+    assert asyncio.run(check_hashes(make_request(body, "application/json"), db)) == binary
+    assert (binary.apps.stale, binary.apps.deleted, binary.apps.unknown) == (
+        [stale.id], [deleted.id], [2 ** 32 - 1]
+    )
+
+
+def test_binary_content_type_parameters_are_ignored():
+    digest = hashlib.sha256(b"app").hexdigest()
+    check = _parse_hash_check("application/octet-stream; charset=binary", records({7: digest, 1: digest}))
+    assert check.apps == {7: digest, 1: digest}
+    assert check.categories == {}
+
+
+@pytest.mark.parametrize("body", [b"\x01\x00\x00\x00", records({1: hashlib.sha256(b"").hexdigest()}) + b"\x00"])
+def test_truncated_binary_record_is_bad_request(body):
+    with pytest.raises(HTTPException) as error:
+        _parse_hash_check("application/octet-stream", body)
+    assert error.value.status_code == 400
+
+
+def test_malformed_json_is_validation_error():
+    with pytest.raises(RequestValidationError):
+        _parse_hash_check("application/json", b'{"apps": {"x": 1}')
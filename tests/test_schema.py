@@ -0,0 +1,66 @@
+"""
+Тесты обновления схемы при одновременном запуске воркеров
+"""
+import multiprocessing
+import sqlite3
+
+from app.schema import SCHEMA_VERSION, ensure_schema
+from tests.conftest import make_sqlite_engine
+
+WORKERS = 4
+
+
+def _ensure_schema_in_worker(path: str, barrier, results) -> None:
+    engine = make_sqlite_engine(path, busy_timeout_ms=5000)
+    barrier.wait()
+    try:
+        results.put(("ok", ensure_schema(engine)))
+    except Exception as e:
+        results.put(("error", repr(e)))
+
+
+def run_workers(path: str):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_ensure_schema_in_worker, args=(path, barrier, results)) for _ in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(10)
+    return outcomes
+
+
+def schema_versions(path: str):
+    with sqlite3.connect(path) as conn:
+        return [version for (version,) in conn.execute("SELECT version FROM schema_version")]
+
+
+def test_concurrent_workers_create_fresh_schema_once(sqlite_path):
+    outcomes = run_workers(sqlite_path)
+
+    assert [status for status, _ in outcomes] == ["ok"] * WORKERS, outcomes
+    # Схему создал ровно один воркер, остальные увидели готовую версию
+    assert sorted(result["from"] for _, result in outcomes) == [0] + [SCHEMA_VERSION] * (WORKERS - 1)
+    assert schema_versions(sqlite_path) == [SCHEMA_VERSION]
+
+
+def test_concurrent_workers_migrate_old_schema_once(sqlite_path):
+    ensure_schema(make_sqlite_engine(sqlite_path))
+    # База версии 4: без таблиц, появившихся позже
+    with sqlite3.connect(sqlite_path) as conn:
+        for table in ("app_minhash", "app_lsh_buckets", "screenshots_archive", "apps_archive", "asset_checksums"):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute("UPDATE schema_version SET version = 4")
+
+    outcomes = run_workers(sqlite_path)
+
+    assert [status for status, _ in outcomes] == ["ok"] * WORKERS, outcomes
+    assert sorted(result["from"] for _, result in outcomes) == [4] + [SCHEMA_VERSION] * (WORKERS - 1)
+    assert schema_versions(sqlite_path) == [SCHEMA_VERSION]
+    with sqlite3.connect(sqlite_path) as conn:
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"app_minhash", "screenshots_archive", "asset_checksums"} <= tables
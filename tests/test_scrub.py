@@ -0,0 +1,48 @@
+"""
+Тесты фоновой проверки целостности
+"""
+from sqlalchemy import event, select
+
+from app.database import engine
+from app.models.category import Category
+from app.models.scrub import ScrubMismatch, ScrubState
+from app.services.scrub_service import ScrubService
+from tests.conftest import make_app, make_category
+
+
+def category_passes(db) -> int:
+    return db.execute(select(ScrubState.passes).where(ScrubState.entity == "category")).scalar() or 0
+
+
+def test_category_with_apps_scrubs_clean_without_loading_apps(db):
+    category_id = make_category(db).id
+    for _ in range(3):
+        make_app(db, category_id)
+
+    # Проверка категории не загружает ее приложения ради apps_count
+    category = db.get(Category, category_id)
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert ScrubService._verify("category", category) is None
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements == []
+
+    # Полный проход по категориям не находит расхождения
+    db.expire_all()
+    passes = category_passes(db)
+    for _ in range(10):
+        ScrubService(db).scrub_slice(slice_size=100000, rows_per_second=1e9)
+        if category_passes(db) > passes:
+            break
+    assert category_passes(db) > passes
+    assert db.get(ScrubMismatch, ("category", category_id)) is None
+
+
+def test_changed_category_data_is_reported(db):
+    category = make_category(db)
+    category.name = category.name + " tampered"
+    assert ScrubService._verify("category", category)["issue"] == "Hash mismatch"
+    db.rollback()
@@ -0,0 +1,48 @@
+"""
+Тесты выбора полей (?fields=) в поиске приложений
+"""
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.apps import search_apps
+from tests.conftest import make_app, make_category
+
+
+def search(db, q, **params):
+    params = {"limit": 50, "offset": 0, "sort": None, "max_age": None, "facets": False, "fields": None, **params}
+    return asyncio.run(search_apps(q=q, db=db, **params))
+
+
+@pytest.fixture
+def found_app(db):
+    word = f"zq{uuid.uuid4().hex[:8]}"
+    return make_app(db, make_category(db).id, name=f"Searchable {word}"), word
+
+
+def test_search_returns_only_requested_fields(db, found_app):
+    app, word = found_app
+    response = search(db, word, fields="name,id")
+    assert json.loads(response.body) == [{"id": app.id, "name": app.name}]
+
+
+def test_search_with_facets_trims_items(db, found_app):
+    app, word = found_app
+    page = json.loads(search(db, word, fields="id,icon_url", facets=True).body)
+    assert page["items"] == [{"id": app.id, "icon_url": app.icon_url}]
+    assert page["total"] == 1
+
+
+def test_search_without_fields_keeps_full_items(db, found_app):
+    app, word = found_app
+    assert [item.id for item in search(db, word)] == [app.id]
+
+
+def test_search_rejects_unknown_field(db, found_app):
+    _, word = found_app
+    with pytest.raises(HTTPException) as error:
+        search(db, word, fields="id,description")
+    assert error.value.status_code == 400
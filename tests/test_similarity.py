@@ -0,0 +1,71 @@
+"""
+Тесты пересчета похожих приложений: разбор только изменившихся и расчет без блокировки записи
+"""
+import os
+import sqlite3
+import uuid
+
+from app.schemas.app import AppUpdate
+from app.services import similarity_service
+from app.services.app_service import AppService
+from app.services.similarity_service import SimilarityService
+from tests.conftest import make_app, make_category
+
+
+def take_write_lock() -> None:
+    """Взять и отпустить блокировку записи из другого соединения, не дожидаясь ее"""
+    conn = sqlite3.connect(os.environ["DATABASE_URL"][len("sqlite:///"):], timeout=0, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+
+
+def test_refresh_parses_only_changed_apps_without_holding_write_lock(db, monkeypatch):
+    category_id = make_category(db).id
+    word = f"orbit{uuid.uuid4().hex[:6]}"
+    original = make_app(db, category_id, name=f"Star {word} navigator", description=f"{word} maps for stars")
+    original_id = original.id
+    for _ in range(6):
+        make_app(db, category_id)
+    SimilarityService(db).refresh()
+
+    parsed = []
+    term_vector = SimilarityService._term_vector.__func__
+    monkeypatch.setattr(
+        SimilarityService, "_term_vector",
+        classmethod(lambda cls, row: parsed.append(row.id) or term_vector(cls, row))
+    )
+    top_neighbours = SimilarityService._top_neighbours
+
+    def top_neighbours_without_lock(vectors, ids, chunk):
+        # Расчет идет без открытой транзакции записи: другое соединение берет блокировку сразу
+        take_write_lock()
+        return top_neighbours(vectors, ids, chunk)
+
+    monkeypatch.setattr(SimilarityService, "_top_neighbours", staticmethod(top_neighbours_without_lock))
+
+    assert SimilarityService(db).refresh()["mode"] == "none"
+    assert parsed == []
+
+    twin = make_app(db, category_id)
+    AppService(db).update_app(twin.id, AppUpdate(name=f"Star {word} navigator 2", description=f"{word} maps for stars"))
+    result = SimilarityService(db).refresh()
+
+    assert result["mode"] == "incremental"
+    assert parsed == [twin.id]
+    db.expire_all()
+    assert SimilarityService(db).get_similar_apps(twin.id, limit=1)[0].id == original_id
+
+
+def test_vector_for_other_dimensions_is_recomputed(monkeypatch):
+    row = type("Row", (), {
+        "name": "Maps", "short_description": "", "description": "", "company": "Co", "category_id": 1
+    })()
+    blob = SimilarityService._encode_vector(SimilarityService._term_vector(row))
+    indices, values = SimilarityService._decode_vector(blob)
+    assert len(indices) == len(values) > 0
+
+    monkeypatch.setattr(similarity_service.settings, "SIMILAR_APPS_DIMENSIONS", 2048)
+    assert SimilarityService._decode_vector(blob) is None
@@ -0,0 +1,87 @@
+"""
+Тесты аренды пересчета похожих приложений: пересчитывает один воркер
+"""
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+
+from app.models.similar_app import AppSimilarityLease
+from app.services import similarity_service
+from app.services.similarity_service import SimilarityRefresher
+from tests.conftest import make_app, make_category
+
+
+@pytest.fixture
+def refresh_calls(db, monkeypatch):
+    """Пересчеты, выполненные SimilarityService (медленные, чтобы воркеры пересеклись)"""
+    db.execute(delete(AppSimilarityLease))
+    db.commit()
+    calls = []
+
+    def refresh(self, full: bool = False):
+        calls.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return {"mode": "incremental", "recomputed": 1, "removed": 0, "apps": 1}
+
+    monkeypatch.setattr(similarity_service.SimilarityService, "refresh", refresh)
+    return calls
+
+
+def test_concurrent_workers_refresh_once(refresh_calls):
+    workers = [SimilarityRefresher() for _ in range(4)]
+    barrier = threading.Barrier(len(workers))
+    results = {}
+
+    def run(index: int) -> None:
+        barrier.wait()
+        results[index] = workers[index]._refresh_leased(skip_refreshed=True)
+
+    threads = [threading.Thread(target=run, args=(i,), name=f"worker-{i}") for i in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(refresh_calls) == 1
+    assert sum(result is not None and result["mode"] == "incremental" for result in results.values()) == 1
+    # Остальные воркеры не взяли аренду и после паузы видят, что номер журнала уже пересчитан
+    assert all(workers[i]._refresh_leased(skip_refreshed=True)["mode"] == "none" for i in range(len(workers)))
+    assert len(refresh_calls) == 1
+
+
+def test_new_changes_are_refreshed_by_any_worker(db, refresh_calls):
+    first, second = SimilarityRefresher(), SimilarityRefresher()
+    assert first._refresh_leased(skip_refreshed=True)["mode"] == "incremental"
+    assert second._refresh_leased(skip_refreshed=True)["mode"] == "none"
+
+    make_app(db, make_category(db).id)
+    assert second._refresh_leased(skip_refreshed=True)["mode"] == "incremental"
+    assert len(refresh_calls) == 2
+
+
+def test_manual_refresh_conflicts_with_running_refresh(db, refresh_calls):
+    owner, other = SimilarityRefresher(), SimilarityRefresher()
+    assert owner._acquire(db)
+
+    with pytest.raises(HTTPException) as error:
+        other.refresh()
+    assert error.value.status_code == 409
+    assert not refresh_calls
+
+    owner._release(db, None)
+    assert other.refresh(full=True)["mode"] == "incremental"
+
+
+def test_expired_lease_is_taken_over(db, refresh_calls):
+    crashed, other = SimilarityRefresher(), SimilarityRefresher()
+    assert crashed._acquire(db)
+    assert other._refresh_leased() is None
+
+    # Воркер упал, не освободив аренду: после истечения ее берет другой
+    db.execute(update(AppSimilarityLease).values(expires_at=time.time() - 1))
+    db.commit()
+    assert other._refresh_leased()["mode"] == "incremental"
+    assert db.get(AppSimilarityLease, 1).owner is None
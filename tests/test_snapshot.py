@@ -0,0 +1,56 @@
+"""
+Тесты снимка каталога: один файл на seq, ETag по содержимому и удаление старого файла
+"""
+import hashlib
+import os
+
+from app.services.snapshot_service import Snapshot, SnapshotService, SnapshotStore
+
+
+def test_snapshot_for_seq_is_created_once(db, tmp_path):
+    service = SnapshotService(db)
+    seq, path = service.build(str(tmp_path))
+    with open(path, "rb") as snapshot_file:
+        content = snapshot_file.read()
+
+    # Заголовок другой сборки отличается временем создания, но файл того же seq не заменяется
+    assert service.build(str(tmp_path)) == (seq, path)
+    with open(path, "rb") as snapshot_file:
+        assert snapshot_file.read() == content
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+    snapshot = Snapshot(seq, path)
+    assert snapshot.etag == f'"catalog-{seq}-{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def test_snapshot_gzip_header_has_final_file_name(db, tmp_path):
+    seq, path = SnapshotService(db).build(str(tmp_path))
+    with open(path, "rb") as snapshot_file:
+        header = snapshot_file.read(512)
+
+    assert header[3] & 0x08  # FNAME
+    name = header[10:header.index(b"\0", 10)]
+    assert name == f"catalog-{seq}.ndjson".encode()
+
+
+def test_current_skips_snapshot_removed_before_open(tmp_path, monkeypatch):
+    store = SnapshotStore(directory=str(tmp_path))
+    old_path = tmp_path / "catalog-1.ndjson.gz"
+    old_path.write_bytes(b"old")
+    latest_file = store._latest_file
+    calls = []
+
+    def remove_after_resolve():
+        # Другой воркер собирает новый снимок и удаляет старый сразу после выбора файла
+        latest = latest_file()
+        if not calls:
+            (tmp_path / "catalog-2.ndjson.gz").write_bytes(b"new")
+            os.remove(old_path)
+        calls.append(latest)
+        return latest
+
+    monkeypatch.setattr(store, "_latest_file", remove_after_resolve)
+    snapshot = store.current()
+
+    assert snapshot.seq == 2
+    assert bytes(snapshot.data) == b"new"
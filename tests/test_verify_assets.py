@@ -0,0 +1,42 @@
+"""
+Тесты проверки файлов статики: метод маршрута и страницы списков
+"""
+import os
+
+import pytest
+
+from app.api.routes.hash_verification import router
+from app.services.asset_service import AssetService
+from app.utils.asset_store import asset_store
+
+
+@pytest.fixture
+def static_root(tmp_path, monkeypatch):
+    """Пустой каталог статики вместо STATIC_DIR"""
+    monkeypatch.setattr(asset_store, "root", str(tmp_path))
+    monkeypatch.setattr(asset_store, "blob_dir", str(tmp_path / "blobs"))
+    return tmp_path
+
+
+def test_verify_assets_is_post():
+    methods = {
+        method for route in router.routes if route.path.endswith("/verify-assets") for method in route.methods
+    }
+    assert methods == {"POST"}
+
+
+def test_lists_are_paged_with_full_counts(db, static_root):
+    os.makedirs(static_root / "icons")
+    for name in ("a.png", "b.png", "c.png"):
+        (static_root / "icons" / name).write_bytes(name.encode())
+
+    first = AssetService(db).verify_assets(limit=2)
+    assert first["orphaned_count"] == 3
+    assert [item["path"] for item in first["orphaned"]] == ["icons/a.png", "icons/b.png"]
+    assert len(first["missing"]) == min(first["missing_count"], 2)
+
+    second = AssetService(db).verify_assets(limit=2, offset=2)
+    assert second["orphaned_count"] == 3
+    assert [item["path"] for item in second["orphaned"]] == ["icons/c.png"]
+    # Хеши записаны первой проверкой: вторая файлы не перечитывает
+    assert second["hashed"] == 0
@@ -0,0 +1,105 @@
+"""
+Тесты очереди записи: ошибки пачки и ограниченное ожидание результата
+"""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.utils.write_queue import WriteQueue
+from tests.conftest import make_sqlite_engine
+
+
+@pytest.fixture
+def queue_factory(sqlite_path):
+    engine = make_sqlite_engine(sqlite_path)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+    queues = []
+
+    def factory(**kwargs) -> WriteQueue:
+        queue = WriteQueue(sessionmaker(bind=engine), **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield factory
+    for queue in queues:
+        queue.stop()
+    engine.dispose()
+
+
+def insert_item(item_id: int):
+    def unit(db: Session) -> int:
+        db.execute(text("INSERT INTO items (id, name) VALUES (:id, 'item')"), {"id": item_id})
+        return item_id
+    return unit
+
+
+def count_items(sqlite_path: str) -> int:
+    with sqlite3.connect(sqlite_path) as conn:
+        return conn.execute("SELECT count(*) FROM items").fetchone()[0]
+
+
+def test_batch_error_fails_every_caller_while_external_lock_is_held(queue_factory, sqlite_path):
+    queue = queue_factory(result_timeout=10)
+    holder = sqlite3.connect(sqlite_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        async def submit_all():
+            return await asyncio.gather(
+                *[queue.submit(insert_item(item_id)) for item_id in range(3)], return_exceptions=True
+            )
+
+        started = time.monotonic()
+        results = asyncio.run(asyncio.wait_for(submit_all(), 5))
+        elapsed = time.monotonic() - started
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+    assert all(isinstance(result, OperationalError) for result in results), results
+    assert all("locked" in str(result) for result in results)
+    assert elapsed < 5
+    assert queue.get_stats()["failed_batches"] >= 1
+
+    # После освобождения блокировки очередь снова пишет
+    assert asyncio.run(queue.submit(insert_item(10))) == 10
+    assert count_items(sqlite_path) == 1
+
+
+def test_submit_sync_fails_while_external_lock_is_held(queue_factory, sqlite_path):
+    queue = queue_factory(result_timeout=10)
+    holder = sqlite3.connect(sqlite_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(OperationalError):
+            queue.submit_sync(insert_item(1))
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+
+def test_result_wait_is_bounded_and_pending_unit_is_cancelled(queue_factory, sqlite_path):
+    queue = queue_factory(result_timeout=0.2)
+
+    def slow(db: Session) -> None:
+        time.sleep(1)
+
+    async def submit_both():
+        return await asyncio.gather(
+            queue.submit(slow), queue.submit(insert_item(1)), return_exceptions=True
+        )
+
+    results = asyncio.run(submit_both())
+    assert [getattr(result, "status_code", None) for result in results] == [504, 504]
+    assert all(isinstance(result, HTTPException) for result in results)
+    assert queue.get_stats()["result_timeouts"] == 2
+
+    queue.stop()
+    # Единица работы, которую писатель не успел начать, не выполняется
+    assert count_items(sqlite_path) == 0